@@ -83,14 +83,14 @@ class HivesDetailSerializer(HivesSerializer):
             return None
             
         # Import here to avoid circular imports
-        from devices.models import SensorReadings
-        from devices.serializers import SensorReadingsSerializer
+        from devices.models import HiveLatestReading
+        from devices.serializers import HiveLatestReadingSerializer
         
-        latest_reading = SensorReadings.objects.filter(
-            device__hive=obj,
-            device__is_active=True
-        ).select_related('device').order_by('-timestamp').first()
+        # Per-hive snapshot maintained on ingest: a primary key lookup
+        latest_reading = HiveLatestReading.objects.filter(
+            hive=obj
+        ).select_related('device', 'hive').first()
         
         if latest_reading:
-            return SensorReadingsSerializer(latest_reading, context=self.context).data
+            return HiveLatestReadingSerializer(latest_reading, context=self.context).data
         return None
@@ -1,3 +1,170 @@
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from rest_framework.test import APIClient
+import math
+import random
 
-# Create your tests here.
+from devices.models import SensorReadings
+from devices.services.analytics import ReadingSeries, SECONDS_PER_DAY
+from devices.services.downsampling import lttb
+from devices.services.rollups import SensorReadingsRollupService, floor_hour
+from smart_nyuki_backend.testing import make_device, make_reading
+
+
+class LTTBTests(SimpleTestCase):
+    def test_keeps_the_ends_and_the_peaks(self):
+        points = [(x, 10.0 if x in (30, 70) else 0.0) for x in range(100)]
+
+        selected = lttb(points, 10)
+
+        self.assertEqual(len(selected), 10)
+        self.assertEqual((selected[0], selected[-1]), (0, 99))
+        self.assertEqual(selected, sorted(selected))
+        self.assertTrue({30, 70} <= set(selected))
+
+    def test_short_series_are_returned_whole(self):
+        self.assertEqual(lttb([(0, 1.0), (1, 2.0), (2, 3.0)], 5), [0, 1, 2])
+        self.assertEqual(lttb([(x, float(x)) for x in range(10)], 2), [0, 9])
+
+
+class HiveDownsampledReadingsTests(TestCase):
+    """Bucketed hive readings are the same whether a bucket comes from the rollups, the raw tail or both."""
+
+    def setUp(self):
+        self.device = make_device('NODE-CHART')
+        self.hive = self.device.hive
+        self.client = APIClient()
+        self.client.force_authenticate(self.device.beekeeper.user)
+        self.hour = floor_hour(timezone.now()) - timedelta(hours=3)
+        self.readings = [
+            make_reading(self.device, self.hour + timedelta(minutes=minutes), temperature=Decimal(temperature))
+            for minutes, temperature in [(5, '34.00'), (25, '36.00'), (65, '35.00'), (130, '33.00'), (140, '37.00')]
+        ]
+
+    def get(self, **params):
+        params.setdefault('timestamp_after', (self.hour - timedelta(hours=1)).isoformat())
+        response = self.client.get(reverse('apiaries:hives-sensor-readings', args=[self.hive.id]), params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def hourly(self):
+        return [
+            (item['bucket'], item['count'], item['temperature']['min'], item['temperature']['avg'],
+             item['temperature']['max'])
+            for item in self.get(bucket='1h')['buckets']
+        ]
+
+    def test_hour_buckets_from_raw_rollups_and_tail(self):
+        expected = [
+            (self.hour, 2, 34.0, 35.0, 36.0),
+            (self.hour + timedelta(hours=1), 1, 35.0, 35.0, 35.0),
+            (self.hour + timedelta(hours=2), 2, 33.0, 35.0, 37.0),
+        ]
+        self.assertEqual(self.hourly(), expected)
+
+        rollups = SensorReadingsRollupService(lag_seconds=0)
+        rollups.run(now=timezone.now() + timedelta(seconds=1))
+        self.assertEqual(self.hourly(), expected)
+
+        # A late reading only in the raw tail is merged into its rolled up bucket
+        late = make_reading(self.device, self.hour + timedelta(minutes=45), temperature=Decimal('38.00'))
+        SensorReadings.objects.filter(pk=late.pk).update(created_at=rollups.watermark() + timedelta(microseconds=1))
+        self.assertEqual(self.hourly()[0], (self.hour, 3, 34.0, 36.0, 38.0))
+        self.assertEqual(self.get(bucket='5m')['total_readings'], 6)
+
+    def test_lttb_returns_at_most_the_requested_points(self):
+        data = self.get(downsample='lttb', points=3)
+
+        self.assertEqual(data['total_readings'], 5)
+        self.assertEqual(
+            [reading['id'] for reading in data['readings']],
+            [str(self.readings[0].id), str(self.readings[3].id), str(self.readings[4].id)]
+        )
+
+    def test_invalid_modes_are_rejected(self):
+        url = reverse('apiaries:hives-sensor-readings', args=[self.hive.id])
+        for params in ({'bucket': '2h'}, {'downsample': 'minmax'}, {'bucket': '1h', 'downsample': 'lttb'},
+                       {'downsample': 'lttb', 'points': 2}):
+            self.assertEqual(self.client.get(url, params).status_code, 400, params)
+
+
+class ReadingSeriesTests(SimpleTestCase):
+    """The vectorized passes match the same statistics computed one reading at a time."""
+
+    def setUp(self):
+        random.seed(11)
+        self.rows = []
+        start = datetime(2025, 5, 1, tzinfo=dt_timezone.utc).timestamp()
+        for i in range(300):
+            timestamp = start + i * 1800 + random.randint(0, 600)
+            weight = None if i % 17 == 0 else 30 + i * 0.02 + random.uniform(-0.3, 0.3)
+            self.rows.append((timestamp, random.uniform(30, 38), None, weight, None, 80))
+        random.shuffle(self.rows)
+        self.series = ReadingSeries.from_rows(self.rows)
+        self.rows.sort()
+
+    def test_daily_means_and_rolling_mean(self):
+        days, means = self.series.daily_means('weight')
+        for day, mean in zip(days, means):
+            values = [row[3] for row in self.rows if row[0] // SECONDS_PER_DAY == day and row[3] is not None]
+            self.assertAlmostEqual(mean, sum(values) / len(values))
+
+        rolling = self.series.rolling_mean('temperature', timedelta(hours=6))
+        for index, row in enumerate(self.rows):
+            window = [other[1] for other in self.rows if row[0] - 6 * 3600 < other[0] <= row[0]]
+            self.assertAlmostEqual(rolling[index], sum(window) / len(window))
+
+        self.assertEqual(self.series.summary()['humidity']['count'], 0)
+        self.assertTrue(all(math.isnan(mean) for mean in self.series.daily_means('humidity')[1]))
+
+    def test_nectar_flows_need_consecutive_gaining_days(self):
+        start = datetime(2025, 6, 1, 12, tzinfo=dt_timezone.utc).timestamp()
+        closing_weights = [30.0, 31.0, 32.0, 32.1, 33.0, 34.0, 35.0, None, 36.0, 37.0]
+        series = ReadingSeries.from_rows([
+            (start + day * SECONDS_PER_DAY, None, None, weight, None, None)
+            for day, weight in enumerate(closing_weights) if weight is not None
+        ])
+        first_day = int(start // SECONDS_PER_DAY)
+
+        flows = [(first, last, round(gain, 6)) for first, last, gain in series.nectar_flows(0.5, min_days=2)]
+        self.assertEqual(flows, [
+            (first_day + 1, first_day + 2, 2.0),
+            (first_day + 4, first_day + 6, 2.9),
+        ])
+        self.assertEqual(len(series.nectar_flows(min_daily_gain=0.5, min_days=3)), 1)
+
+
+class HiveAnalyticsEndpointTests(TestCase):
+    def setUp(self):
+        self.device = make_device('NODE-ANALYTICS')
+        self.hive = self.device.hive
+        self.client = APIClient()
+        self.client.force_authenticate(self.device.beekeeper.user)
+        self.day = datetime(2025, 6, 1, tzinfo=dt_timezone.utc)
+        for day, weights in enumerate([('40.00', '40.50'), ('41.20', '41.60'), ('42.00', '42.40')]):
+            for hours, weight in zip((8, 20), weights):
+                make_reading(self.device, self.day + timedelta(days=day, hours=hours), weight=Decimal(weight))
+
+    def test_daily_weights_and_nectar_flow(self):
+        response = self.client.get(reverse('apiaries:hives-analytics', args=[self.hive.id]), {
+            'timestamp_after': self.day.isoformat(),
+            'timestamp_before': (self.day + timedelta(days=3)).isoformat(),
+        })
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['reading_count'], 6)
+        self.assertEqual(response.data['summary']['weight']['max'], 42.4)
+        self.assertEqual(
+            [(entry['date'], entry['weight_close'], entry['weight_delta']) for entry in response.data['daily']],
+            [('2025-06-01', 40.5, None), ('2025-06-02', 41.6, 1.1), ('2025-06-03', 42.4, 0.8)]
+        )
+        self.assertEqual(response.data['nectar_flows'], [
+            {'start': '2025-06-02', 'end': '2025-06-03', 'days': 2, 'weight_gain': 1.9}
+        ])
+
+    def test_invalid_options_are_rejected(self):
+        response = self.client.get(reverse('apiaries:hives-analytics', args=[self.hive.id]), {'rolling_hours': '0'})
+        self.assertEqual(response.status_code, 400)
@@ -149,8 +149,11 @@ class ApiariesViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def smart_metrics(self, request, pk=None):
         """Get smart metrics for an apiary based on its smart hives"""
-        from django.db.models import Avg, Sum, Count, Min, Max
-        from devices.models import SensorReadings
+        from devices.models import SmartDevices, HiveLatestReading
+        from devices.serializers import HiveLatestReadingSerializer
+        from devices.services.rollups import SensorReadingsRollupService
+        from devices.services.reading_counters import DeviceReadingCounterService
+        from devices.services.analytics import ReadingSeries, ANALYTICS_METRICS
         from django.utils import timezone
         from datetime import timedelta
         
@@ -178,150 +181,62 @@ class ApiariesViewSet(viewsets.ModelViewSet):
         last_24h = now - timedelta(hours=24)
         last_week = now - timedelta(days=7)
         
-        # Get sensor readings from all smart devices in this apiary
-        readings_queryset = SensorReadings.objects.filter(
-            device__hive__apiary=apiary,
-            device__hive__is_active=True,
-            device__is_active=True
+        # Get all smart devices in this apiary
+        smart_devices = SmartDevices.objects.filter(
+            hive__apiary=apiary,
+            hive__is_active=True,
+            is_active=True
         )
         
-        # Calculate metrics - Get latest reading from each smart hive
-        latest_readings = []
-        for hive in smart_hives:
-            latest_reading = SensorReadings.objects.filter(
-                device__hive=hive,
-                device__is_active=True
-            ).order_by('-timestamp').first()
-            if latest_reading:
-                latest_readings.append(latest_reading)
-        
-        readings_last_24h = readings_queryset.filter(timestamp__gte=last_24h)
-        readings_last_week = readings_queryset.filter(timestamp__gte=last_week)
+        # Calculate metrics - Get latest reading from each smart hive (one query on the snapshot table)
+        latest_by_hive = {
+            snapshot.hive_id: snapshot
+            for snapshot in HiveLatestReading.objects.filter(
+                hive__in=smart_hives
+            ).select_related('device', 'hive')
+        }
+        latest_readings = [
+            latest_by_hive[hive.id] for hive in smart_hives if hive.id in latest_by_hive
+        ]
         
-        # Calculate current metrics (from latest readings of each hive)
+        # Calculate current metrics (from latest readings of each hive) in one vectorized pass
         current_metrics = None
         if latest_readings:
-            # Calculate averages and total weight from latest readings of each smart hive
-            total_temperature, total_humidity, total_sound_level, total_weight = 0.0, 0.0, 0.0, 0.0
-            temp_count_current, humidity_count_current, sound_count_current = 0, 0, 0
-            
-            # Collect all values for min/max calculations
-            temperatures = []
-            humidities = []
-            weights = []
-            
-            for latest_reading in latest_readings:
-                if latest_reading.temperature:
-                    total_temperature += float(latest_reading.temperature)
-                    temp_count_current += 1
-                    temperatures.append(float(latest_reading.temperature))
-                if latest_reading.humidity:
-                    total_humidity += float(latest_reading.humidity)
-                    humidity_count_current += 1
-                    humidities.append(float(latest_reading.humidity))
-                if latest_reading.sound_level:
-                    total_sound_level += float(latest_reading.sound_level)
-                    sound_count_current += 1
-                if latest_reading.weight:
-                    total_weight += float(latest_reading.weight)
-                    weights.append(float(latest_reading.weight))
-            
-            avg_temperature = total_temperature / temp_count_current if temp_count_current > 0 else 0
-            avg_humidity = total_humidity / humidity_count_current if humidity_count_current > 0 else 0
-            avg_sound_level = total_sound_level / sound_count_current if sound_count_current > 0 else 0
-            avg_weight = sum(weights) / len(weights) if weights else 0
-
-            # Calculate min/max values from latest readings
-            min_temperature = min(temperatures) if temperatures else 0
-            max_temperature = max(temperatures) if temperatures else 0
-            min_humidity = min(humidities) if humidities else 0
-            max_humidity = max(humidities) if humidities else 0
-            
-            current_stats = {
-                'avg_temperature': avg_temperature,
-                'avg_humidity': avg_humidity,
-                'avg_weight': avg_weight,
-                'avg_sound_level': avg_sound_level,
-                'min_temperature': min_temperature,
-                'max_temperature': max_temperature,
-                'min_humidity': min_humidity,
-                'max_humidity': max_humidity,
-                'total_weight': total_weight
-            }
+            current = ReadingSeries.from_rows([
+                (latest_reading.timestamp.timestamp(), *(getattr(latest_reading, metric) for metric in ANALYTICS_METRICS))
+                for latest_reading in latest_readings
+            ]).summary()
             
             current_metrics = {
-                'average_temperature': round(float(current_stats['avg_temperature'] or 0), 2),
-                'average_humidity': round(float(current_stats['avg_humidity'] or 0), 2),
-                'total_weight': round(total_weight, 2),
-                'average_weight': round(float(current_stats['avg_weight'] or 0), 2),
-                'average_sound_level': round(float(current_stats['avg_sound_level'] or 0), 2),
+                'average_temperature': round(current['temperature']['mean'] or 0, 2),
+                'average_humidity': round(current['humidity']['mean'] or 0, 2),
+                'total_weight': round(current['weight']['sum'] or 0, 2),
+                'average_weight': round(current['weight']['mean'] or 0, 2),
+                'average_sound_level': round(current['sound_level']['mean'] or 0, 2),
                 'temperature_range': {
-                    'min': round(float(current_stats['min_temperature'] or 0), 2),
-                    'max': round(float(current_stats['max_temperature'] or 0), 2)
+                    'min': round(current['temperature']['min'] or 0, 2),
+                    'max': round(current['temperature']['max'] or 0, 2)
                 },
                 'humidity_range': {
-                    'min': round(float(current_stats['min_humidity'] or 0), 2),
-                    'max': round(float(current_stats['max_humidity'] or 0), 2)
+                    'min': round(current['humidity']['min'] or 0, 2),
+                    'max': round(current['humidity']['max'] or 0, 2)
                 }
             }
         
-        # Calculate 24h metrics - Use ALL readings from last 24 hours
-        metrics_24h = None
-        if readings_last_24h.exists():
-            # Calculate averages from ALL readings in the last 24 hours
-            stats_24h = readings_last_24h.aggregate(
-                avg_temperature=Avg('temperature'),
-                avg_humidity=Avg('humidity'),
-                avg_weight=Avg('weight'),
-                avg_sound_level=Avg('sound_level'),
-                total_weight=Sum('weight')
-            )
-            
-            metrics_24h = {
-                'average_temperature': round(float(stats_24h['avg_temperature'] or 0), 2),
-                'average_humidity': round(float(stats_24h['avg_humidity'] or 0), 2),
-                'total_weight': round(float(stats_24h['total_weight'] or 0), 2),
-                'average_weight': round(float(stats_24h['avg_weight'] or 0), 2),
-                'average_sound_level': round(float(stats_24h['avg_sound_level'] or 0), 2),
-                'readings_count': readings_last_24h.count()
-            }
-        
-        # Calculate weekly metrics - Use ALL readings from last 7 days
-        metrics_week = None
-        if readings_last_week.exists():
-            # Calculate averages from ALL readings in the last 7 days
-            stats_week = readings_last_week.aggregate(
-                avg_temperature=Avg('temperature'),
-                avg_humidity=Avg('humidity'),
-                avg_weight=Avg('weight'),
-                avg_sound_level=Avg('sound_level'),
-                total_weight=Sum('weight')
-            )
-            
-            metrics_week = {
-                'average_temperature': round(float(stats_week['avg_temperature'] or 0), 2),
-                'average_humidity': round(float(stats_week['avg_humidity'] or 0), 2),
-                'total_weight': round(float(stats_week['total_weight'] or 0), 2),
-                'average_weight': round(float(stats_week['avg_weight'] or 0), 2),
-                'average_sound_level': round(float(stats_week['avg_sound_level'] or 0), 2),
-                'readings_count': readings_last_week.count()
-            }
+        # Calculate 24h and weekly metrics - from the hourly rollups plus readings not rolled up yet
+        rollups = SensorReadingsRollupService()
+        metrics_24h = self.window_metrics(rollups.window_stats(smart_devices, last_24h))
+        metrics_week = self.window_metrics(rollups.window_stats(smart_devices, last_week))
         
         # Get latest reading from each smart hive
-        hive_latest_readings = []
-        for hive in smart_hives:
-            latest_reading = SensorReadings.objects.filter(
-                device__hive=hive,
-                device__is_active=True
-            ).order_by('-timestamp').first()
-            
-            if latest_reading:
-                from devices.serializers import SensorReadingsSerializer
-                hive_latest_readings.append({
-                    'hive_id': str(hive.id),
-                    'hive_name': hive.name,
-                    'latest_reading': SensorReadingsSerializer(latest_reading).data
-                })
+        hive_latest_readings = [
+            {
+                'hive_id': str(latest_reading.hive_id),
+                'hive_name': latest_reading.hive.name,
+                'latest_reading': HiveLatestReadingSerializer(latest_reading).data
+            }
+            for latest_reading in latest_readings
+        ]
         
         return Response({
             'apiary_id': str(apiary.id),
@@ -343,10 +258,25 @@ class ApiariesViewSet(viewsets.ModelViewSet):
             'last_24h_metrics': metrics_24h,
             'last_week_metrics': metrics_week,
             'hive_latest_readings': hive_latest_readings,
-            'total_readings': readings_queryset.count(),
+            'total_readings': DeviceReadingCounterService().total(smart_devices),
             'last_updated': latest_readings[0].timestamp if latest_readings else None
         })
     
+    @staticmethod
+    def window_metrics(stats):
+        """Format rollup window statistics as smart metrics, or None without readings"""
+        if not stats['reading_count']:
+            return None
+        
+        return {
+            'average_temperature': round(float(stats['temperature']['avg'] or 0), 2),
+            'average_humidity': round(float(stats['humidity']['avg'] or 0), 2),
+            'total_weight': round(float(stats['weight']['sum'] or 0), 2),
+            'average_weight': round(float(stats['weight']['avg'] or 0), 2),
+            'average_sound_level': round(float(stats['sound_level']['avg'] or 0), 2),
+            'readings_count': stats['reading_count']
+        }
+    
     @action(detail=False, methods=['get'])
     def smart_overview(self, request):
         """Get smart overview for all user's apiaries"""
@@ -383,12 +313,15 @@ class ApiariesViewSet(viewsets.ModelViewSet):
                 smart_status = 'partially_smart'
             
             # Get basic sensor data count
-            from devices.models import SensorReadings
-            readings_count = SensorReadings.objects.filter(
-                device__hive__apiary=apiary,
-                device__hive__is_active=True,
-                device__is_active=True
-            ).count()
+            from devices.models import SmartDevices
+            from devices.services.reading_counters import DeviceReadingCounterService
+            readings_count = DeviceReadingCounterService().total(
+                SmartDevices.objects.filter(
+                    hive__apiary=apiary,
+                    hive__is_active=True,
+                    is_active=True
+                )
+            )
             
             # Add to overview
             overview_data.append({
@@ -506,25 +439,71 @@ class HivesViewSet(viewsets.ModelViewSet):
         # Get all smart devices assigned to this hive
         from devices.models import SensorReadings
         from devices.serializers import SensorReadingsSerializer
+        from devices.filters import SENSOR_READING_ORDERING_FIELDS, SensorReadingsFilter
+        from devices.services.archive import SensorReadingsArchiveReader
         
         # Get query parameters
-        limit = int(request.GET.get('limit', 10))
+        try:
+            limit = int(request.GET.get('limit', 10))
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            return Response(
+                {'limit': ['Must be a positive integer']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         ordering = request.GET.get('ordering', '-timestamp')
+        if ordering.lstrip('-') not in SENSOR_READING_ORDERING_FIELDS or ordering.startswith('--'):
+            return Response(
+                {'ordering': [f"Must be one of: {', '.join(SENSOR_READING_ORDERING_FIELDS)}, optionally prefixed with '-'"]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # Get sensor readings from all devices assigned to this hive
-        readings = SensorReadings.objects.filter(
-            device__hive=hive,
-            device__is_active=True
-        ).select_related('device').order_by(ordering)[:limit]
-        
-        # Count total readings and devices
-        total_readings = SensorReadings.objects.filter(
-            device__hive=hive,
-            device__is_active=True
-        ).count()
+        # Get sensor readings from all devices assigned to this hive,
+        # optionally limited to a timestamp_after/timestamp_before window
+        readings_filter = SensorReadingsFilter(
+            request.GET,
+            queryset=SensorReadings.objects.filter(
+                device__hive=hive,
+                device__is_active=True
+            )
+        )
+        if not readings_filter.is_valid():
+            return Response(readings_filter.errors, status=status.HTTP_400_BAD_REQUEST)
+        hive_readings = readings_filter.qs
         
         device_count = hive.smart_devices.filter(is_active=True).count()
         
+        # Chart modes: aggregate into time buckets or pick representative points
+        bucket = request.GET.get('bucket')
+        downsample = request.GET.get('downsample')
+        if bucket or downsample:
+            return self.downsampled_sensor_readings(
+                request, hive, device_count, readings_filter, bucket, downsample
+            )
+        
+        readings = hive_readings.select_related('device').order_by(ordering)[:limit]
+        
+        # Count total readings
+        total_readings = hive_readings.count()
+        
+        # Windows reaching into archived months also read the archive files
+        timestamp_after = readings_filter.form.cleaned_data.get('timestamp_after')
+        if timestamp_after:
+            devices = readings_filter.filter_devices(hive.smart_devices.filter(is_active=True))
+            archived, archived_count = SensorReadingsArchiveReader().read_first(
+                devices, timestamp_after, readings_filter.form.cleaned_data.get('timestamp_before'),
+                ordering=ordering, limit=limit
+            )
+            if archived:
+                total_readings += archived_count
+                field = ordering.lstrip('-')
+                readings = sorted(
+                    list(readings) + archived,
+                    key=lambda reading: (getattr(reading, field) is None, getattr(reading, field)),
+                    reverse=ordering.startswith('-')
+                )[:limit]
+        
         # Serialize the readings
         serializer = SensorReadingsSerializer(readings, many=True)
         
@@ -536,24 +515,132 @@ class HivesViewSet(viewsets.ModelViewSet):
             'readings': serializer.data
         })
     
+    def downsampled_sensor_readings(self, request, hive, device_count, readings_filter, bucket, downsample):
+        """Sensor readings of a hive reduced to chart resolution (bucket=5m|1h|1d or downsample=lttb)"""
+        from devices.serializers import SensorReadingsSerializer
+        from devices.services.downsampling import BUCKET_WIDTHS, SensorReadingsDownsampler
+        from devices.services.rollups import ROLLUP_METRICS
+        
+        if bucket and downsample:
+            return Response(
+                {'error': 'Use either bucket or downsample, not both'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if bucket and bucket not in BUCKET_WIDTHS:
+            return Response(
+                {'bucket': [f"Must be one of: {', '.join(BUCKET_WIDTHS)}"]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if downsample and downsample != 'lttb':
+            return Response(
+                {'downsample': ['Must be: lttb']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Devices of this hive, narrowed by the device filters of the request
+        devices = readings_filter.filter_devices(hive.smart_devices.filter(is_active=True))
+        filters = readings_filter.form.cleaned_data
+        
+        downsampler = SensorReadingsDownsampler()
+        start, end = downsampler.window(
+            bucket or downsample,
+            filters.get('timestamp_after'),
+            filters.get('timestamp_before')
+        )
+        
+        response = {
+            'hive_id': str(hive.id),
+            'hive_name': hive.name,
+            'device_count': device_count,
+            'start': start,
+            'end': end,
+        }
+        
+        if bucket:
+            buckets = downsampler.buckets(devices, bucket, start, end)
+            response.update({
+                'bucket': bucket,
+                'total_readings': sum(item['count'] for item in buckets),
+                'buckets': buckets
+            })
+            return Response(response)
+        
+        metric = request.GET.get('metric', 'temperature')
+        if metric not in ROLLUP_METRICS:
+            return Response(
+                {'metric': [f"Must be one of: {', '.join(ROLLUP_METRICS)}"]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            points = int(request.GET.get('points', 500))
+        except ValueError:
+            points = 0
+        if not 3 <= points <= 5000:
+            return Response(
+                {'points': ['Must be a number between 3 and 5000']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        readings, total_readings = downsampler.lttb_readings(devices, metric, points, start, end)
+        response.update({
+            'downsample': {'method': 'lttb', 'metric': metric, 'points': points},
+            'total_readings': total_readings,
+            'readings': SensorReadingsSerializer(readings, many=True).data
+        })
+        return Response(response)
+    
+    @action(detail=True, methods=['get'])
+    def analytics(self, request, pk=None):
+        """Daily weight changes, rolling means, nectar flows and summary statistics of a hive's readings"""
+        hive = self.get_object()
+        
+        from devices.filters import SensorReadingsFilter
+        from devices.models import SensorReadings
+        from devices.services.analytics import HiveAnalyticsService, NECTAR_FLOW_MIN_DAILY_GAIN_KG
+        from datetime import timedelta
+        
+        readings_filter = SensorReadingsFilter(request.GET, queryset=SensorReadings.objects.none())
+        if not readings_filter.is_valid():
+            return Response(readings_filter.errors, status=status.HTTP_400_BAD_REQUEST)
+        filters = readings_filter.form.cleaned_data
+        
+        try:
+            rolling_hours = float(request.GET.get('rolling_hours', 24))
+            min_daily_gain = float(request.GET.get('min_daily_gain', NECTAR_FLOW_MIN_DAILY_GAIN_KG))
+        except ValueError:
+            rolling_hours = min_daily_gain = -1
+        if not 0 < rolling_hours <= 24 * 90 or min_daily_gain < 0:
+            return Response(
+                {'error': 'rolling_hours must be between 0 and 2160 and min_daily_gain must not be negative'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        analytics = HiveAnalyticsService().analyze(
+            hive,
+            start=filters.get('timestamp_after'),
+            end=filters.get('timestamp_before'),
+            rolling_window=timedelta(hours=rolling_hours),
+            min_daily_gain=min_daily_gain
+        )
+        return Response(analytics.as_dict())
+    
     @action(detail=True, methods=['get'])
     def latest_sensor_reading(self, request, pk=None):
         """Get the latest sensor reading for a specific hive"""
         hive = self.get_object()
         
-        from devices.models import SensorReadings
-        from devices.serializers import SensorReadingsSerializer
+        from devices.models import HiveLatestReading
+        from devices.serializers import HiveLatestReadingSerializer
         
         # Get the most recent sensor reading from any device assigned to this hive
-        latest_reading = SensorReadings.objects.filter(
-            device__hive=hive,
-            device__is_active=True
-        ).select_related('device').order_by('-timestamp').first()
+        latest_reading = HiveLatestReading.objects.filter(
+            hive=hive
+        ).select_related('device', 'hive').first()
         
         # Serialize the reading if it exists
         latest_reading_data = None
         if latest_reading:
-            latest_reading_data = SensorReadingsSerializer(latest_reading).data
+            latest_reading_data = HiveLatestReadingSerializer(latest_reading).data
         
         return Response({
             'hive_id': str(hive.id),
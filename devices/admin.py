@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import SmartDevices, SensorReadings, AudioRecordings, DeviceImages
+from .models import (
+    SmartDevices, SensorReadings, HiveLatestReading, SensorReadingsHourly, SensorReadingsDaily,
+    SensorReadingsArchive, DeviceReadingCounter, DeviceReadingHourlyCount, JobWatermark, AudioRecordings, DeviceImages
+)
 
 
 @admin.register(SmartDevices)
@@ -59,6 +62,59 @@ class SensorReadingsAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(HiveLatestReading)
+class HiveLatestReadingAdmin(admin.ModelAdmin):
+    list_display = ['hive', 'device', 'timestamp', 'temperature', 'humidity', 'weight', 'battery_level', 'updated_at']
+    search_fields = ['hive__name', 'device__serial_number']
+    readonly_fields = [field.name for field in HiveLatestReading._meta.fields]
+    list_per_page = 50
+    ordering = ['-timestamp']
+
+
+@admin.register(SensorReadingsHourly, SensorReadingsDaily)
+class SensorReadingsRollupAdmin(admin.ModelAdmin):
+    list_display = ['device', 'bucket', 'reading_count', 'temperature_min', 'temperature_max', 'weight_last', 'updated_at']
+    search_fields = ['device__serial_number']
+    list_per_page = 50
+    ordering = ['-bucket']
+    
+    def get_readonly_fields(self, request, obj=None):
+        return [field.name for field in self.model._meta.fields]
+
+
+@admin.register(SensorReadingsArchive)
+class SensorReadingsArchiveAdmin(admin.ModelAdmin):
+    list_display = ['device', 'month', 'row_count', 'size_bytes', 'file_path', 'updated_at']
+    search_fields = ['device__serial_number']
+    readonly_fields = [field.name for field in SensorReadingsArchive._meta.fields]
+    list_per_page = 50
+    ordering = ['-month']
+
+
+@admin.register(DeviceReadingCounter)
+class DeviceReadingCounterAdmin(admin.ModelAdmin):
+    list_display = ['device', 'total_readings', 'updated_at']
+    search_fields = ['device__serial_number']
+    readonly_fields = [field.name for field in DeviceReadingCounter._meta.fields]
+    list_per_page = 50
+    ordering = ['-total_readings']
+
+
+@admin.register(DeviceReadingHourlyCount)
+class DeviceReadingHourlyCountAdmin(admin.ModelAdmin):
+    list_display = ['device', 'bucket', 'reading_count']
+    search_fields = ['device__serial_number']
+    readonly_fields = [field.name for field in DeviceReadingHourlyCount._meta.fields]
+    list_per_page = 50
+    ordering = ['-bucket']
+
+
+@admin.register(JobWatermark)
+class JobWatermarkAdmin(admin.ModelAdmin):
+    list_display = ['name', 'watermark', 'updated_at']
+    readonly_fields = ['updated_at']
+
+
 @admin.register(AudioRecordings)
 class AudioRecordingsAdmin(admin.ModelAdmin):
     list_display = ['device', 'recorded_at', 'duration', 'file_size', 'upload_status', 'analysis_status', 'is_analyzed']
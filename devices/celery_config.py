@@ -0,0 +1,43 @@
+"""
+Celery configuration for the devices app.
+
+This module contains the Celery Beat schedule configuration for periodic tasks.
+"""
+
+from celery.schedules import crontab
+from datetime import timedelta
+from django.conf import settings
+
+# Celery Beat Schedule
+CELERY_BEAT_SCHEDULE = {
+    'flush-ingest-buffer': {
+        'task': 'devices.tasks.flush_ingest_buffer_task',
+        'schedule': timedelta(seconds=settings.SENSOR_INGEST_FLUSH_MAX_LATENCY),
+        'options': {
+            'expires': settings.SENSOR_INGEST_FLUSH_MAX_LATENCY,  # A later run will pick up the backlog
+        }
+    },
+    'refresh-sensor-rollups': {
+        'task': 'devices.tasks.refresh_sensor_rollups_task',
+        'schedule': crontab(minute='*'),  # Run every minute
+        'options': {
+            'expires': 60,
+        }
+    },
+    'prune-reading-counters': {
+        'task': 'devices.tasks.prune_reading_counters_task',
+        'schedule': crontab(hour=3, minute=0),  # Run daily at 3:00 AM
+    },
+    'enforce-data-retention': {
+        'task': 'devices.tasks.enforce_data_retention_task',
+        'schedule': crontab(hour=3, minute=30),  # Run daily at 3:30 AM
+    },
+    'archive-sensor-readings': {
+        'task': 'devices.tasks.archive_sensor_readings_task',
+        'schedule': crontab(hour=4, minute=0),  # Run daily at 4:00 AM, only when SENSOR_ARCHIVE_AFTER_DAYS is set
+    },
+    'maintain-sensor-partitions': {
+        'task': 'devices.tasks.maintain_sensor_partitions_task',
+        'schedule': crontab(hour=1, minute=15),  # Daily, well before the month rolls over
+    },
+}
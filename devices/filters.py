@@ -0,0 +1,45 @@
+import django_filters
+from django_filters import rest_framework as filters
+from .models import SensorReadings
+
+# Columns readings can be ordered by, both in the database and in archive files
+SENSOR_READING_ORDERING_FIELDS = [
+    'timestamp', 'created_at', 'temperature', 'humidity', 'weight', 'sound_level', 'battery_level'
+]
+
+
+class SensorReadingsFilter(filters.FilterSet):
+    """Filter set for sensor readings"""
+    
+    # Time window filters on the raw timestamp column, so PostgreSQL can
+    # prune the monthly partitions outside the window
+    timestamp_after = django_filters.IsoDateTimeFilter(
+        field_name='timestamp',
+        lookup_expr='gte',
+        label='Readings taken at or after (ISO 8601)'
+    )
+    timestamp_before = django_filters.IsoDateTimeFilter(
+        field_name='timestamp',
+        lookup_expr='lt',
+        label='Readings taken before (ISO 8601)'
+    )
+    
+    # Device filters
+    device_serial = django_filters.CharFilter(field_name='device__serial_number')
+    
+    class Meta:
+        model = SensorReadings
+        fields = [
+            'device', 'device__serial_number', 'device_serial',
+            'timestamp_after', 'timestamp_before'
+        ]
+    
+    def filter_devices(self, devices):
+        """Narrow a SmartDevices queryset by this filter's device filters (call after is_valid)"""
+        data = self.form.cleaned_data
+        if data.get('device'):
+            devices = devices.filter(id=data['device'].id)
+        serial_number = data.get('device_serial') or data.get('device__serial_number')
+        if serial_number:
+            devices = devices.filter(serial_number=serial_number)
+        return devices
@@ -0,0 +1,66 @@
+"""
+Django management command to move old sensor readings into the cold archive.
+
+Writes whole device-months older than the cutoff to compressed Arrow files
+under SENSOR_ARCHIVE_DIR and deletes them from the database. Requires pyarrow.
+
+Usage:
+    python manage.py archive_sensor_readings --older-than-days 400 --dry-run
+    python manage.py archive_sensor_readings --older-than-days 400
+    python manage.py archive_sensor_readings --older-than-days 400 --device-id <uuid>
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from datetime import timedelta
+
+from devices.services.archive import SensorReadingsArchiver, SensorReadingsArchiveError
+
+
+class Command(BaseCommand):
+    help = 'Move sensor readings older than a cutoff into compressed archive files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days',
+            type=int,
+            help='Archive whole months older than this many days (default: SENSOR_ARCHIVE_AFTER_DAYS)',
+        )
+        parser.add_argument(
+            '--device-id',
+            type=str,
+            help='Archive only a specific device by ID',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='List the device-months that would be archived',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            archiver = SensorReadingsArchiver()
+        except SensorReadingsArchiveError as e:
+            raise CommandError(str(e))
+
+        days = options.get('older_than_days')
+        if days is None:
+            days = settings.SENSOR_ARCHIVE_AFTER_DAYS
+        if days <= 0:
+            raise CommandError('Set --older-than-days or SENSOR_ARCHIVE_AFTER_DAYS to a positive number of days')
+
+        if options['dry_run']:
+            cutoff = timezone.now() - timedelta(days=days)
+            pending = archiver.pending(cutoff, options.get('device_id'))
+            for device_id, month, rows in pending:
+                self.stdout.write(f'{device_id}  {month:%Y-%m}  {rows} readings')
+            self.stdout.write(self.style.WARNING(
+                f'DRY RUN: would archive {sum(rows for *_, rows in pending)} readings into {len(pending)} files'
+            ))
+            return
+
+        totals = archiver.archive(older_than_days=days, device_id=options.get('device_id'))
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {totals['rows']} readings into {totals['files']} files ({totals['bytes']} bytes)"
+        ))
@@ -0,0 +1,191 @@
+"""
+Django management command to benchmark the vectorized hive analytics.
+
+Builds a synthetic hive series (a year of 5-minute readings by default) and
+times two implementations of the same analytics: the per-reading Python loop
+with float() conversions that smart_metrics used, fed Decimal rows as the ORM
+returns them, and ReadingSeries / HiveAnalytics from
+devices.services.analytics, fed the float rows HiveAnalyticsService loads (the
+query casts to float). Array construction and the vectorized passes are also
+reported separately. Both results are compared so the speed-up is not bought
+with different numbers. No database access is needed.
+
+Usage:
+    python manage.py benchmark_hive_analytics
+    python manage.py benchmark_hive_analytics --days 90 --interval 1 --repeat 5
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from collections import deque
+from datetime import timedelta
+from decimal import Decimal
+import math
+import random
+import time
+
+from devices.services.analytics import (
+    ReadingSeries, HiveAnalytics, ANALYTICS_METRICS, DEFAULT_ROLLING_WINDOW,
+    NECTAR_FLOW_MIN_DAILY_GAIN_KG, NECTAR_FLOW_MIN_DAYS, SECONDS_PER_DAY
+)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the NumPy hive analytics against the per-reading Python loop'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=365,
+            help='Days of readings (default: 365)',
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=5,
+            help='Minutes between readings (default: 5)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Runs per implementation; the fastest is reported (default: 3)',
+        )
+
+    def handle(self, *args, **options):
+        if options['days'] < 1 or options['interval'] < 1 or options['repeat'] < 1:
+            raise CommandError('--days, --interval and --repeat must be positive')
+
+        rows = self.make_rows(options['days'], options['interval'])
+        float_rows = [tuple(None if value is None else float(value) for value in row) for row in rows]
+        self.stdout.write(f"{len(rows)} readings ({options['days']} days every {options['interval']} min)\n")
+
+        repeat = options['repeat']
+        loop_seconds, loop_result = self.best_of(repeat, lambda: self.loop_analytics(rows))
+        numpy_seconds, analytics = self.best_of(repeat, lambda: HiveAnalytics(
+            None, ReadingSeries.from_rows(float_rows), None, None
+        ))
+        load_seconds, series = self.best_of(repeat, lambda: ReadingSeries.from_rows(float_rows))
+        compute_seconds, _ = self.best_of(repeat, lambda: HiveAnalytics(None, series, None, None))
+
+        self.stdout.write(f"{'implementation':<22} {'ms':>10} {'readings/s':>14}")
+        for name, seconds in (
+            ('python loop', loop_seconds),
+            ('numpy', numpy_seconds),
+            ('  rows to arrays', load_seconds),
+            ('  vectorized passes', compute_seconds),
+        ):
+            self.stdout.write(f'{name:<22} {seconds * 1000:>10.1f} {len(rows) / seconds:>14.0f}')
+
+        mismatches = self.compare(loop_result, analytics)
+        if mismatches:
+            for mismatch in mismatches:
+                self.stdout.write(self.style.ERROR(mismatch))
+            raise CommandError('The implementations disagree')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\nResults match; numpy is {loop_seconds / numpy_seconds:.1f}x faster '
+            f'({len(analytics.nectar_flows)} nectar flows, {len(analytics.days)} days)'
+        ))
+
+    def make_rows(self, days, interval):
+        """Return (unix seconds, temperature, humidity, weight, sound level, battery) rows as the database returns them."""
+        random.seed(42)
+        start = (timezone.now() - timedelta(days=days)).timestamp() // SECONDS_PER_DAY * SECONDS_PER_DAY
+        rows = []
+        weight = 30.0
+        for i in range(days * 24 * 60 // interval):
+            timestamp = start + i * interval * 60
+            day, hour = divmod(timestamp % (SECONDS_PER_DAY * 365), SECONDS_PER_DAY)
+            # Foragers leave by day and bring nectar home; spring and early summer flows add weight
+            season = math.sin(day / 365 * 2 * math.pi)
+            weight += (0.006 if season > 0.5 and 8 * 3600 < hour < 18 * 3600 else -0.0008) + random.uniform(-0.002, 0.002)
+            rows.append((
+                timestamp,
+                Decimal(f'{34 + 2 * math.sin(hour / SECONDS_PER_DAY * 2 * math.pi) + random.uniform(-0.5, 0.5):.2f}'),
+                Decimal(f'{55 + random.uniform(-5, 5):.2f}'),
+                Decimal(f'{weight:.2f}'),
+                random.randint(40, 80) if i % 3 else None,
+                max(5, 100 - i // 2000),
+            ))
+        return rows
+
+    def best_of(self, repeat, run):
+        best, result = None, None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = run()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    def loop_analytics(self, rows):
+        """The same analytics as plain Python over Decimal rows."""
+        summary = {}
+        for index, metric in enumerate(ANALYTICS_METRICS, start=1):
+            total, count, low, high = 0.0, 0, None, None
+            for row in rows:
+                if row[index] is not None:
+                    value = float(row[index])
+                    total += value
+                    count += 1
+                    low = value if low is None else min(low, value)
+                    high = value if high is None else max(high, value)
+            summary[metric] = {'count': count, 'mean': total / count if count else None, 'min': low, 'max': high}
+
+        close_by_day = {}
+        for row in rows:
+            if row[3] is not None:
+                close_by_day[int(row[0] // SECONDS_PER_DAY)] = float(row[3])
+        days = sorted(close_by_day)
+        deltas = [None] + [
+            close_by_day[day] - close_by_day[previous] if day - previous == 1 else None
+            for previous, day in zip(days, days[1:])
+        ]
+
+        flows, run = [], []
+        for day, delta in zip(days, deltas):
+            if delta is not None and delta >= NECTAR_FLOW_MIN_DAILY_GAIN_KG:
+                run.append((day, delta))
+                continue
+            if len(run) >= NECTAR_FLOW_MIN_DAYS:
+                flows.append((run[0][0], run[-1][0], sum(gain for _, gain in run)))
+            run = []
+        if len(run) >= NECTAR_FLOW_MIN_DAYS:
+            flows.append((run[0][0], run[-1][0], sum(gain for _, gain in run)))
+
+        rolling, window, window_total = [], deque(), 0.0
+        for row in rows:
+            if row[3] is not None:
+                window.append((row[0], float(row[3])))
+                window_total += float(row[3])
+            while window and window[0][0] <= row[0] - DEFAULT_ROLLING_WINDOW.total_seconds():
+                window_total -= window.popleft()[1]
+            rolling.append(window_total / len(window) if window else None)
+
+        return {'summary': summary, 'days': days, 'deltas': deltas, 'flows': flows, 'rolling_weight': rolling}
+
+    def compare(self, expected, analytics):
+        mismatches = []
+
+        def close(a, b):
+            if a is None or (isinstance(a, float) and math.isnan(a)):
+                return b is None or (isinstance(b, float) and math.isnan(b))
+            return b is not None and abs(a - b) < 1e-6 * max(1.0, abs(a))
+
+        for metric, stats in expected['summary'].items():
+            for name, value in stats.items():
+                if not close(value, analytics.summary[metric][name]):
+                    mismatches.append(f'summary {metric} {name}: {value} != {analytics.summary[metric][name]}')
+        if expected['days'] != [int(day) for day in analytics.days]:
+            mismatches.append('daily weight days differ')
+        elif not all(close(a, float(b)) for a, b in zip(expected['deltas'], analytics.weight_delta)):
+            mismatches.append('daily weight deltas differ')
+        if len(expected['flows']) != len(analytics.nectar_flows) or not all(
+            a[:2] == b[:2] and close(a[2], b[2]) for a, b in zip(expected['flows'], analytics.nectar_flows)
+        ):
+            mismatches.append(f"nectar flows differ: {expected['flows']} != {analytics.nectar_flows}")
+        if not all(close(a, float(b)) for a, b in zip(expected['rolling_weight'], analytics.rolling_weight)):
+            mismatches.append('rolling weight means differ')
+        return mismatches
@@ -0,0 +1,110 @@
+"""
+Django management command to benchmark ingest payload formats.
+
+Compares the JSON path (json.loads + SensorReadingsCreateSerializer per item)
+with the compact binary format (struct decoding straight into SensorReadings
+rows) on synthetic readings. No database access is needed: device serials are
+resolved from an in-memory map, exactly as the batch ingest service does after
+its single lookup.
+
+Usage:
+    python manage.py benchmark_ingest_formats
+    python manage.py benchmark_ingest_formats --readings 60 --repeat 500
+"""
+
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from datetime import timedelta
+from decimal import Decimal
+import json
+import random
+import time
+import uuid
+
+from devices.models import SmartDevices, SensorReadings
+from devices.serializers import SensorReadingsCreateSerializer
+from devices.services import binary_format
+
+
+class Command(BaseCommand):
+    help = 'Benchmark parse time and bytes per reading of the JSON and binary ingest formats'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--readings',
+            type=int,
+            default=60,
+            help='Readings per request (default: 60)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=200,
+            help='Number of requests to parse per format (default: 200)',
+        )
+
+    def handle(self, *args, **options):
+        count = options['readings']
+        repeat = options['repeat']
+        serial_number = 'BENCH-0001'
+        device = SmartDevices(id=uuid.uuid4(), serial_number=serial_number, is_active=True)
+
+        readings = self.make_readings(serial_number, count)
+        json_body = json.dumps(readings, cls=DjangoJSONEncoder).encode('utf-8')
+        binary_body = binary_format.encode_frame(serial_number, readings)
+
+        json_seconds = self.time_json(json_body, {serial_number: device}, repeat)
+        binary_seconds = self.time_binary(binary_body, device, repeat)
+
+        total = count * repeat
+        self.stdout.write(f'{count} readings per request, {repeat} requests per format\n')
+        self.stdout.write(f"{'format':<8} {'bytes/reading':>14} {'us/reading':>11} {'readings/s':>12}")
+        for name, body, seconds in (
+            ('json', json_body, json_seconds),
+            ('binary', binary_body, binary_seconds),
+        ):
+            self.stdout.write(
+                f'{name:<8} {len(body) / count:>14.1f} {seconds / total * 1e6:>11.2f} {total / seconds:>12.0f}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'\nBinary is {len(json_body) / len(binary_body):.1f}x smaller and '
+            f'{json_seconds / binary_seconds:.1f}x faster to parse'
+        ))
+
+    def make_readings(self, serial_number, count):
+        start = timezone.now().replace(microsecond=0) - timedelta(minutes=5 * count)
+        readings = []
+        for i in range(count):
+            readings.append({
+                'device_serial': serial_number,
+                'temperature': str(Decimal(random.uniform(30, 38)).quantize(Decimal('0.01'))),
+                'humidity': str(Decimal(random.uniform(40, 70)).quantize(Decimal('0.01'))),
+                'weight': str(Decimal(random.uniform(20, 60)).quantize(Decimal('0.01'))),
+                'sound_level': random.randint(40, 90),
+                'battery_level': random.randint(20, 100),
+                'status_code': 0,
+                'timestamp': start + timedelta(minutes=5 * i)
+            })
+        return readings
+
+    def time_json(self, body, devices_by_serial, repeat):
+        context = {'devices_by_serial': devices_by_serial}
+        started = time.perf_counter()
+        for _ in range(repeat):
+            for item in json.loads(body):
+                serializer = SensorReadingsCreateSerializer(data=item, context=context)
+                serializer.is_valid(raise_exception=True)
+                serializer.build_reading()
+        return time.perf_counter() - started
+
+    def time_binary(self, body, device, repeat):
+        received_at = timezone.now()
+        started = time.perf_counter()
+        for _ in range(repeat):
+            batch = binary_format.decode_frames(body)
+            for _, records in batch.frames:
+                for record in records:
+                    fields, errors = binary_format.record_to_fields(record, received_at)
+                    SensorReadings(device=device, **fields)
+        return time.perf_counter() - started
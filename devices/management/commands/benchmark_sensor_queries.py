@@ -0,0 +1,378 @@
+"""
+Django management command to benchmark the hot SensorReadings queries.
+
+Seeds a synthetic fleet of benchmark devices with millions of readings, then
+runs the queries behind AlertChecker, HivesViewSet.sensor_readings and
+device_stats. For each query it records the EXPLAIN ANALYZE plan and the
+latency distribution, and writes the results to a JSON report. Comparing a
+report against a baseline flags any query that got slower than the tolerance.
+
+Typical before/after run:
+    python manage.py migrate devices 0002
+    python manage.py benchmark_sensor_queries --seed --rows 2000000 --label before
+    python manage.py migrate devices
+    python manage.py benchmark_sensor_queries --label after --baseline var/benchmarks/sensor_queries_before.json
+
+Requires PostgreSQL. Benchmark data is owned by a dedicated user and can be
+removed with --cleanup.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from datetime import date, timedelta
+from pathlib import Path
+import json
+import statistics
+import time
+
+from accounts.models import User, BeekeeperProfile
+from apiaries.models import Apiaries, Hives
+from devices.models import SmartDevices, SensorReadings
+
+BENCHMARK_EMAIL = 'sensor-benchmark@smart-nyuki.local'
+BENCHMARK_SERIAL_PREFIX = 'BENCH-'
+READING_INTERVAL_MINUTES = 5
+
+
+class Command(BaseCommand):
+    help = 'Benchmark plans and latencies of the hot SensorReadings queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed',
+            action='store_true',
+            help='Replace the benchmark devices and readings before running',
+        )
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=1000000,
+            help='Readings to seed in total (default: 1000000)',
+        )
+        parser.add_argument(
+            '--devices',
+            type=int,
+            default=100,
+            help='Benchmark devices to seed, one per hive (default: 100)',
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=50,
+            help='Timed executions per query (default: 50)',
+        )
+        parser.add_argument(
+            '--label',
+            type=str,
+            default='current',
+            help='Name of this run, used in the report file name',
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            help='Report path (default: var/benchmarks/sensor_queries_<label>.json)',
+        )
+        parser.add_argument(
+            '--baseline',
+            type=str,
+            help='Earlier report to compare against; exits non-zero on regressions',
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.25,
+            help='Allowed relative p50 slowdown against the baseline (default: 0.25)',
+        )
+        parser.add_argument(
+            '--min-delta-ms',
+            type=float,
+            default=0.5,
+            help='Ignore slowdowns smaller than this many milliseconds (default: 0.5)',
+        )
+        parser.add_argument(
+            '--cleanup',
+            action='store_true',
+            help='Delete the benchmark user, devices and readings and exit',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('benchmark_sensor_queries requires PostgreSQL')
+
+        if options['cleanup']:
+            self.cleanup()
+            return
+
+        if options['seed']:
+            self.cleanup()
+            self.seed(options['rows'], options['devices'])
+
+        devices = list(
+            SmartDevices.objects.filter(
+                serial_number__startswith=BENCHMARK_SERIAL_PREFIX
+            ).order_by('serial_number')
+        )
+        if not devices:
+            raise CommandError('No benchmark data found, run with --seed first')
+
+        # Fresh planner statistics so before/after runs differ only in schema
+        with connection.cursor() as cursor:
+            for model in (SmartDevices, SensorReadings):
+                cursor.execute(f'ANALYZE {connection.ops.quote_name(model._meta.db_table)}')
+
+        report = {
+            'label': options['label'],
+            'recorded_at': timezone.now().isoformat(),
+            'table_rows': self.estimated_rows(),
+            'indexes': self.index_definitions(),
+            'queries': {}
+        }
+
+        for name, build_queryset in self.queries(devices).items():
+            self.stdout.write(f'Running {name}...')
+            report['queries'][name] = self.measure(build_queryset, options['iterations'])
+
+        output = Path(options['output'] or Path(settings.BASE_DIR) / 'var' / 'benchmarks' / f"sensor_queries_{options['label']}.json")
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, indent=2))
+
+        self.print_report(report)
+        self.stdout.write(f'\nReport written to {output}')
+
+        if options['baseline']:
+            self.compare(report, options['baseline'], options['tolerance'], options['min_delta_ms'])
+
+    # Seeding
+
+    def seed(self, rows, device_count):
+        per_device = max(rows // device_count, 1)
+        self.stdout.write(f'Seeding {device_count} devices x {per_device} readings...')
+
+        with transaction.atomic():
+            user = User.objects.create(
+                email=BENCHMARK_EMAIL,
+                first_name='Sensor',
+                last_name='Benchmark',
+                is_active=False
+            )
+            beekeeper = BeekeeperProfile.objects.create(
+                user=user,
+                latitude=0,
+                longitude=0,
+                experience_level='Beginner',
+                established_date=date.today(),
+                app_start_date=date.today()
+            )
+            apiary = Apiaries.objects.create(beekeeper=beekeeper, name='Benchmark', latitude=0, longitude=0)
+            device_ids = []
+            for i in range(device_count):
+                hive = Hives.objects.create(apiary=apiary, name=f'Benchmark {i}', installation_date=date.today())
+                device = SmartDevices.objects.create(
+                    serial_number=f'{BENCHMARK_SERIAL_PREFIX}{i:05d}',
+                    beekeeper=beekeeper,
+                    hive=hive,
+                    device_type='benchmark'
+                )
+                device_ids.append(device.id)
+
+        # One statement per time slice across all devices, oldest first, so the
+        # physical row order matches what live ingest produces
+        table = connection.ops.quote_name(SensorReadings._meta.db_table)
+        end = timezone.now().replace(second=0, microsecond=0)
+        slice_size = max(200000 // len(device_ids), 1)
+        started = time.monotonic()
+        for high in range(per_device, 0, -slice_size):
+            low = max(high - slice_size + 1, 1)
+            with connection.cursor() as cursor:
+                cursor.execute(f"""
+                    INSERT INTO {table} (
+                        id, device_id, temperature, humidity, weight, sound_level,
+                        battery_level, status_code, sequence_number, timestamp, created_at
+                    )
+                    SELECT
+                        gen_random_uuid(), d.id,
+                        round((30 + random() * 8)::numeric, 2),
+                        round((45 + random() * 25)::numeric, 2),
+                        round((20 + random() * 40)::numeric, 2),
+                        (40 + random() * 50)::int,
+                        (20 + random() * 80)::int,
+                        0,
+                        %s - g.n,
+                        %s - g.n * interval '{READING_INTERVAL_MINUTES} minutes',
+                        %s - g.n * interval '{READING_INTERVAL_MINUTES} minutes'
+                    FROM generate_series(%s, %s) AS g(n)
+                    CROSS JOIN unnest(%s::uuid[]) AS d(id)
+                    ORDER BY g.n DESC
+                """, [per_device, end, end, low, high, device_ids])
+            self.stdout.write(f'  {per_device - low + 1}/{per_device} readings per device seeded')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {per_device * len(device_ids)} readings in {time.monotonic() - started:.1f}s'
+        ))
+
+    def cleanup(self):
+        deleted = SmartDevices.objects.filter(serial_number__startswith=BENCHMARK_SERIAL_PREFIX).delete()[0]
+        User.objects.filter(email=BENCHMARK_EMAIL).delete()
+        if deleted:
+            self.stdout.write(f'Removed previous benchmark data ({deleted} rows)')
+
+    # Queries
+
+    def queries(self, devices):
+        """The hot read paths, each as a zero-argument queryset factory."""
+        device = devices[len(devices) // 2]
+        now = timezone.now()
+        yesterday = now - timedelta(days=1)
+
+        return {
+            # AlertChecker.get_latest_sensor_reading
+            'latest_reading_for_hive': lambda: SensorReadings.objects.filter(
+                device__hive_id=device.hive_id,
+                device__is_active=True,
+                timestamp__gte=now - timedelta(hours=1)
+            ).order_by('-timestamp')[:1],
+            # SmartDevices detail / device_stats last reading
+            'latest_reading_for_device': lambda: SensorReadings.objects.filter(
+                device_id=device.id
+            ).order_by('-timestamp')[:1],
+            # device_stats readings_last_week
+            'device_window_count_7d': lambda: self.count_query(SensorReadings.objects.filter(
+                device_id=device.id,
+                timestamp__gte=now - timedelta(days=7)
+            )),
+            # HivesViewSet.sensor_readings
+            'hive_window_24h': lambda: SensorReadings.objects.filter(
+                device__hive_id=device.hive_id,
+                timestamp__gte=yesterday
+            ).order_by('-timestamp'),
+            # Weight change alert rule previous-day reading
+            'hive_previous_day_reading': lambda: SensorReadings.objects.filter(
+                device__hive_id=device.hive_id,
+                device__is_active=True,
+                timestamp__gte=yesterday - timedelta(days=1),
+                timestamp__lt=yesterday
+            ).order_by('-timestamp')[:1],
+            # Fleet-wide time window (rollups, exports)
+            'all_devices_window_1h': lambda: self.count_query(SensorReadings.objects.filter(
+                timestamp__gte=yesterday,
+                timestamp__lt=yesterday + timedelta(hours=1)
+            )),
+        }
+
+    @staticmethod
+    def count_query(queryset):
+        sql, params = queryset.order_by().values('id').query.sql_with_params()
+        return f'SELECT COUNT(*) FROM ({sql}) AS rows', params
+
+    def to_sql(self, query):
+        if isinstance(query, tuple):
+            return query
+        return query.query.sql_with_params()
+
+    def measure(self, build_queryset, iterations):
+        sql, params = self.to_sql(build_queryset())
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            plan = plan[0]
+
+            # Warm up once, then time the real statement
+            cursor.execute(sql, params)
+            cursor.fetchall()
+            timings = []
+            for _ in range(iterations):
+                started = time.perf_counter()
+                cursor.execute(sql, params)
+                rows = cursor.fetchall()
+                timings.append((time.perf_counter() - started) * 1000)
+
+        timings.sort()
+        return {
+            'sql': sql,
+            'rows_returned': len(rows),
+            'plan_summary': self.summarize_plan(plan['Plan']),
+            'plan_execution_ms': round(plan.get('Execution Time', 0), 3),
+            'shared_buffers_hit': plan['Plan'].get('Shared Hit Blocks', 0),
+            'shared_buffers_read': plan['Plan'].get('Shared Read Blocks', 0),
+            'latency_ms': {
+                'p50': round(statistics.median(timings), 3),
+                'p95': round(timings[min(int(len(timings) * 0.95), len(timings) - 1)], 3),
+                'mean': round(statistics.fmean(timings), 3),
+                'max': round(timings[-1], 3)
+            },
+            'plan': plan
+        }
+
+    def summarize_plan(self, node):
+        """Flatten a plan tree into 'Node Type [using index]' strings, outermost first."""
+        label = node['Node Type']
+        if node.get('Index Name'):
+            label += f" using {node['Index Name']}"
+        elif node.get('Relation Name'):
+            label += f" on {node['Relation Name']}"
+        summary = [label]
+        for child in node.get('Plans', []):
+            summary.extend(self.summarize_plan(child))
+        return summary
+
+    # Reporting
+
+    def estimated_rows(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE relname = %s',
+                [SensorReadings._meta.db_table]
+            )
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+    def index_definitions(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s ORDER BY indexname',
+                [SensorReadings._meta.db_table]
+            )
+            return dict(cursor.fetchall())
+
+    def print_report(self, report):
+        self.stdout.write(f"\n{report['label']}: ~{report['table_rows']} readings\n")
+        self.stdout.write(f"{'query':<28} {'p50 ms':>9} {'p95 ms':>9} {'rows':>7}  plan")
+        for name, result in report['queries'].items():
+            self.stdout.write(
+                f"{name:<28} {result['latency_ms']['p50']:>9.3f} {result['latency_ms']['p95']:>9.3f} "
+                f"{result['rows_returned']:>7}  {' > '.join(result['plan_summary'])}"
+            )
+
+    def compare(self, report, baseline_path, tolerance, min_delta_ms):
+        try:
+            baseline = json.loads(Path(baseline_path).read_text())
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Could not read baseline {baseline_path}: {str(e)}')
+
+        self.stdout.write(f"\nCompared with {baseline['label']} (tolerance {tolerance:.0%}):")
+        regressions = []
+        for name, result in report['queries'].items():
+            previous = baseline['queries'].get(name)
+            if previous is None:
+                continue
+            before = previous['latency_ms']['p50']
+            after = result['latency_ms']['p50']
+            change = (after - before) / before if before else 0
+            line = f'  {name:<28} {before:>9.3f} -> {after:>9.3f} ms ({change:+.0%})'
+            # Ignore jitter on queries that are already fast
+            if change > tolerance and after - before > min_delta_ms:
+                regressions.append(name)
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(self.style.SUCCESS(line))
+            if previous['plan_summary'] != result['plan_summary']:
+                self.stdout.write(f"    plan: {' > '.join(previous['plan_summary'])}")
+                self.stdout.write(f"       -> {' > '.join(result['plan_summary'])}")
+
+        if regressions:
+            raise CommandError(f"Query regressions against {baseline['label']}: {', '.join(regressions)}")
@@ -0,0 +1,75 @@
+"""
+Django management command to enforce per-user data retention.
+
+Deletes sensor readings, audio recordings and device images older than each
+user's DataSyncSettings.data_retention_days, in chunks with pauses between
+them. An interrupted run resumes after the last finished user.
+
+Usage:
+    python manage.py enforce_data_retention --dry-run
+    python manage.py enforce_data_retention
+    python manage.py enforce_data_retention --user-id <uuid>
+    python manage.py enforce_data_retention --chunk-size 1000 --sleep 2
+    python manage.py enforce_data_retention --restart
+"""
+
+from django.core.management.base import BaseCommand
+
+from devices.services.retention import DataRetentionService, RETENTION_TARGETS
+
+
+class Command(BaseCommand):
+    help = "Delete user data older than each user's data retention period"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would be deleted without deleting anything',
+        )
+        parser.add_argument(
+            '--user-id',
+            type=str,
+            help='Enforce retention for a specific user by ID',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            help='Rows deleted per statement (default: DATA_RETENTION_CHUNK_SIZE)',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            help='Seconds to pause between chunks (default: DATA_RETENTION_SLEEP_SECONDS)',
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Start from the first user instead of resuming an interrupted run',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        service = DataRetentionService(
+            chunk_size=options.get('chunk_size'),
+            sleep_seconds=options.get('sleep'),
+            dry_run=dry_run,
+        )
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING('DRY RUN MODE - No data will be deleted'))
+
+        report = service.run(user_id=options.get('user_id'), restart=options['restart'])
+
+        keys = [key for key, *_ in RETENTION_TARGETS] + ['archived_readings', 'latest_snapshots']
+        totals = dict.fromkeys(keys, 0)
+        for item in report:
+            counts = ', '.join(f'{key}={item[key]}' for key in keys)
+            self.stdout.write(f"{item['email']} ({item['retention_days']} days, before {item['cutoff']}): {counts}")
+            for key in keys:
+                totals[key] += item[key]
+
+        verb = 'Would delete' if dry_run else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} for {len(report)} users: " + ', '.join(f'{key}={count}' for key, count in totals.items())
+        ))
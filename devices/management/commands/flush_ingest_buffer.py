@@ -0,0 +1,69 @@
+"""
+Django management command to flush the write-behind ingest spool.
+
+Use this as the background flusher when Celery is not deployed, or to drain
+the spool by hand.
+
+Usage:
+    python manage.py flush_ingest_buffer
+    python manage.py flush_ingest_buffer --loop
+    python manage.py flush_ingest_buffer --stats
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+import json
+import time
+
+from devices.services.ingest_buffer import IngestSpool
+
+
+class Command(BaseCommand):
+    help = 'Insert readings queued by write-behind ingest into SensorReadings'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running and flush every SENSOR_INGEST_FLUSH_MAX_LATENCY seconds',
+        )
+        parser.add_argument(
+            '--stats',
+            action='store_true',
+            help='Print spool backlog and flush metrics and exit',
+        )
+
+    def handle(self, *args, **options):
+        spool = IngestSpool()
+
+        if options['stats']:
+            self.stdout.write(json.dumps(spool.stats(), indent=2))
+            return
+
+        if not options['loop']:
+            self.report(spool.flush())
+            return
+
+        interval = settings.SENSOR_INGEST_FLUSH_MAX_LATENCY
+        self.stdout.write(f'Flushing ingest spool {spool.directory} every {interval}s (Ctrl+C to stop)')
+        try:
+            while True:
+                started = time.monotonic()
+                totals = spool.flush()
+                if totals['batches']:
+                    self.report(totals)
+                time.sleep(max(interval - (time.monotonic() - started), 0))
+        except KeyboardInterrupt:
+            self.stdout.write('Stopped.')
+
+    def report(self, totals):
+        message = (
+            f"Flushed {totals['rows_flushed']} readings in {totals['batches']} batches "
+            f"({totals['duration_ms']}ms), skipped {totals['rows_duplicate']} duplicates, "
+            f"dropped {totals['rows_dropped']} orphaned, "
+            f"{totals['segments_failed']} segments failed"
+        )
+        if totals['segments_failed']:
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS(message))
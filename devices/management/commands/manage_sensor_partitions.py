@@ -0,0 +1,94 @@
+"""
+Django management command to maintain monthly SensorReadings partitions.
+
+Creates partitions ahead of time and detaches/drops partitions older than the
+retention window. Runs daily from Celery Beat; use this to inspect partitions
+or to run maintenance by hand.
+
+Usage:
+    python manage.py manage_sensor_partitions --list
+    python manage.py manage_sensor_partitions
+    python manage.py manage_sensor_partitions --months-ahead 6 --retain-months 24
+    python manage.py manage_sensor_partitions --retain-months 24 --keep-detached
+    python manage.py manage_sensor_partitions --retain-months 24 --dry-run
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from devices.services.partitions import SensorReadingsPartitionManager, month_start, add_months
+
+
+class Command(BaseCommand):
+    help = 'Create future SensorReadings partitions and drop expired ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months-ahead',
+            type=int,
+            help='Months of partitions to keep created ahead (default: SENSOR_READINGS_PARTITION_MONTHS_AHEAD)',
+        )
+        parser.add_argument(
+            '--retain-months',
+            type=int,
+            help='Drop partitions older than this many months, 0 keeps all (default: SENSOR_READINGS_RETENTION_MONTHS)',
+        )
+        parser.add_argument(
+            '--keep-detached',
+            action='store_true',
+            help='Detach expired partitions but keep them as standalone tables',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show what would be created and dropped without changing anything',
+        )
+        parser.add_argument(
+            '--list',
+            action='store_true',
+            help='List partitions with their row counts',
+        )
+
+    def handle(self, *args, **options):
+        manager = SensorReadingsPartitionManager(
+            months_ahead=options.get('months_ahead'),
+            retention_months=options.get('retain_months'),
+        )
+
+        if not manager.is_partitioned():
+            raise CommandError(
+                f'{manager.table} is not partitioned; partitioning requires PostgreSQL and migration devices 0005'
+            )
+
+        if options['list']:
+            self.list_partitions(manager)
+            return
+
+        if options['dry_run']:
+            current = month_start(timezone.now())
+            existing = manager.partitions()
+            for offset in range(manager.months_ahead + 1):
+                start = add_months(current, offset)
+                if start not in existing:
+                    self.stdout.write(f'Would create {manager.partition_name(start)}')
+            for name in manager.expired_partitions().values():
+                action = 'detach' if options['keep_detached'] else 'drop'
+                self.stdout.write(f'Would {action} {name} ({manager.row_count(name)} rows)')
+            return
+
+        result = manager.maintain(keep_detached=options['keep_detached'])
+
+        for name in result['created']:
+            self.stdout.write(f'Created {name}')
+        for name in result['dropped']:
+            self.stdout.write(f"{'Detached' if options['keep_detached'] else 'Dropped'} {name}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Partition maintenance complete: {len(result['created'])} created, "
+            f"{len(result['dropped'])} removed"
+        ))
+
+    def list_partitions(self, manager):
+        for start, name in manager.partitions().items():
+            self.stdout.write(f'{start:%Y-%m}  {name}  {manager.row_count(name)} rows')
+        self.stdout.write(f'default  {manager.default_partition}  {manager.row_count(manager.default_partition)} rows')
@@ -0,0 +1,38 @@
+"""
+Django management command to rebuild the per-hive latest reading snapshot.
+
+The snapshot is maintained on ingest and by the device signals; run this after
+bulk data fixes or restores that bypass both.
+
+Usage:
+    python manage.py rebuild_hive_latest_readings
+    python manage.py rebuild_hive_latest_readings --hive-id <uuid>
+"""
+
+from django.core.management.base import BaseCommand
+
+from devices.services.latest_reading import LatestReadingSnapshotService
+
+
+class Command(BaseCommand):
+    help = 'Recompute HiveLatestReading from SensorReadings'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hive-id',
+            type=str,
+            help='Rebuild only a specific hive by ID',
+        )
+
+    def handle(self, *args, **options):
+        service = LatestReadingSnapshotService()
+
+        if options.get('hive_id'):
+            refreshed = service.refresh({options['hive_id']})
+            self.stdout.write(self.style.SUCCESS(f'Refreshed {refreshed} hive snapshot'))
+            return
+
+        refreshed, stale = service.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {refreshed} hive snapshots, removed {stale} stale snapshots'
+        ))
@@ -0,0 +1,39 @@
+"""
+Django management command to rebuild the per-device reading counters.
+
+The counters are maintained on ingest, by data retention and by partition
+maintenance; run this after bulk data fixes or restores that bypass them.
+
+Usage:
+    python manage.py rebuild_reading_counters
+    python manage.py rebuild_reading_counters --device-id <uuid>
+"""
+
+from django.core.management.base import BaseCommand
+
+from devices.models import SmartDevices
+from devices.services.reading_counters import DeviceReadingCounterService
+
+
+class Command(BaseCommand):
+    help = 'Recompute DeviceReadingCounter and DeviceReadingHourlyCount from SensorReadings'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--device-id',
+            type=str,
+            help='Rebuild only a specific device by ID',
+        )
+
+    def handle(self, *args, **options):
+        service = DeviceReadingCounterService()
+
+        devices = SmartDevices.objects.all()
+        if options.get('device_id'):
+            devices = devices.filter(id=options['device_id'])
+
+        rebuilt = service.rebuild(devices)
+        pruned = service.prune()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt reading counters of {rebuilt} devices, pruned {pruned} expired hourly counts'
+        ))
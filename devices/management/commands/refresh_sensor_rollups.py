@@ -0,0 +1,41 @@
+"""
+Django management command to update the hourly and daily sensor rollups.
+
+Runs the same incremental job as the Celery task. Use --rebuild after bulk
+data fixes or restores, or to backfill the rollups from existing readings.
+
+Usage:
+    python manage.py refresh_sensor_rollups
+    python manage.py refresh_sensor_rollups --rebuild
+    python manage.py refresh_sensor_rollups --lag-seconds 0
+"""
+
+from django.core.management.base import BaseCommand
+
+from devices.services.rollups import SensorReadingsRollupService
+
+
+class Command(BaseCommand):
+    help = 'Merge newly stored sensor readings into the hourly and daily rollups'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Delete all rollups and recompute them from every stored reading',
+        )
+        parser.add_argument(
+            '--lag-seconds',
+            type=int,
+            help='Leave readings stored in the last N seconds for the next run (default: SENSOR_ROLLUP_LAG_SECONDS)',
+        )
+
+    def handle(self, *args, **options):
+        service = SensorReadingsRollupService(lag_seconds=options.get('lag_seconds'))
+
+        totals = service.rebuild() if options['rebuild'] else service.run()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rolled up {totals['readings']} readings in {totals['chunks']} chunks "
+            f"({totals['duration_ms']}ms), watermark {service.watermark()}"
+        ))
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:35
+
+from django.db import migrations, models
+from django.db.models import Count
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def remove_duplicate_readings(apps, schema_editor):
+    """Keep the first stored reading per (device, timestamp) before adding the unique constraint"""
+    SensorReadings = apps.get_model('devices', 'SensorReadings')
+    
+    duplicates = SensorReadings.objects.values('device_id', 'timestamp').annotate(
+        copies=Count('id')
+    ).filter(copies__gt=1)
+    
+    removed = 0
+    for duplicate in duplicates.iterator():
+        keep_id = SensorReadings.objects.filter(
+            device_id=duplicate['device_id'],
+            timestamp=duplicate['timestamp']
+        ).order_by('created_at', 'id').values_list('id', flat=True).first()
+        removed += SensorReadings.objects.filter(
+            device_id=duplicate['device_id'],
+            timestamp=duplicate['timestamp']
+        ).exclude(id=keep_id).delete()[0]
+    
+    if removed:
+        logger.info(f"Removed {removed} duplicate sensor readings")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sensorreadings',
+            name='sequence_number',
+            field=models.BigIntegerField(blank=True, help_text='Monotonic per-device counter sent by the device, used to drop retried readings', null=True),
+        ),
+        migrations.RunPython(
+            remove_duplicate_readings,
+            migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='sensorreadings',
+            constraint=models.UniqueConstraint(fields=('device', 'timestamp'), name='unique_sensor_reading_device_timestamp'),
+        ),
+        migrations.AddConstraint(
+            model_name='sensorreadings',
+            constraint=models.UniqueConstraint(condition=models.Q(('sequence_number__isnull', False)), fields=('device', 'sequence_number'), name='unique_sensor_reading_device_sequence'),
+        ),
+    ]
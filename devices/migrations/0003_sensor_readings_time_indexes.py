@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:38
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0002_sensor_readings_idempotency'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sensorreadings',
+            index=django.contrib.postgres.indexes.BrinIndex(fields=['timestamp'], name='sensor_readings_ts_brin'),
+        ),
+    ]
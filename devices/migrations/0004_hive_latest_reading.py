@@ -0,0 +1,82 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def backfill_hive_latest_readings(apps, schema_editor):
+    """Create the snapshot of every hive with an active device from its newest reading"""
+    SmartDevices = apps.get_model('devices', 'SmartDevices')
+    SensorReadings = apps.get_model('devices', 'SensorReadings')
+    HiveLatestReading = apps.get_model('devices', 'HiveLatestReading')
+    
+    hive_ids = set(
+        SmartDevices.objects.filter(is_active=True, hive__isnull=False).values_list('hive_id', flat=True)
+    )
+    snapshots = []
+    for hive_id in hive_ids:
+        latest = SensorReadings.objects.filter(
+            device__hive_id=hive_id,
+            device__is_active=True
+        ).order_by('-timestamp').first()
+        if latest:
+            snapshots.append(HiveLatestReading(
+                hive_id=hive_id,
+                device_id=latest.device_id,
+                reading_id=latest.id,
+                temperature=latest.temperature,
+                humidity=latest.humidity,
+                weight=latest.weight,
+                sound_level=latest.sound_level,
+                battery_level=latest.battery_level,
+                status_code=latest.status_code,
+                sequence_number=latest.sequence_number,
+                timestamp=latest.timestamp,
+                created_at=latest.created_at,
+                updated_at=timezone.now()
+            ))
+    
+    HiveLatestReading.objects.bulk_create(snapshots, batch_size=500)
+    if snapshots:
+        logger.info(f"Created {len(snapshots)} hive latest reading snapshots")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apiaries', '0001_initial'),
+        ('devices', '0003_sensor_readings_time_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HiveLatestReading',
+            fields=[
+                ('hive', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='latest_reading_snapshot', serialize=False, to='apiaries.hives')),
+                ('reading_id', models.UUIDField()),
+                ('temperature', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('humidity', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('weight', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('sound_level', models.IntegerField(blank=True, null=True)),
+                ('battery_level', models.IntegerField(blank=True, null=True)),
+                ('status_code', models.IntegerField(blank=True, null=True)),
+                ('sequence_number', models.BigIntegerField(blank=True, null=True)),
+                ('timestamp', models.DateTimeField()),
+                ('created_at', models.DateTimeField(help_text='When the reading was stored')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('device', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='devices.smartdevices')),
+            ],
+            options={
+                'verbose_name': 'Hive Latest Reading',
+                'verbose_name_plural': 'Hive Latest Readings',
+            },
+        ),
+        migrations.RunPython(
+            backfill_hive_latest_readings,
+            migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,130 @@
+# Convert devices_sensorreadings into a table range partitioned by month
+
+from datetime import datetime, timezone as dt_timezone
+from django.db import migrations
+import logging
+
+logger = logging.getLogger(__name__)
+
+TABLE = 'devices_sensorreadings'
+LEGACY_TABLE = 'devices_sensorreadings_unpartitioned'
+SEQUENCE_INDEX = 'unique_sensor_reading_device_sequence'
+
+# Months before this many months ago stay in the default partition, so a
+# device with a broken clock cannot make us create hundreds of partitions
+MAX_HISTORY_MONTHS = 36
+MONTHS_AHEAD = 3
+
+
+def month_start(value):
+    value = value.astimezone(dt_timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(value, months):
+    month_index = value.year * 12 + value.month - 1 + months
+    return value.replace(year=month_index // 12, month=month_index % 12 + 1)
+
+
+def create_sequence_index(cursor, quote, partition):
+    cursor.execute(
+        f'CREATE UNIQUE INDEX {quote(partition + "_device_sequence_uniq")} '
+        f'ON {quote(partition)} (device_id, sequence_number) WHERE sequence_number IS NOT NULL'
+    )
+
+
+def partition_sensor_readings(apps, schema_editor):
+    """
+    Rebuild the readings table as a monthly range-partitioned table.
+
+    PostgreSQL only. The primary key becomes (id, timestamp) because a
+    partitioned table's unique constraints must include the partition key;
+    (device, sequence_number) uniqueness moves onto each partition.
+    """
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+
+    quote = schema_editor.quote_name
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [TABLE])
+        if cursor.fetchone()[0] == 'p':
+            return
+
+        # Capture constraint and index definitions to recreate them on the new table
+        cursor.execute(
+            "SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = to_regclass(%s)",
+            [TABLE]
+        )
+        constraints = cursor.fetchall()
+        cursor.execute(
+            """
+            SELECT index_class.relname, pg_get_indexdef(index_class.oid)
+            FROM pg_index
+            JOIN pg_class index_class ON index_class.oid = pg_index.indexrelid
+            WHERE pg_index.indrelid = to_regclass(%s)
+            AND NOT EXISTS (SELECT 1 FROM pg_constraint WHERE pg_constraint.conindid = pg_index.indexrelid)
+            """,
+            [TABLE]
+        )
+        indexes = cursor.fetchall()
+
+        cursor.execute(f'SELECT MIN(timestamp) FROM {quote(TABLE)}')
+        oldest = cursor.fetchone()[0]
+
+        current = month_start(datetime.now(dt_timezone.utc))
+        first = max(month_start(oldest) if oldest else current, add_months(current, -MAX_HISTORY_MONTHS))
+
+        cursor.execute(f'ALTER TABLE {quote(TABLE)} RENAME TO {quote(LEGACY_TABLE)}')
+        cursor.execute(
+            f'CREATE TABLE {quote(TABLE)} (LIKE {quote(LEGACY_TABLE)} INCLUDING DEFAULTS) '
+            f'PARTITION BY RANGE (timestamp)'
+        )
+
+        partitions = [TABLE + '_default']
+        cursor.execute(f'CREATE TABLE {quote(TABLE + "_default")} PARTITION OF {quote(TABLE)} DEFAULT')
+        start = first
+        while start <= add_months(current, MONTHS_AHEAD):
+            partition = f'{TABLE}_p{start.year}{start.month:02d}'
+            cursor.execute(
+                f'CREATE TABLE {quote(partition)} PARTITION OF {quote(TABLE)} FOR VALUES FROM (%s) TO (%s)',
+                [start, add_months(start, 1)]
+            )
+            partitions.append(partition)
+            start = add_months(start, 1)
+
+        cursor.execute(f'INSERT INTO {quote(TABLE)} SELECT * FROM {quote(LEGACY_TABLE)}')
+        copied = cursor.rowcount
+        cursor.execute(f'DROP TABLE {quote(LEGACY_TABLE)}')
+
+        # Constraints and indexes are created on the parent and cascade to every partition
+        for name, contype, definition in constraints:
+            if contype == 'p':
+                definition = 'PRIMARY KEY (id, "timestamp")'
+            cursor.execute(f'ALTER TABLE {quote(TABLE)} ADD CONSTRAINT {quote(name)} {definition}')
+
+        for name, definition in indexes:
+            if name == SEQUENCE_INDEX:
+                continue
+            cursor.execute(definition)
+
+        for partition in partitions:
+            create_sequence_index(cursor, quote, partition)
+
+    logger.info(f"Partitioned {TABLE} into {len(partitions) - 1} monthly partitions ({copied} rows copied)")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0004_hive_latest_reading'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            partition_sensor_readings,
+            migrations.RunPython.noop,
+            elidable=False
+        ),
+    ]
@@ -0,0 +1,132 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:48
+
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0005_partition_sensor_readings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobWatermark',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('watermark', models.DateTimeField(blank=True, help_text='Everything up to this point has been processed', null=True)),
+                ('payload', models.JSONField(blank=True, default=dict, help_text='Job specific resume state')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Job Watermark',
+                'verbose_name_plural': 'Job Watermarks',
+            },
+        ),
+        migrations.CreateModel(
+            name='SensorReadingsDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField(help_text='Start of the bucket (UTC)')),
+                ('reading_count', models.IntegerField(default=0)),
+                ('last_timestamp', models.DateTimeField(help_text='Timestamp of the newest reading in the bucket')),
+                ('temperature_count', models.IntegerField(default=0)),
+                ('temperature_sum', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('temperature_min', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('temperature_max', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('temperature_last', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('humidity_count', models.IntegerField(default=0)),
+                ('humidity_sum', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('humidity_min', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('humidity_max', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('humidity_last', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('weight_count', models.IntegerField(default=0)),
+                ('weight_sum', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('weight_min', models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True)),
+                ('weight_max', models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True)),
+                ('weight_last', models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True)),
+                ('sound_level_count', models.IntegerField(default=0)),
+                ('sound_level_sum', models.BigIntegerField(default=0)),
+                ('sound_level_min', models.IntegerField(blank=True, null=True)),
+                ('sound_level_max', models.IntegerField(blank=True, null=True)),
+                ('sound_level_last', models.IntegerField(blank=True, null=True)),
+                ('battery_level_count', models.IntegerField(default=0)),
+                ('battery_level_sum', models.BigIntegerField(default=0)),
+                ('battery_level_min', models.IntegerField(blank=True, null=True)),
+                ('battery_level_max', models.IntegerField(blank=True, null=True)),
+                ('battery_level_last', models.IntegerField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Sensor Readings Daily Rollup',
+                'verbose_name_plural': 'Sensor Readings Daily Rollups',
+                'ordering': ['-bucket'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='SensorReadingsHourly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField(help_text='Start of the bucket (UTC)')),
+                ('reading_count', models.IntegerField(default=0)),
+                ('last_timestamp', models.DateTimeField(help_text='Timestamp of the newest reading in the bucket')),
+                ('temperature_count', models.IntegerField(default=0)),
+                ('temperature_sum', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('temperature_min', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('temperature_max', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('temperature_last', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('humidity_count', models.IntegerField(default=0)),
+                ('humidity_sum', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('humidity_min', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('humidity_max', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('humidity_last', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('weight_count', models.IntegerField(default=0)),
+                ('weight_sum', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('weight_min', models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True)),
+                ('weight_max', models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True)),
+                ('weight_last', models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True)),
+                ('sound_level_count', models.IntegerField(default=0)),
+                ('sound_level_sum', models.BigIntegerField(default=0)),
+                ('sound_level_min', models.IntegerField(blank=True, null=True)),
+                ('sound_level_max', models.IntegerField(blank=True, null=True)),
+                ('sound_level_last', models.IntegerField(blank=True, null=True)),
+                ('battery_level_count', models.IntegerField(default=0)),
+                ('battery_level_sum', models.BigIntegerField(default=0)),
+                ('battery_level_min', models.IntegerField(blank=True, null=True)),
+                ('battery_level_max', models.IntegerField(blank=True, null=True)),
+                ('battery_level_last', models.IntegerField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Sensor Readings Hourly Rollup',
+                'verbose_name_plural': 'Sensor Readings Hourly Rollups',
+                'ordering': ['-bucket'],
+                'abstract': False,
+            },
+        ),
+        migrations.AddIndex(
+            model_name='sensorreadings',
+            index=django.contrib.postgres.indexes.BrinIndex(fields=['created_at'], name='sensor_readings_created_brin'),
+        ),
+        migrations.AddField(
+            model_name='sensorreadingsdaily',
+            name='device',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='devices.smartdevices'),
+        ),
+        migrations.AddField(
+            model_name='sensorreadingshourly',
+            name='device',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='devices.smartdevices'),
+        ),
+        migrations.AddConstraint(
+            model_name='sensorreadingsdaily',
+            constraint=models.UniqueConstraint(fields=('device', 'bucket'), name='unique_sensor_daily_device_bucket'),
+        ),
+        migrations.AddConstraint(
+            model_name='sensorreadingshourly',
+            constraint=models.UniqueConstraint(fields=('device', 'bucket'), name='unique_sensor_hourly_device_bucket'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0006_sensor_reading_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SensorReadingsArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the archived month (UTC)')),
+                ('file_path', models.CharField(help_text='Path relative to SENSOR_ARCHIVE_DIR', max_length=255)),
+                ('row_count', models.IntegerField(default=0)),
+                ('size_bytes', models.BigIntegerField(default=0)),
+                ('min_timestamp', models.DateTimeField()),
+                ('max_timestamp', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('device', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='devices.smartdevices')),
+            ],
+            options={
+                'verbose_name': 'Sensor Readings Archive',
+                'verbose_name_plural': 'Sensor Readings Archives',
+                'ordering': ['device', 'month'],
+                'constraints': [models.UniqueConstraint(fields=('device', 'month'), name='unique_sensor_archive_device_month')],
+            },
+        ),
+    ]
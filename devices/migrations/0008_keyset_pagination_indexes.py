@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0007_sensor_readings_archive'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='audiorecordings',
+            index=models.Index(fields=['recorded_at', 'id'], name='audio_recordings_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deviceimages',
+            index=models.Index(fields=['captured_at', 'id'], name='device_images_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sensorreadings',
+            index=models.Index(fields=['timestamp', 'id'], name='sensor_readings_keyset_idx'),
+        ),
+    ]
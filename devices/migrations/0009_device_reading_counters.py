@@ -0,0 +1,85 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:02
+
+import django.db.models.deletion
+from datetime import timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def backfill_reading_counters(apps, schema_editor):
+    """Count every device's stored and archived readings, and its recent readings per hour"""
+    SensorReadings = apps.get_model('devices', 'SensorReadings')
+    SensorReadingsArchive = apps.get_model('devices', 'SensorReadingsArchive')
+    DeviceReadingCounter = apps.get_model('devices', 'DeviceReadingCounter')
+    DeviceReadingHourlyCount = apps.get_model('devices', 'DeviceReadingHourlyCount')
+    
+    totals = dict(
+        SensorReadings.objects.order_by().values('device_id').annotate(rows=Count('id')).values_list('device_id', 'rows')
+    )
+    archived = SensorReadingsArchive.objects.order_by().values('device_id').annotate(rows=Sum('row_count'))
+    for device_id, rows in archived.values_list('device_id', 'rows'):
+        totals[device_id] = totals.get(device_id, 0) + rows
+    
+    now = timezone.now()
+    DeviceReadingCounter.objects.bulk_create([
+        DeviceReadingCounter(device_id=device_id, total_readings=rows, updated_at=now)
+        for device_id, rows in totals.items()
+    ], batch_size=500)
+    
+    horizon = (now - timedelta(days=settings.READING_COUNTER_HOURLY_DAYS)).replace(minute=0, second=0, microsecond=0)
+    hourly = SensorReadings.objects.filter(timestamp__gte=horizon).annotate(
+        hour=TruncHour('timestamp', tzinfo=dt_timezone.utc)
+    ).order_by().values('device_id', 'hour').annotate(rows=Count('id'))
+    DeviceReadingHourlyCount.objects.bulk_create([
+        DeviceReadingHourlyCount(device_id=row['device_id'], bucket=row['hour'], reading_count=row['rows'])
+        for row in hourly
+    ], batch_size=500)
+    if totals:
+        logger.info(f"Counted readings of {len(totals)} devices")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0008_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeviceReadingCounter',
+            fields=[
+                ('device', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='reading_counter', serialize=False, to='devices.smartdevices')),
+                ('total_readings', models.BigIntegerField(default=0, help_text='Stored and archived readings')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Device Reading Counter',
+                'verbose_name_plural': 'Device Reading Counters',
+            },
+        ),
+        migrations.CreateModel(
+            name='DeviceReadingHourlyCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField(help_text='Start of the hour (UTC)')),
+                ('reading_count', models.IntegerField(default=0)),
+                ('device', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='devices.smartdevices')),
+            ],
+            options={
+                'verbose_name': 'Device Reading Hourly Count',
+                'verbose_name_plural': 'Device Reading Hourly Counts',
+                'ordering': ['-bucket'],
+                'constraints': [models.UniqueConstraint(fields=('device', 'bucket'), name='unique_reading_count_device_bucket')],
+            },
+        ),
+        migrations.RunPython(
+            backfill_reading_counters,
+            migrations.RunPython.noop
+        ),
+    ]
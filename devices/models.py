@@ -1,4 +1,5 @@
 from django.db import models
+from django.contrib.postgres.indexes import BrinIndex
 import uuid
 from django.core.validators import MinValueValidator, MaxValueValidator
 from apiaries.models import Hives
@@ -136,6 +137,11 @@ class SensorReadings(models.Model):
         validators=[MinValueValidator(0), MaxValueValidator(100)]
     )
     status_code = models.IntegerField(null=True, blank=True)
+    sequence_number = models.BigIntegerField(
+        null=True,
+        blank=True,
+        help_text='Monotonic per-device counter sent by the device, used to drop retried readings'
+    )
     timestamp = models.DateTimeField()
     created_at = models.DateTimeField(auto_now_add=True)
     
@@ -143,11 +149,250 @@ class SensorReadings(models.Model):
         verbose_name = "Sensor Reading"
         verbose_name_plural = "Sensor Readings"
         ordering = ['-timestamp']
+        constraints = [
+            # Ingest inserts with ON CONFLICT DO NOTHING, so a retried reading is a no-op
+            models.UniqueConstraint(
+                fields=['device', 'timestamp'],
+                name='unique_sensor_reading_device_timestamp'
+            ),
+            # On PostgreSQL the table is partitioned by month (migration 0005),
+            # where this one exists per partition instead of on the parent
+            models.UniqueConstraint(
+                fields=['device', 'sequence_number'],
+                condition=models.Q(sequence_number__isnull=False),
+                name='unique_sensor_reading_device_sequence'
+            ),
+        ]
+        indexes = [
+            # Readings arrive roughly in time order, so a BRIN index serves
+            # cross-device time-window scans at a fraction of a B-tree's size.
+            # Per-device "latest" and window lookups use the (device, timestamp)
+            # unique index above, which Postgres scans backwards for -timestamp.
+            BrinIndex(fields=['timestamp'], name='sensor_readings_ts_brin'),
+            # The rollup job reads newly stored rows by created_at, which
+            # follows insert order even more closely than timestamp
+            BrinIndex(fields=['created_at'], name='sensor_readings_created_brin'),
+            # Cursor pagination walks (timestamp, id) in order from the cursor
+            models.Index(fields=['timestamp', 'id'], name='sensor_readings_keyset_idx'),
+        ]
     
     def __str__(self):
         return f"{self.device.serial_number} - {self.timestamp}"
 
 
+class HiveLatestReading(models.Model):
+    """Snapshot of the newest sensor reading of each hive's active devices"""
+    hive = models.OneToOneField(
+        Hives,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='latest_reading_snapshot'
+    )
+    device = models.ForeignKey(
+        SmartDevices,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    # Plain UUID rather than a foreign key so the snapshot never pins a reading row
+    reading_id = models.UUIDField()
+    temperature = models.DecimalField(max_digits=5, decimal_places=2)
+    humidity = models.DecimalField(max_digits=5, decimal_places=2)
+    weight = models.DecimalField(max_digits=6, decimal_places=2)
+    sound_level = models.IntegerField(null=True, blank=True)
+    battery_level = models.IntegerField(null=True, blank=True)
+    status_code = models.IntegerField(null=True, blank=True)
+    sequence_number = models.BigIntegerField(null=True, blank=True)
+    timestamp = models.DateTimeField()
+    created_at = models.DateTimeField(help_text='When the reading was stored')
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Hive Latest Reading"
+        verbose_name_plural = "Hive Latest Readings"
+    
+    def __str__(self):
+        return f"{self.hive_id} - {self.timestamp}"
+    
+    def as_reading(self):
+        """Return an unsaved SensorReadings instance carrying the snapshot values"""
+        return SensorReadings(
+            id=self.reading_id,
+            device=self.device,
+            temperature=self.temperature,
+            humidity=self.humidity,
+            weight=self.weight,
+            sound_level=self.sound_level,
+            battery_level=self.battery_level,
+            status_code=self.status_code,
+            sequence_number=self.sequence_number,
+            timestamp=self.timestamp,
+            created_at=self.created_at
+        )
+
+
+class SensorReadingsRollup(models.Model):
+    """Per-device aggregates of the sensor readings taken within one time bucket"""
+    device = models.ForeignKey(
+        SmartDevices,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    bucket = models.DateTimeField(help_text='Start of the bucket (UTC)')
+    reading_count = models.IntegerField(default=0)
+    last_timestamp = models.DateTimeField(help_text='Timestamp of the newest reading in the bucket')
+    temperature_count = models.IntegerField(default=0)
+    temperature_sum = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    temperature_min = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    temperature_max = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    temperature_last = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    humidity_count = models.IntegerField(default=0)
+    humidity_sum = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    humidity_min = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    humidity_max = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    humidity_last = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    weight_count = models.IntegerField(default=0)
+    weight_sum = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    weight_min = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
+    weight_max = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
+    weight_last = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
+    sound_level_count = models.IntegerField(default=0)
+    sound_level_sum = models.BigIntegerField(default=0)
+    sound_level_min = models.IntegerField(null=True, blank=True)
+    sound_level_max = models.IntegerField(null=True, blank=True)
+    sound_level_last = models.IntegerField(null=True, blank=True)
+    battery_level_count = models.IntegerField(default=0)
+    battery_level_sum = models.BigIntegerField(default=0)
+    battery_level_min = models.IntegerField(null=True, blank=True)
+    battery_level_max = models.IntegerField(null=True, blank=True)
+    battery_level_last = models.IntegerField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+        ordering = ['-bucket']
+
+    def __str__(self):
+        return f"{self.device_id} - {self.bucket}"
+
+
+class SensorReadingsHourly(SensorReadingsRollup):
+    """Hourly sensor reading rollup, maintained by devices.services.rollups"""
+
+    class Meta(SensorReadingsRollup.Meta):
+        verbose_name = "Sensor Readings Hourly Rollup"
+        verbose_name_plural = "Sensor Readings Hourly Rollups"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['device', 'bucket'],
+                name='unique_sensor_hourly_device_bucket'
+            ),
+        ]
+
+
+class SensorReadingsDaily(SensorReadingsRollup):
+    """Daily sensor reading rollup, maintained by devices.services.rollups"""
+
+    class Meta(SensorReadingsRollup.Meta):
+        verbose_name = "Sensor Readings Daily Rollup"
+        verbose_name_plural = "Sensor Readings Daily Rollups"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['device', 'bucket'],
+                name='unique_sensor_daily_device_bucket'
+            ),
+        ]
+
+
+class SensorReadingsArchive(models.Model):
+    """Manifest entry of one device-month of sensor readings moved to a cold archive file"""
+    device = models.ForeignKey(
+        SmartDevices,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    month = models.DateField(help_text='First day of the archived month (UTC)')
+    file_path = models.CharField(max_length=255, help_text='Path relative to SENSOR_ARCHIVE_DIR')
+    row_count = models.IntegerField(default=0)
+    size_bytes = models.BigIntegerField(default=0)
+    min_timestamp = models.DateTimeField()
+    max_timestamp = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Sensor Readings Archive"
+        verbose_name_plural = "Sensor Readings Archives"
+        ordering = ['device', 'month']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['device', 'month'],
+                name='unique_sensor_archive_device_month'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.device_id} - {self.month:%Y-%m}"
+
+
+class DeviceReadingCounter(models.Model):
+    """Running total of the sensor readings stored for a device, maintained by devices.services.reading_counters"""
+    device = models.OneToOneField(
+        SmartDevices,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='reading_counter'
+    )
+    total_readings = models.BigIntegerField(default=0, help_text='Stored and archived readings')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Device Reading Counter"
+        verbose_name_plural = "Device Reading Counters"
+
+    def __str__(self):
+        return f"{self.device_id} - {self.total_readings}"
+
+
+class DeviceReadingHourlyCount(models.Model):
+    """Number of sensor readings a device took within one hour, kept for the recent days only"""
+    device = models.ForeignKey(
+        SmartDevices,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    bucket = models.DateTimeField(help_text='Start of the hour (UTC)')
+    reading_count = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Device Reading Hourly Count"
+        verbose_name_plural = "Device Reading Hourly Counts"
+        ordering = ['-bucket']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['device', 'bucket'],
+                name='unique_reading_count_device_bucket'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.device_id} - {self.bucket}: {self.reading_count}"
+
+
+class JobWatermark(models.Model):
+    """Progress marker of an incremental background job"""
+    name = models.CharField(max_length=100, primary_key=True)
+    watermark = models.DateTimeField(null=True, blank=True, help_text='Everything up to this point has been processed')
+    payload = models.JSONField(default=dict, blank=True, help_text='Job specific resume state')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Job Watermark"
+        verbose_name_plural = "Job Watermarks"
+
+    def __str__(self):
+        return f"{self.name} - {self.watermark}"
+
+
 class AudioRecordings(models.Model):
     """Model representing audio recordings from smart devices"""
     
@@ -190,6 +435,9 @@ class AudioRecordings(models.Model):
         verbose_name = "Audio Recording"
         verbose_name_plural = "Audio Recordings"
         ordering = ['-recorded_at']
+        indexes = [
+            models.Index(fields=['recorded_at', 'id'], name='audio_recordings_keyset_idx'),
+        ]
     
     def __str__(self):
         return f"{self.device.serial_number} - Audio {self.recorded_at}"
@@ -245,6 +493,9 @@ class DeviceImages(models.Model):
         verbose_name = "Device Image"
         verbose_name_plural = "Device Images"
         ordering = ['-captured_at']
+        indexes = [
+            models.Index(fields=['captured_at', 'id'], name='device_images_keyset_idx'),
+        ]
     
     def __str__(self):
         return f"{self.device.serial_number} - Image {self.captured_at}"
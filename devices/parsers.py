@@ -0,0 +1,46 @@
+"""
+Request parsers for device ingest.
+
+Gateways that buffer readings can post them as newline-delimited JSON
+(one reading object per line) instead of a single JSON array, or in the
+compact binary frame format described in services/binary_format.py.
+"""
+
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+from .services import binary_format
+
+
+class NDJSONParser(BaseParser):
+    """Parse an `application/x-ndjson` body into a list of reading objects"""
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+
+        items = []
+        for line_number, raw_line in enumerate(stream, start=1):
+            try:
+                line = raw_line.decode(encoding).strip()
+                if not line:
+                    continue
+                items.append(json.loads(line))
+            except ValueError as exc:
+                raise ParseError(f'NDJSON parse error on line {line_number}: {exc}')
+        return items
+
+
+class BinaryReadingsParser(BaseParser):
+    """Parse compact binary reading frames into a BinaryReadingBatch"""
+    media_type = binary_format.MEDIA_TYPE
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return binary_format.decode_frames(stream.read())
+        except binary_format.BinaryFormatError as exc:
+            raise ParseError(f'Binary reading payload error: {exc}')
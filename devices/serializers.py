@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import SmartDevices, SensorReadings, AudioRecordings, DeviceImages
+from .models import SmartDevices, SensorReadings, HiveLatestReading, DeviceReadingCounter, AudioRecordings, DeviceImages
+from .services.device_cache import resolve_active_devices
 from apiaries.models import Hives
 
 
@@ -48,7 +49,7 @@ class SensorReadingsSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'device', 'device_serial', 'hive_name', 'temperature', 
             'humidity', 'weight', 'sound_level', 'battery_level', 
-            'status_code', 'timestamp', 'created_at'
+            'status_code', 'sequence_number', 'timestamp', 'created_at'
         ]
         read_only_fields = ['id', 'created_at', 'device_serial', 'hive_name']
     
@@ -63,6 +64,22 @@ class SensorReadingsSerializer(serializers.ModelSerializer):
         return value
 
 
+class HiveLatestReadingSerializer(serializers.ModelSerializer):
+    """Serializer for the per-hive latest reading snapshot, shaped like SensorReadingsSerializer"""
+    id = serializers.UUIDField(source='reading_id', read_only=True)
+    device_serial = serializers.CharField(source='device.serial_number', read_only=True)
+    hive_name = serializers.CharField(source='hive.name', read_only=True)
+    
+    class Meta:
+        model = HiveLatestReading
+        fields = [
+            'id', 'device', 'device_serial', 'hive_name', 'temperature', 
+            'humidity', 'weight', 'sound_level', 'battery_level', 
+            'status_code', 'sequence_number', 'timestamp', 'created_at'
+        ]
+        read_only_fields = fields
+
+
 class AudioRecordingsSerializer(serializers.ModelSerializer):
     """Serializer for AudioRecordings model"""
     device_serial = serializers.CharField(source='device.serial_number', read_only=True)
@@ -141,8 +158,11 @@ class SmartDevicesDetailSerializer(SmartDevicesSerializer):
         return SensorReadingsSerializer(recent, many=True).data
     
     def get_total_readings(self, obj):
-        """Get total count of sensor readings"""
-        return obj.sensor_readings.count()
+        """Get total count of sensor readings from the device's reading counter"""
+        try:
+            return obj.reading_counter.total_readings
+        except DeviceReadingCounter.DoesNotExist:
+            return 0
 
 
 class SensorReadingsCreateSerializer(serializers.ModelSerializer):
@@ -154,25 +174,52 @@ class SensorReadingsCreateSerializer(serializers.ModelSerializer):
         model = SensorReadings
         fields = [
             'device_serial', 'temperature', 'humidity', 'weight', 
-            'sound_level', 'battery_level', 'status_code', 'timestamp'
+            'sound_level', 'battery_level', 'status_code', 'sequence_number', 'timestamp'
         ]
+        extra_kwargs = {'sequence_number': {'min_value': 0}}
     
     def validate_device_serial(self, value):
         """Validate that device exists and is active"""
-        try:
-            device = SmartDevices.objects.get(serial_number=value, is_active=True)
-            return device
-        except SmartDevices.DoesNotExist:
+        # Batch ingest resolves every serial up front and passes the map in
+        devices_by_serial = self.context.get('devices_by_serial')
+        if devices_by_serial is None:
+            devices_by_serial = resolve_active_devices([value])
+        
+        device = devices_by_serial.get(value)
+        if device is None:
             raise serializers.ValidationError("Device with this serial number not found or inactive.")
+        return device
     
-    def create(self, validated_data):
-        """Create sensor reading with device from serial number"""
-        device = validated_data.pop('device_serial')
-        validated_data['device'] = device
+    def get_reading_data(self, validated_data=None):
+        """Return validated field values with the device resolved and a timestamp set"""
+        data = dict(self.validated_data if validated_data is None else validated_data)
+        data['device'] = data.pop('device_serial')
         
         # If timestamp is not provided, use current time
-        if 'timestamp' not in validated_data:
+        if 'timestamp' not in data:
             from django.utils import timezone
-            validated_data['timestamp'] = timezone.now()
+            data['timestamp'] = timezone.now()
+        
+        return data
+    
+    def build_reading(self):
+        """Build an unsaved SensorReadings instance for bulk insertion"""
+        return SensorReadings(**self.get_reading_data())
+    
+    def create(self, validated_data):
+        """Create sensor reading with device from serial number
         
-        return super().create(validated_data)
+        Goes through the same write as device ingest, so the hive snapshot,
+        the reading counters, the anomaly detector, the alert check and the
+        device heartbeat are all updated.
+        """
+        from .services.heartbeat import device_heartbeats
+        from .services.ingest import SensorReadingsIngestService
+        reading = SensorReadings(**self.get_reading_data(validated_data))
+        stored = SensorReadingsIngestService(write_behind=False).write([reading])
+        device_heartbeats.record([reading])
+        if not stored:
+            raise serializers.ValidationError(
+                "A reading with this timestamp or sequence number is already stored for this device."
+            )
+        return stored[0]
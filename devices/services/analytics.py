@@ -0,0 +1,270 @@
+"""
+Hive Time-Series Analytics
+
+Loads a hive's readings into NumPy arrays with one query (archived months are
+read from their Arrow files as columns) and computes dashboard statistics in
+vectorized passes instead of Python loops over Decimal values:
+
+- summary statistics (count, mean, min, max, sum) per metric
+- per-day means and closing weight, and the day-over-day weight change
+- trailing time-window rolling means
+- nectar flows: runs of consecutive days where the hive gained at least
+  NECTAR_FLOW_MIN_DAILY_GAIN_KG, lasting NECTAR_FLOW_MIN_DAYS or more
+
+Values are converted to float64 once, on load; missing values are NaN. Days
+are UTC calendar days.
+"""
+
+from django.db.models import F, FloatField, Func
+from django.db.models.functions import Cast
+from django.utils import timezone
+from datetime import datetime, timedelta, timezone as dt_timezone
+import numpy as np
+
+from ..models import SmartDevices, SensorReadings
+from .archive import SensorReadingsArchiveReader
+from .rollups import ROLLUP_METRICS
+
+ANALYTICS_METRICS = ROLLUP_METRICS
+DEFAULT_WINDOW = timedelta(days=30)
+DEFAULT_ROLLING_WINDOW = timedelta(hours=24)
+NECTAR_FLOW_MIN_DAILY_GAIN_KG = 0.5
+NECTAR_FLOW_MIN_DAYS = 2
+SECONDS_PER_DAY = 86400
+
+
+class EpochSeconds(Func):
+    """Unix time of a timestamp in seconds, as a float"""
+    template = 'EXTRACT(EPOCH FROM %(expressions)s)'
+    output_field = FloatField()
+
+
+class ReadingSeries:
+    """Readings as float64 arrays sorted by time: Unix seconds plus one array per metric (NaN when missing)."""
+
+    def __init__(self, timestamps, values):
+        self.timestamps = timestamps
+        self.values = values
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build a series from (unix seconds, *ANALYTICS_METRICS) rows; Decimal and None are converted in one pass."""
+        data = np.array(rows, dtype=np.float64).reshape(-1, len(ANALYTICS_METRICS) + 1)
+        order = np.argsort(data[:, 0], kind='stable')
+        data = data[order]
+        return cls(data[:, 0], {metric: data[:, i + 1] for i, metric in enumerate(ANALYTICS_METRICS)})
+
+    @classmethod
+    def concatenate(cls, series):
+        series = [part for part in series if len(part)]
+        if not series:
+            return cls.from_rows([])
+        timestamps = np.concatenate([part.timestamps for part in series])
+        order = np.argsort(timestamps, kind='stable')
+        return cls(timestamps[order], {
+            metric: np.concatenate([part.values[metric] for part in series])[order]
+            for metric in ANALYTICS_METRICS
+        })
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def summary(self):
+        """Return {metric: {count, mean, min, max, sum}}, with None for metrics without values."""
+        result = {}
+        for metric, values in self.values.items():
+            present = values[~np.isnan(values)]
+            if not len(present):
+                result[metric] = {'count': 0, 'mean': None, 'min': None, 'max': None, 'sum': None}
+                continue
+            total = float(present.sum())
+            result[metric] = {
+                'count': int(len(present)),
+                'mean': total / len(present),
+                'min': float(present.min()),
+                'max': float(present.max()),
+                'sum': total,
+            }
+        return result
+
+    def days(self):
+        """Return (day numbers since the epoch, index of each day's first reading)."""
+        day_numbers = np.floor_divide(self.timestamps, SECONDS_PER_DAY).astype(np.int64)
+        return np.unique(day_numbers, return_index=True)
+
+    def daily_means(self, metric):
+        """Return (day numbers, mean of metric per day), NaN for days without values."""
+        days, starts = self.days()
+        if not len(days):
+            return days, np.array([])
+        values = self.values[metric]
+        present = ~np.isnan(values)
+        sums = np.add.reduceat(np.where(present, values, 0.0), starts)
+        counts = np.add.reduceat(present.astype(np.int64), starts)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return days, np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+    def daily_close(self, metric):
+        """Return (day numbers, last value of metric per day) over the days that have a value."""
+        values = self.values[metric]
+        present = ~np.isnan(values)
+        day_numbers = np.floor_divide(self.timestamps[present], SECONDS_PER_DAY).astype(np.int64)
+        if not len(day_numbers):
+            return day_numbers, np.array([])
+        # Sorted input: the last reading of a day sits right before the next day's first
+        last = np.r_[np.flatnonzero(np.diff(day_numbers)), len(day_numbers) - 1]
+        return day_numbers[last], values[present][last]
+
+    def daily_weight_deltas(self):
+        """Return (day numbers, closing weight, change since the previous day's close).
+
+        The change is NaN for the first day and after days without weight.
+        """
+        days, close = self.daily_close('weight')
+        deltas = np.full(len(days), np.nan)
+        if len(days) > 1:
+            consecutive = np.diff(days) == 1
+            deltas[1:] = np.where(consecutive, np.diff(close), np.nan)
+        return days, close, deltas
+
+    def rolling_mean(self, metric, window):
+        """Return the trailing mean of metric over (t - window, t] at every reading, ignoring NaN."""
+        values = self.values[metric]
+        present = ~np.isnan(values)
+        sums = np.concatenate([[0.0], np.cumsum(np.where(present, values, 0.0))])
+        counts = np.concatenate([[0], np.cumsum(present)])
+        left = np.searchsorted(self.timestamps, self.timestamps - window.total_seconds(), side='right')
+        right = np.arange(1, len(values) + 1)
+        window_counts = counts[right] - counts[left]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(window_counts > 0, (sums[right] - sums[left]) / np.maximum(window_counts, 1), np.nan)
+
+    def nectar_flows(self, min_daily_gain=NECTAR_FLOW_MIN_DAILY_GAIN_KG, min_days=NECTAR_FLOW_MIN_DAYS):
+        """Return [(first day number, last day number, total gain)] of runs of gaining days."""
+        days, _, deltas = self.daily_weight_deltas()
+        gaining = np.nan_to_num(deltas, nan=-np.inf) >= min_daily_gain
+        # Run boundaries are where gaining switches on and off
+        edges = np.diff(np.concatenate([[0], gaining.astype(np.int8), [0]]))
+        starts, stops = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+        gains = np.concatenate([[0.0], np.cumsum(np.where(gaining, deltas, 0.0))])
+        return [
+            (int(days[start]), int(days[stop - 1]), float(gains[stop] - gains[start]))
+            for start, stop in zip(starts, stops)
+            if stop - start >= min_days
+        ]
+
+
+class HiveAnalytics:
+    """Analytics of one hive's readings over a window, computed once and reusable by views and tasks."""
+
+    def __init__(self, hive, series, start, end, rolling_window=DEFAULT_ROLLING_WINDOW,
+                 min_daily_gain=NECTAR_FLOW_MIN_DAILY_GAIN_KG, min_flow_days=NECTAR_FLOW_MIN_DAYS):
+        self.hive = hive
+        self.series = series
+        self.start = start
+        self.end = end
+        self.rolling_window = rolling_window
+        self.summary = series.summary()
+        self.days, self.weight_close, self.weight_delta = series.daily_weight_deltas()
+        self.nectar_flows = series.nectar_flows(min_daily_gain, min_flow_days)
+        self.daily_means = {metric: series.daily_means(metric) for metric in ('temperature', 'humidity', 'weight')}
+        self.rolling_weight = series.rolling_mean('weight', rolling_window)
+        self.rolling_temperature = series.rolling_mean('temperature', rolling_window)
+
+    def as_dict(self):
+        """Return the analytics as JSON-ready data, one entry per UTC day that has readings."""
+        days, _ = self.series.days()
+        daily = {int(day): {'date': day_to_date(day).isoformat()} for day in days}
+        for metric, (metric_days, means) in self.daily_means.items():
+            for day, mean in zip(metric_days, means):
+                daily[int(day)][f'{metric}_mean'] = nan_to_none(mean)
+        for day, close, delta in zip(self.days, self.weight_close, self.weight_delta):
+            daily[int(day)].update(weight_close=nan_to_none(close), weight_delta=nan_to_none(delta))
+
+        # Rolling means as of the last reading of each day
+        if len(self.series):
+            day_numbers = np.floor_divide(self.series.timestamps, SECONDS_PER_DAY).astype(np.int64)
+            last = np.r_[np.flatnonzero(np.diff(day_numbers)), len(day_numbers) - 1]
+            for index in last:
+                daily[int(day_numbers[index])].update(
+                    weight_rolling_mean=nan_to_none(self.rolling_weight[index]),
+                    temperature_rolling_mean=nan_to_none(self.rolling_temperature[index])
+                )
+
+        return {
+            'hive_id': str(self.hive.id),
+            'hive_name': self.hive.name,
+            'start': self.start.isoformat(),
+            'end': self.end.isoformat(),
+            'reading_count': len(self.series),
+            'rolling_window_hours': self.rolling_window.total_seconds() / 3600,
+            'summary': {
+                metric: {name: round_or_none(value) for name, value in stats.items()}
+                for metric, stats in self.summary.items()
+            },
+            'daily': [
+                {name: round_or_none(value) for name, value in entry.items()}
+                for _, entry in sorted(daily.items())
+            ],
+            'nectar_flows': [
+                {
+                    'start': day_to_date(first).isoformat(),
+                    'end': day_to_date(last).isoformat(),
+                    'days': last - first + 1,
+                    'weight_gain': round(gain, 2),
+                }
+                for first, last, gain in self.nectar_flows
+            ],
+        }
+
+
+class HiveAnalyticsService:
+    """Load hive readings as arrays and run the analytics on them."""
+
+    def load_series(self, devices, start=None, end=None):
+        """Return the readings of these devices in [start, end) as a ReadingSeries, archived months included."""
+        readings = SensorReadings.objects.filter(device__in=devices)
+        if start is not None:
+            readings = readings.filter(timestamp__gte=start)
+        if end is not None:
+            readings = readings.filter(timestamp__lt=end)
+        rows = readings.order_by('timestamp').values_list(
+            EpochSeconds(F('timestamp')),
+            *(Cast(metric, FloatField()) for metric in ANALYTICS_METRICS)
+        )
+        series = ReadingSeries.from_rows(list(rows))
+
+        archived = SensorReadingsArchiveReader().read_arrow(devices, start, end)
+        if archived is None or not archived.num_rows:
+            return series
+
+        # Arrow timestamps are microseconds since the epoch; decimals cast straight to float64
+        archived_series = ReadingSeries(
+            archived['timestamp'].to_numpy().astype('datetime64[us]').astype(np.int64) / 1e6,
+            {
+                metric: archived[metric].cast('float64').to_numpy(zero_copy_only=False).astype(np.float64)
+                for metric in ANALYTICS_METRICS
+            }
+        )
+        return ReadingSeries.concatenate([archived_series, series])
+
+    def analyze(self, hive, start=None, end=None, **options):
+        """Return HiveAnalytics for the hive's active devices over [start, end), by default the last 30 days."""
+        end = end or timezone.now()
+        start = start or end - DEFAULT_WINDOW
+        devices = SmartDevices.objects.filter(hive=hive, is_active=True)
+        return HiveAnalytics(hive, self.load_series(devices, start, end), start, end, **options)
+
+
+def day_to_date(day):
+    return datetime.fromtimestamp(int(day) * SECONDS_PER_DAY, tz=dt_timezone.utc).date()
+
+
+def nan_to_none(value):
+    return None if np.isnan(value) else float(value)
+
+
+def round_or_none(value, digits=2):
+    if isinstance(value, float):
+        return round(value, digits)
+    return value
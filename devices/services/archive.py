@@ -0,0 +1,444 @@
+"""
+Sensor Readings Cold Archive
+
+Readings older than a cutoff can be moved out of PostgreSQL into Arrow IPC
+(Feather v2) files on local disk, one file per device and calendar month
+(UTC) under SENSOR_ARCHIVE_DIR. SensorReadingsArchive is the manifest of
+those files. The hot table stays small while old seasons remain available to
+the readings endpoints, which read the files when a query window reaches into
+archived months. Files are written uncompressed by default so they are read
+zero-copy from a memory map; with SENSOR_ARCHIVE_COMPRESSION (zstd, lz4) they
+are smaller on disk but every read decompresses the file into memory.
+
+A month is archived only once it has fully passed the cutoff. Readings for an
+archived month that arrive later are merged into the existing file on the next
+run. Each file is written to a temporary path and renamed into place before its
+rows are deleted from the database, so an interrupted run never loses readings;
+rows that made it into a file but were not deleted yet are merged again (by id)
+on the next run, and readers drop them as duplicates of the hot rows.
+
+Rollups and reading counters are not touched, so window statistics and
+reading counts keep covering archived readings until they expire.
+
+Requires pyarrow.
+"""
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from datetime import timedelta, timezone as dt_timezone
+from pathlib import Path
+import heapq
+import itertools
+import logging
+import os
+import uuid
+
+from ..models import SmartDevices, SensorReadings, SensorReadingsArchive
+from .partitions import month_start, add_months
+from .reading_counters import DeviceReadingCounterService
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.feather as feather
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_COLUMNS = [
+    'id', 'device_id', 'temperature', 'humidity', 'weight', 'sound_level',
+    'battery_level', 'status_code', 'sequence_number', 'timestamp', 'created_at'
+]
+DELETE_CHUNK_SIZE = 5000
+
+
+def archive_schema():
+    """Arrow schema of an archive file; decimals keep the exact stored values."""
+    return pa.schema([
+        ('id', pa.string()),
+        ('device_id', pa.string()),
+        ('temperature', pa.decimal128(5, 2)),
+        ('humidity', pa.decimal128(5, 2)),
+        ('weight', pa.decimal128(6, 2)),
+        ('sound_level', pa.int32()),
+        ('battery_level', pa.int32()),
+        ('status_code', pa.int32()),
+        ('sequence_number', pa.int64()),
+        ('timestamp', pa.timestamp('us', tz='UTC')),
+        ('created_at', pa.timestamp('us', tz='UTC')),
+    ])
+
+
+class SensorReadingsArchiveError(Exception):
+    """Raised when the cold archive cannot be used"""
+    pass
+
+
+class SensorReadingsArchiver:
+    """Move whole device-months of old readings from the database into archive files."""
+
+    def __init__(self, archive_dir=None, compression=None):
+        if not PYARROW_AVAILABLE:
+            raise SensorReadingsArchiveError('The cold archive requires pyarrow (pip install pyarrow)')
+        self.archive_dir = Path(archive_dir or settings.SENSOR_ARCHIVE_DIR)
+        self.compression = compression or settings.SENSOR_ARCHIVE_COMPRESSION
+
+    def pending(self, cutoff, device_id=None):
+        """Return [(device_id, month start, rows)] of device-months entirely before cutoff's month."""
+        readings = SensorReadings.objects.filter(timestamp__lt=month_start(cutoff))
+        if device_id:
+            readings = readings.filter(device_id=device_id)
+        groups = readings.annotate(
+            month=TruncMonth('timestamp', tzinfo=dt_timezone.utc)
+        ).order_by().values('device_id', 'month').annotate(rows=Count('id')).order_by('device_id', 'month')
+        return [(group['device_id'], group['month'], group['rows']) for group in groups]
+
+    def archive(self, older_than_days=None, device_id=None, now=None):
+        """Archive every device-month older than the cutoff; return the totals."""
+        days = settings.SENSOR_ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+        cutoff = (now or timezone.now()) - timedelta(days=days)
+
+        totals = {'files': 0, 'rows': 0, 'bytes': 0}
+        for group_device_id, month, _ in self.pending(cutoff, device_id):
+            manifest, archived = self.archive_device_month(group_device_id, month)
+            totals['files'] += 1
+            totals['rows'] += archived
+            totals['bytes'] += manifest.size_bytes
+
+        if totals['rows']:
+            logger.info(f"Archived {totals['rows']} sensor readings into {totals['files']} files")
+        return totals
+
+    def archive_device_month(self, device_id, month):
+        """Write one device-month into its archive file and delete those rows; return (manifest, rows archived)."""
+        start = month_start(month)
+        rows = SensorReadings.objects.filter(
+            device_id=device_id,
+            timestamp__gte=start,
+            timestamp__lt=add_months(start, 1)
+        )
+        values = list(rows.order_by('timestamp').values_list(*ARCHIVE_COLUMNS))
+        if not values:
+            return SensorReadingsArchive.objects.get(device_id=device_id, month=start.date()), 0
+
+        table = pa.Table.from_pylist(
+            [self._record(row) for row in values],
+            schema=archive_schema()
+        )
+
+        relative_path = f'{device_id}/{start:%Y-%m}.arrow'
+        path = self.archive_dir / relative_path
+        if path.exists():
+            # Late readings for an archived month: keep the file's rows unless the database has them too
+            existing = self.read_table(path)
+            existing = existing.filter(pc.invert(pc.is_in(existing['id'], value_set=table['id'])))
+            table = pa.concat_tables([existing, table]).sort_by('timestamp')
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = path.with_suffix('.arrow.tmp')
+        feather.write_feather(table, str(temporary_path), compression=self.compression)
+        with open(temporary_path, 'rb') as archive_file:
+            os.fsync(archive_file.fileno())
+        os.replace(temporary_path, path)
+
+        timestamps = table['timestamp']
+        with transaction.atomic():
+            manifest, _ = SensorReadingsArchive.objects.update_or_create(
+                device_id=device_id,
+                month=start.date(),
+                defaults={
+                    'file_path': relative_path,
+                    'row_count': table.num_rows,
+                    'size_bytes': path.stat().st_size,
+                    'min_timestamp': pc.min(timestamps).as_py(),
+                    'max_timestamp': pc.max(timestamps).as_py(),
+                }
+            )
+            ids = [row[0] for row in values]
+            for offset in range(0, len(ids), DELETE_CHUNK_SIZE):
+                rows.filter(id__in=ids[offset:offset + DELETE_CHUNK_SIZE]).delete()
+
+        return manifest, len(values)
+
+    def expiring(self, devices, cutoff):
+        """Count the archived readings of these devices taken before cutoff, without removing them.
+
+        Files entirely before the cutoff are counted from their manifest;
+        only the timestamp column of a file straddling it is read.
+        """
+        manifests = SensorReadingsArchive.objects.filter(device__in=devices, min_timestamp__lt=cutoff)
+        count = manifests.filter(max_timestamp__lt=cutoff).aggregate(rows=Sum('row_count'))['rows'] or 0
+        for manifest in manifests.filter(max_timestamp__gte=cutoff):
+            with pa.memory_map(str(self.archive_dir / manifest.file_path), 'r') as source:
+                timestamps = pa.ipc.open_file(source).read_all().column('timestamp')
+            count += pc.sum(pc.less(timestamps, pa.scalar(cutoff, timestamps.type))).as_py() or 0
+        return count
+
+    def expire(self, devices, cutoff):
+        """Remove archived readings of these devices taken before cutoff; return the rows removed.
+
+        Files entirely before the cutoff are deleted; a file straddling it is
+        rewritten without the expired rows.
+        """
+        removed = 0
+        counters = DeviceReadingCounterService()
+        for manifest in SensorReadingsArchive.objects.filter(device__in=devices, min_timestamp__lt=cutoff):
+            if manifest.max_timestamp < cutoff:
+                removed += manifest.row_count
+                with transaction.atomic():
+                    manifest.delete()
+                    counters.subtract({manifest.device_id: manifest.row_count})
+                continue
+
+            path = self.archive_dir / manifest.file_path
+            table = self.read_table(path)
+            kept = table.filter(pc.greater_equal(table['timestamp'], pa.scalar(cutoff, table['timestamp'].type)))
+            temporary_path = path.with_suffix('.arrow.tmp')
+            feather.write_feather(kept, str(temporary_path), compression=self.compression)
+            os.replace(temporary_path, path)
+
+            removed += table.num_rows - kept.num_rows
+            manifest.row_count = kept.num_rows
+            manifest.size_bytes = path.stat().st_size
+            manifest.min_timestamp = pc.min(kept['timestamp']).as_py()
+            with transaction.atomic():
+                manifest.save(update_fields=['row_count', 'size_bytes', 'min_timestamp', 'updated_at'])
+                counters.subtract({manifest.device_id: table.num_rows - kept.num_rows})
+        return removed
+
+    def _record(self, row):
+        record = dict(zip(ARCHIVE_COLUMNS, row))
+        record['id'] = str(record['id'])
+        record['device_id'] = str(record['device_id'])
+        return record
+
+    def read_table(self, path):
+        with pa.memory_map(str(path), 'r') as source:
+            return pa.ipc.open_file(source).read_all()
+
+
+class SensorReadingsArchiveReader:
+    """Read archived readings back as unsaved SensorReadings instances."""
+
+    def __init__(self, archive_dir=None):
+        self.archive_dir = Path(archive_dir or settings.SENSOR_ARCHIVE_DIR)
+
+    def manifests(self, devices, start=None, end=None):
+        """Return the archive files of these devices overlapping [start, end)."""
+        manifests = SensorReadingsArchive.objects.filter(device__in=devices)
+        if start is not None:
+            manifests = manifests.filter(max_timestamp__gte=start)
+        if end is not None:
+            manifests = manifests.filter(min_timestamp__lt=end)
+        return manifests
+
+    def has_archived(self, devices, start=None, end=None):
+        return self.manifests(devices, start, end).exists()
+
+    def count(self, devices, start=None, end=None):
+        """Count the archived readings of these devices in [start, end).
+
+        Files the window covers entirely are counted from their manifest;
+        only the timestamp column of a file the window cuts is read.
+        """
+        manifests = list(self.manifests(devices, start, end))
+        if manifests and not PYARROW_AVAILABLE:
+            raise SensorReadingsArchiveError('Reading archived sensor readings requires pyarrow')
+
+        total = 0
+        for manifest in manifests:
+            if (start is None or manifest.min_timestamp >= start) and (end is None or manifest.max_timestamp < end):
+                total += manifest.row_count
+                continue
+            with pa.memory_map(str(self.archive_dir / manifest.file_path), 'r') as source:
+                timestamps = pa.ipc.open_file(source).read_all().column('timestamp')
+            inside = pc.less(timestamps, pa.scalar(end, timestamps.type)) if end is not None else None
+            if start is not None:
+                after_start = pc.greater_equal(timestamps, pa.scalar(start, timestamps.type))
+                inside = after_start if inside is None else pc.and_(inside, after_start)
+            total += pc.sum(inside).as_py() or 0
+        return total
+
+    def iter_read(self, devices, start=None, end=None):
+        """Yield archived readings one file at a time (by month, then device), oldest first within a file.
+
+        Rows that are still in the database (an archive run that did not
+        finish) are left to the hot table.
+        """
+        manifests = list(self.manifests(devices, start, end).order_by('month', 'device_id'))
+        if not manifests:
+            return
+
+        device_by_id = {
+            device.id: device
+            for device in SmartDevices.objects.filter(
+                id__in={manifest.device_id for manifest in manifests}
+            ).select_related('hive')
+        }
+
+        for manifest, table in self._tables(manifests, start, end):
+            yield from self._readings(table, device_by_id[manifest.device_id])
+
+    def read_first(self, devices, start=None, end=None, ordering='-timestamp', limit=10, after=None):
+        """Return (the first `limit` archived readings in [start, end) by ordering, archived rows in the window).
+
+        ordering is a column name, prefixed with '-' for descending; NULLs
+        sort as in PostgreSQL and ties are broken by id. With after, a
+        (value, id) keyset position, only rows strictly past it in that order
+        are read and files that end before it are skipped. Each file is
+        filtered and sorted in Arrow and only its first `limit` rows become
+        model instances. Files the window covers entirely are counted from
+        their manifest.
+        """
+        field = ordering.lstrip('-')
+        descending = ordering.startswith('-')
+        manifests = self.manifests(devices, start, end)
+        if after is not None:
+            # A keyset position is on the time field, so it bounds the files too
+            manifests = manifests.filter(
+                **{'min_timestamp__lte' if descending else 'max_timestamp__gte': after[0]}
+            )
+        manifests = list(manifests)
+        if not manifests:
+            return [], 0
+
+        device_by_id = {
+            device.id: device
+            for device in SmartDevices.objects.filter(
+                id__in={manifest.device_id for manifest in manifests}
+            ).select_related('hive')
+        }
+
+        total = 0
+        candidates = []
+        for manifest, table in self._tables(manifests, start, end):
+            covered = (start is None or manifest.min_timestamp >= start) and (end is None or manifest.max_timestamp < end)
+            total += manifest.row_count if covered else table.num_rows
+            if after is not None:
+                table = table.filter(self._past(table, field, after, descending))
+            first = table.sort_by([
+                (field, 'descending', 'at_start') if descending else (field, 'ascending', 'at_end'),
+                ('id', 'descending' if descending else 'ascending', 'at_end'),
+            ]).slice(0, limit)
+            candidates.extend(self._readings(first, device_by_id[manifest.device_id]))
+
+        candidates.sort(
+            key=lambda reading: (getattr(reading, field) is None, getattr(reading, field), str(reading.id)),
+            reverse=descending
+        )
+        return candidates[:limit], total
+
+    def _past(self, table, field, after, descending):
+        """Mask of the rows strictly past the (value, id) position in the scan order."""
+        value, pk = after
+        beyond = pc.less if descending else pc.greater
+        column, value = table[field], pa.scalar(value, table[field].type)
+        return pc.or_(
+            beyond(column, value),
+            pc.and_(pc.equal(column, value), beyond(table['id'], pa.scalar(str(pk), pa.string())))
+        )
+
+    def _readings(self, table, device):
+        for record in table.to_pylist():
+            del record['device_id']
+            record['id'] = uuid.UUID(record['id'])
+            yield SensorReadings(device=device, **record)
+
+    def read_arrow(self, devices, start=None, end=None):
+        """Return archived readings of these devices in [start, end) as one Arrow table, or None.
+
+        For columnar consumers (analytics) that never need model instances.
+        """
+        manifests = list(self.manifests(devices, start, end).order_by('month', 'device_id'))
+        tables = [table for _, table in self._tables(manifests, start, end)]
+        return pa.concat_tables(tables) if tables else None
+
+    def _tables(self, manifests, start, end):
+        """Yield (manifest, table) with each file's rows inside [start, end) that are not in the hot table."""
+        if manifests and not PYARROW_AVAILABLE:
+            raise SensorReadingsArchiveError('Reading archived sensor readings requires pyarrow')
+
+        still_hot = self._still_hot(manifests)
+        for manifest in manifests:
+            with pa.memory_map(str(self.archive_dir / manifest.file_path), 'r') as source:
+                table = pa.ipc.open_file(source).read_all()
+            if start is not None:
+                table = table.filter(pc.greater_equal(table['timestamp'], pa.scalar(start, table['timestamp'].type)))
+            if end is not None:
+                table = table.filter(pc.less(table['timestamp'], pa.scalar(end, table['timestamp'].type)))
+
+            hot_ids = still_hot.get((manifest.device_id, month_start(manifest.max_timestamp)))
+            if hot_ids:
+                table = table.filter(pc.invert(pc.is_in(table['id'], value_set=pa.array(hot_ids, pa.string()))))
+            yield manifest, table
+
+    def _still_hot(self, manifests):
+        """Return {(device id, month): [reading id]} of the archived device-months' rows still in the hot table.
+
+        Normally empty: late readings and rows of an interrupted run live in
+        the hot table. One query covers every file of the read.
+        """
+        devices_by_month = {}
+        for manifest in manifests:
+            devices_by_month.setdefault(month_start(manifest.max_timestamp), set()).add(manifest.device_id)
+        if not devices_by_month:
+            return {}
+
+        archived_months = Q()
+        for month, device_ids in devices_by_month.items():
+            archived_months |= Q(device_id__in=device_ids, timestamp__gte=month, timestamp__lt=add_months(month, 1))
+
+        still_hot = {}
+        for reading_id, device_id, timestamp in SensorReadings.objects.filter(archived_months).order_by().values_list(
+            'id', 'device_id', 'timestamp'
+        ):
+            still_hot.setdefault((device_id, month_start(timestamp)), []).append(str(reading_id))
+        return still_hot
+
+
+class HotAndArchivedReadings:
+    """Sliceable merge of a hot readings queryset and the archived readings of the same window by timestamp.
+
+    Late readings of an archived month stay in the hot table, so the two
+    sources overlap in time and are merged rather than concatenated. A slice
+    [start:stop] reads only the first `stop` rows of each source: the hot
+    queryset is sliced in SQL and read_archived(limit) returns the first
+    `limit` archived readings in the same order. archived_count is the number
+    of archived readings in the window. Works with Django's Paginator, which
+    only needs count() and slicing.
+    """
+
+    def __init__(self, hot, read_archived, archived_count, descending=True):
+        self.hot = hot
+        self.read_archived = read_archived
+        self.archived_count = archived_count
+        self.descending = descending
+        self._hot_count = None
+
+    def count(self):
+        if self._hot_count is None:
+            self._hot_count = self.hot.count()
+        return self._hot_count + self.archived_count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+
+        start, stop = index.start or 0, index.stop if index.stop is not None else self.count()
+        if stop <= start:
+            return []
+        merged = heapq.merge(
+            self.hot[:stop],
+            self.read_archived(stop) if self.archived_count else [],
+            key=lambda reading: (reading.timestamp, str(reading.id)),
+            reverse=self.descending
+        )
+        return list(itertools.islice(merged, start, stop))
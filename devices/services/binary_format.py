@@ -0,0 +1,181 @@
+"""
+Compact Binary Reading Format
+
+Hive nodes on constrained cellular links can post readings in a fixed-layout
+little-endian binary encoding instead of JSON. A request body is one or more
+frames; each frame carries the readings of a single device:
+
+    Frame header
+        magic           2 bytes   b'NY'
+        version         uint8     1
+        flags           uint8     bit 0 = records carry a sequence number,
+                                  other bits reserved and must be 0
+        serial_length   uint8
+        serial_number   serial_length bytes, UTF-8
+        record_count    uint16
+
+    Record (17 bytes, 21 with sequence numbers, repeated record_count times)
+        timestamp       uint32    Unix seconds, 0 = use server receive time
+        temperature     int16     hundredths of °C
+        humidity        uint16    hundredths of %
+        weight          int32     hundredths of kg
+        sound_level     uint16    dB, 0xFFFF = not measured
+        battery_level   uint8     %, 0xFF = not measured
+        status_code     uint16    0xFFFF = none
+        sequence_number uint32    only present when flag bit 0 is set,
+                                  0xFFFFFFFF = none
+
+Decoding uses struct.iter_unpack over whole frames and builds SensorReadings
+rows directly, without going through the DRF serializer per field.
+"""
+
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+import struct
+
+MEDIA_TYPE = 'application/vnd.smart-nyuki.readings'
+MAGIC = b'NY'
+VERSION = 1
+
+HEADER = struct.Struct('<2sBBB')
+COUNT = struct.Struct('<H')
+RECORD = struct.Struct('<IhHiHBH')
+SEQUENCED_RECORD = struct.Struct('<IhHiHBHI')
+
+FLAG_SEQUENCE = 0x01
+
+NULL_U8 = 0xFF
+NULL_U16 = 0xFFFF
+NULL_U32 = 0xFFFFFFFF
+
+# int16/uint16 hundredths always fit the 5-digit temperature and humidity
+# columns; weight is int32 and must be range-checked (max_digits=6)
+MAX_WEIGHT = 999999
+
+
+class BinaryFormatError(ValueError):
+    """Raised when a binary payload is not a well-formed sequence of frames."""
+
+
+class BinaryReadingBatch:
+    """Decoded binary payload: a list of (serial_number, records) frames."""
+
+    def __init__(self, frames):
+        self.frames = frames
+
+    def __len__(self):
+        return sum(len(records) for _, records in self.frames)
+
+
+def decode_frames(payload):
+    """Split a payload into frames and unpack their records as raw tuples."""
+    view = memoryview(payload)
+    offset = 0
+    frames = []
+
+    while offset < len(view):
+        if len(view) - offset < HEADER.size:
+            raise BinaryFormatError(f'Truncated frame header at byte {offset}')
+        magic, version, flags, serial_length = HEADER.unpack_from(view, offset)
+        if magic != MAGIC:
+            raise BinaryFormatError(f'Bad frame magic at byte {offset}')
+        if version != VERSION:
+            raise BinaryFormatError(f'Unsupported frame version {version}')
+        if flags & ~FLAG_SEQUENCE:
+            raise BinaryFormatError(f'Unsupported frame flags {flags:#04x}')
+        record_struct = SEQUENCED_RECORD if flags & FLAG_SEQUENCE else RECORD
+        offset += HEADER.size
+
+        serial_end = offset + serial_length
+        if serial_end + COUNT.size > len(view):
+            raise BinaryFormatError(f'Truncated frame header at byte {offset}')
+        try:
+            serial_number = bytes(view[offset:serial_end]).decode('utf-8')
+        except UnicodeDecodeError:
+            raise BinaryFormatError(f'Serial number at byte {offset} is not valid UTF-8')
+        (record_count,) = COUNT.unpack_from(view, serial_end)
+        offset = serial_end + COUNT.size
+
+        records_end = offset + record_count * record_struct.size
+        if records_end > len(view):
+            raise BinaryFormatError(f'Frame for {serial_number} declares {record_count} records but is truncated')
+        records = list(record_struct.iter_unpack(view[offset:records_end]))
+        offset = records_end
+
+        frames.append((serial_number, records))
+
+    return BinaryReadingBatch(frames)
+
+
+def record_to_fields(record, received_at):
+    """Convert one raw record tuple into SensorReadings field values.
+
+    Returns (fields, errors); exactly one of them is None.
+    """
+    timestamp, temperature, humidity, weight, sound_level, battery_level, status_code = record[:7]
+    sequence_number = record[7] if len(record) > 7 else NULL_U32
+
+    errors = {}
+    if abs(weight) > MAX_WEIGHT:
+        errors['weight'] = ['Ensure that there are no more than 6 digits in total.']
+    if battery_level != NULL_U8 and battery_level > 100:
+        errors['battery_level'] = ['Ensure this value is less than or equal to 100.']
+    if errors:
+        return None, errors
+
+    return {
+        'timestamp': datetime.fromtimestamp(timestamp, tz=dt_timezone.utc) if timestamp else received_at,
+        'temperature': Decimal(temperature).scaleb(-2),
+        'humidity': Decimal(humidity).scaleb(-2),
+        'weight': Decimal(weight).scaleb(-2),
+        'sound_level': None if sound_level == NULL_U16 else sound_level,
+        'battery_level': None if battery_level == NULL_U8 else battery_level,
+        'status_code': None if status_code == NULL_U16 else status_code,
+        'sequence_number': None if sequence_number == NULL_U32 else sequence_number,
+    }, None
+
+
+def _scaled(value):
+    return int((Decimal(str(value)) * 100).to_integral_value())
+
+
+def encode_frame(serial_number, readings):
+    """Encode readings for one device as a frame.
+
+    `readings` is an iterable of dicts with the SensorReadingsCreateSerializer
+    field names; `timestamp` may be a datetime, Unix seconds or omitted.
+    Used by the ingest benchmark and as the reference for device firmware.
+    """
+    serial_bytes = serial_number.encode('utf-8')
+    readings = list(readings)
+    sequenced = any(reading.get('sequence_number') is not None for reading in readings)
+    record_struct = SEQUENCED_RECORD if sequenced else RECORD
+
+    records = []
+    for reading in readings:
+        timestamp = reading.get('timestamp') or 0
+        if isinstance(timestamp, datetime):
+            timestamp = int(timestamp.timestamp())
+        sound_level = reading.get('sound_level')
+        battery_level = reading.get('battery_level')
+        status_code = reading.get('status_code')
+        values = [
+            int(timestamp),
+            _scaled(reading['temperature']),
+            _scaled(reading['humidity']),
+            _scaled(reading['weight']),
+            NULL_U16 if sound_level is None else sound_level,
+            NULL_U8 if battery_level is None else battery_level,
+            NULL_U16 if status_code is None else status_code,
+        ]
+        if sequenced:
+            sequence_number = reading.get('sequence_number')
+            values.append(NULL_U32 if sequence_number is None else sequence_number)
+        records.append(record_struct.pack(*values))
+
+    return b''.join([
+        HEADER.pack(MAGIC, VERSION, FLAG_SEQUENCE if sequenced else 0, len(serial_bytes)),
+        serial_bytes,
+        COUNT.pack(len(records)),
+        *records
+    ])
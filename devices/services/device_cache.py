@@ -0,0 +1,156 @@
+"""
+Device Serial Cache
+
+Every reading posted by a device carries its serial number, which has to be
+mapped to a SmartDevices row before the reading can be stored. That mapping
+changes rarely, so this module keeps a bounded, per-process LRU cache of
+serial -> (device_id, hive_id, is_active) with a TTL. Serials with no device
+are cached too, for the shorter SENSOR_DEVICE_CACHE_MISS_TTL, so a gateway
+posting an unknown serial to the unauthenticated endpoint does not cost a
+query per request.
+
+Entries, including cached misses, are invalidated from the SmartDevices
+signals in devices/signals.py, so a newly registered device is picked up on
+its first reading.
+Those signals only reach the current process, so the TTL bounds how long
+another worker may keep serving a stale entry.
+"""
+
+from collections import OrderedDict, namedtuple
+from django.conf import settings
+import threading
+import time
+
+from ..models import SmartDevices
+
+
+class CachedDevice(namedtuple('CachedDevice', ['device_id', 'hive_id', 'is_active'])):
+    """Cached identity of a device, enough to attach readings to it."""
+
+    __slots__ = ()
+
+    def as_device(self, serial_number):
+        """Return an unsaved SmartDevices reference usable as a foreign key value.
+
+        Only the identity fields are populated; the instance must not be saved.
+        """
+        return SmartDevices(
+            id=self.device_id,
+            serial_number=serial_number,
+            hive_id=self.hive_id,
+            is_active=self.is_active
+        )
+
+
+class DeviceSerialCache:
+    """Bounded LRU/TTL cache of device serial numbers with hit/miss counters."""
+
+    def __init__(self, max_size, ttl_seconds, miss_ttl_seconds):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.miss_ttl_seconds = miss_ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, serial_number):
+        """Return the CachedDevice for a serial, or None if no such device exists."""
+        return self.get_many([serial_number]).get(serial_number)
+
+    def get_many(self, serial_numbers):
+        """Resolve several serials, loading every miss with a single query."""
+        found = {}
+        missing = []
+        now = time.monotonic()
+
+        with self._lock:
+            for serial_number in set(serial_numbers):
+                entry = self._entries.get(serial_number)
+                if entry is not None and entry[0] > now:
+                    self._entries.move_to_end(serial_number)
+                    # A cached miss (None) is a hit that resolves to no device
+                    if entry[1] is not None:
+                        found[serial_number] = entry[1]
+                    self.hits += 1
+                else:
+                    if entry is not None:
+                        del self._entries[serial_number]
+                    missing.append(serial_number)
+                    self.misses += 1
+
+        if missing:
+            rows = SmartDevices.objects.filter(
+                serial_number__in=missing
+            ).values_list('serial_number', 'id', 'hive_id', 'is_active')
+
+            loaded = {
+                serial_number: CachedDevice(device_id, hive_id, is_active)
+                for serial_number, device_id, hive_id, is_active in rows
+            }
+            self._store(loaded)
+            self._store(dict.fromkeys(set(missing) - loaded.keys()), self.miss_ttl_seconds)
+            found.update(loaded)
+
+        return found
+
+    def _store(self, loaded, ttl_seconds=None):
+        expires_at = time.monotonic() + (self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+        with self._lock:
+            for serial_number, cached in loaded.items():
+                self._entries[serial_number] = (expires_at, cached)
+                self._entries.move_to_end(serial_number)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *serial_numbers):
+        """Drop the given serials from the cache."""
+        with self._lock:
+            for serial_number in serial_numbers:
+                if self._entries.pop(serial_number, None) is not None:
+                    self.invalidations += 1
+
+    def clear(self):
+        """Drop every entry and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.invalidations = 0
+
+    def stats(self):
+        """Return cache size and hit/miss counters for monitoring."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl_seconds,
+                'miss_ttl_seconds': self.miss_ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
+
+
+device_serial_cache = DeviceSerialCache(
+    max_size=settings.SENSOR_DEVICE_CACHE_SIZE,
+    ttl_seconds=settings.SENSOR_DEVICE_CACHE_TTL,
+    miss_ttl_seconds=settings.SENSOR_DEVICE_CACHE_MISS_TTL
+)
+
+
+def resolve_active_devices(serial_numbers):
+    """Map serial numbers to SmartDevices references, keeping only active devices."""
+    cached = device_serial_cache.get_many(serial_numbers)
+    return {
+        serial_number: entry.as_device(serial_number)
+        for serial_number, entry in cached.items()
+        if entry.is_active
+    }
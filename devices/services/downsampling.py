@@ -0,0 +1,210 @@
+"""
+Sensor Readings Downsampling
+
+Charts need a few hundred points, not every reading of a window. This module
+offers two ways to get them:
+
+- Time buckets (5m, 1h, 1d): the database groups readings into fixed-width
+  buckets aligned to UTC and returns count and min/avg/max per metric for each
+  bucket. 1h and 1d buckets are read from the hourly and daily rollups, with
+  readings not rolled up yet aggregated from the raw table and merged in.
+- LTTB (largest-triangle-three-buckets): picks at most N raw readings that keep
+  the visual shape of one metric's line, for charts that plot real readings.
+"""
+
+from django.db.models import Count, Sum, Min, Max, Func, DateTimeField
+from django.utils import timezone
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from ..models import SensorReadings, SensorReadingsHourly, SensorReadingsDaily
+from .rollups import ROLLUP_METRICS, SensorReadingsRollupService
+
+BUCKET_WIDTHS = {
+    '5m': timedelta(minutes=5),
+    '1h': timedelta(hours=1),
+    '1d': timedelta(days=1),
+}
+
+# Window used when the request does not give timestamp_after
+DEFAULT_WINDOWS = {
+    '5m': timedelta(days=1),
+    '1h': timedelta(days=7),
+    '1d': timedelta(days=90),
+    'lttb': timedelta(days=7),
+}
+
+ROLLUP_MODELS = {
+    '1h': SensorReadingsHourly,
+    '1d': SensorReadingsDaily,
+}
+
+
+class TimeBucket(Func):
+    """Floor a timestamp to a fixed-width bucket aligned to the Unix epoch (UTC)"""
+    template = 'to_timestamp(floor(extract(epoch from %(expressions)s) / %(seconds)s) * %(seconds)s)'
+    output_field = DateTimeField()
+
+    def __init__(self, expression, width, **extra):
+        super().__init__(expression, seconds=int(width.total_seconds()), **extra)
+
+
+def floor_bucket(value, width):
+    """Return the start of the bucket of the given width containing value."""
+    seconds = int(width.total_seconds())
+    return datetime.fromtimestamp(int(value.timestamp()) // seconds * seconds, tz=dt_timezone.utc)
+
+
+def lttb(points, threshold):
+    """Return the indexes of at most threshold (x, y) points chosen by largest-triangle-three-buckets.
+
+    The first and last points are always kept. Every bucket in between keeps
+    the point forming the largest triangle with the previously kept point and
+    the average of the next bucket.
+    """
+    count = len(points)
+    if threshold >= count or count <= 2:
+        return list(range(count))
+    if threshold <= 2:
+        return [0, count - 1]
+
+    selected = [0]
+    every = (count - 2) / (threshold - 2)
+    previous = 0
+
+    for i in range(threshold - 2):
+        average_start = int((i + 1) * every) + 1
+        average_end = min(int((i + 2) * every) + 1, count)
+        average_points = points[average_start:average_end]
+        average_x = sum(x for x, _ in average_points) / len(average_points)
+        average_y = sum(y for _, y in average_points) / len(average_points)
+
+        previous_x, previous_y = points[previous]
+        best_area, best = -1, None
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            x, y = points[j]
+            area = abs(
+                (previous_x - average_x) * (y - previous_y)
+                - (previous_x - x) * (average_y - previous_y)
+            )
+            if area > best_area:
+                best_area, best = area, j
+
+        selected.append(best)
+        previous = best
+
+    selected.append(count - 1)
+    return selected
+
+
+class SensorReadingsDownsampler:
+    """Reduce the readings of a set of devices in a time window to chart resolution."""
+
+    def window(self, mode, start=None, end=None):
+        """Return the (start, end) window, defaulting start from the mode's default window."""
+        end = end or timezone.now()
+        return start or end - DEFAULT_WINDOWS[mode], end
+
+    def buckets(self, devices, bucket, start, end):
+        """Return per-bucket count and min/avg/max of every metric, oldest bucket first.
+
+        Buckets are whole, so the first and last bucket may include readings
+        just outside [start, end).
+        """
+        width = BUCKET_WIDTHS[bucket]
+        start = floor_bucket(start, width)
+        stop = floor_bucket(end, width)
+        if stop < end:
+            stop += width
+        raw = SensorReadings.objects.filter(
+            device__in=devices,
+            timestamp__gte=start,
+            timestamp__lt=stop
+        )
+
+        merged = {}
+        rollup_model = ROLLUP_MODELS.get(bucket)
+        watermark = SensorReadingsRollupService().watermark() if rollup_model else None
+
+        if watermark is not None:
+            rows = rollup_model.objects.filter(
+                device__in=devices,
+                bucket__gte=start,
+                bucket__lt=stop
+            ).order_by().values('bucket').annotate(
+                reading_count=Sum('reading_count'),
+                **self._aggregates(lambda metric, part: f'{metric}_{part}', Sum)
+            )
+            self._merge(merged, rows)
+            raw = raw.filter(created_at__gt=watermark)
+
+        rows = raw.annotate(
+            bucket=TimeBucket('timestamp', width)
+        ).order_by().values('bucket').annotate(
+            reading_count=Count('id'),
+            **self._aggregates(lambda metric, part: metric, Count)
+        )
+        self._merge(merged, rows)
+
+        return [self._format(key, merged[key]) for key in sorted(merged)]
+
+    def _aggregates(self, column, count_function):
+        aggregates = {}
+        for metric in ROLLUP_METRICS:
+            aggregates.update({
+                f'{metric}_count': count_function(column(metric, 'count')),
+                f'{metric}_sum': Sum(column(metric, 'sum')),
+                f'{metric}_min': Min(column(metric, 'min')),
+                f'{metric}_max': Max(column(metric, 'max')),
+            })
+        return aggregates
+
+    def _merge(self, merged, rows):
+        for row in rows:
+            current = merged.setdefault(row['bucket'], {'reading_count': 0, **{
+                metric: {'count': 0, 'sum': 0.0, 'min': None, 'max': None} for metric in ROLLUP_METRICS
+            }})
+            current['reading_count'] += row['reading_count'] or 0
+            for metric in ROLLUP_METRICS:
+                values = current[metric]
+                values['count'] += row[f'{metric}_count'] or 0
+                values['sum'] += float(row[f'{metric}_sum'] or 0)
+                for name, pick in [('min', min), ('max', max)]:
+                    value = row[f'{metric}_{name}']
+                    if value is not None:
+                        value = float(value)
+                        values[name] = value if values[name] is None else pick(values[name], value)
+
+    def _format(self, bucket, values):
+        result = {'bucket': bucket, 'count': values['reading_count']}
+        for metric in ROLLUP_METRICS:
+            metric_values = values[metric]
+            result[metric] = {
+                'min': metric_values['min'],
+                'avg': round(metric_values['sum'] / metric_values['count'], 2) if metric_values['count'] else None,
+                'max': metric_values['max'],
+            }
+        return result
+
+    def lttb_readings(self, devices, metric, points, start, end):
+        """Return (readings, total) with at most points readings chosen by LTTB on metric.
+
+        Only the timestamp and metric of the window are loaded to choose the
+        points; the chosen readings are then fetched in full.
+        """
+        window = SensorReadings.objects.filter(
+            device__in=devices,
+            timestamp__gte=start,
+            timestamp__lt=end
+        )
+        series = list(
+            window.filter(**{f'{metric}__isnull': False})
+            .order_by('timestamp', 'id')
+            .values_list('id', 'timestamp', metric)
+        )
+        selected = lttb(
+            [(timestamp.timestamp(), float(value)) for _, timestamp, value in series],
+            points
+        )
+        ids = [series[index][0] for index in selected]
+        readings = window.filter(id__in=ids).select_related('device', 'device__hive').order_by('timestamp', 'id')
+        return list(readings), len(series)
@@ -0,0 +1,171 @@
+"""
+Device Heartbeat Coalescer
+
+Every accepted reading means its device has just synced, and most readings
+carry the device's battery level. Saving SmartDevices per reading would run
+the pre_save/post_save signal chain (an extra SELECT and a hive save) on the
+hot ingest path, so instead this module keeps the latest sync time and
+battery level per device in memory and writes them out with a single bulk
+UPDATE at most every SENSOR_HEARTBEAT_FLUSH_INTERVAL seconds. A daemon
+thread per process flushes on the same interval, so a worker that goes idle
+still writes its last heartbeats out and a killed process loses at most one
+interval of them. Several processes flush the same devices, so last_sync_at
+only ever moves forward.
+
+QuerySet.update() does not send model signals, which is what we want here:
+heartbeats never change a device's hive or active state.
+"""
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, When, Value, F, DateTimeField, IntegerField
+from django.db.models.functions import Greatest
+from django.utils import timezone
+import atexit
+import logging
+import os
+import threading
+import time
+
+from ..models import SmartDevices
+
+logger = logging.getLogger(__name__)
+
+
+class DeviceHeartbeatCoalescer:
+    """Per-process buffer of device sync times and battery levels."""
+
+    def __init__(self, flush_interval):
+        self.flush_interval = flush_interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._flusher_pid = None
+        self.flushes = 0
+        self.devices_updated = 0
+        self.last_flush_at = None
+
+    def record(self, readings, synced_at=None):
+        """Note that the devices of these readings synced, then flush if due.
+
+        The sync time is the server receive time; the battery level comes from
+        the newest reading (by device timestamp) that reports one.
+        """
+        synced_at = synced_at or timezone.now()
+        with self._lock:
+            for reading in readings:
+                entry = self._pending.get(reading.device_id)
+                if entry is None:
+                    entry = self._pending[reading.device_id] = {
+                        'synced_at': synced_at,
+                        'battery_level': None,
+                        'battery_at': None
+                    }
+                elif synced_at > entry['synced_at']:
+                    entry['synced_at'] = synced_at
+
+                if reading.battery_level is not None and (
+                    entry['battery_at'] is None or reading.timestamp >= entry['battery_at']
+                ):
+                    entry['battery_level'] = reading.battery_level
+                    entry['battery_at'] = reading.timestamp
+
+        self.start_flusher()
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def start_flusher(self):
+        """Start this process's periodic flush thread, again in a forked worker."""
+        if self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+        threading.Thread(target=self._run_flusher, name='device-heartbeat-flusher', daemon=True).start()
+
+    def _run_flusher(self):
+        interval = max(self.flush_interval, 1)
+        while True:
+            time.sleep(interval)
+            if time.monotonic() - self._last_flush < interval or not self._pending:
+                continue
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Error in the heartbeat flush thread: {str(e)}")
+            finally:
+                # The thread sleeps far longer than it holds a connection
+                connection.close()
+
+    def flush(self):
+        """Write all pending heartbeats with one UPDATE statement."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+
+        if not pending:
+            return 0
+
+        battery_updates = [
+            When(id=device_id, then=Value(entry['battery_level']))
+            for device_id, entry in pending.items()
+            if entry['battery_level'] is not None
+        ]
+        updates = {
+            # Another process may already have written a later sync time
+            'last_sync_at': Case(
+                *[
+                    When(id=device_id, then=Greatest(
+                        F('last_sync_at'), Value(entry['synced_at'], output_field=DateTimeField())
+                    ))
+                    for device_id, entry in pending.items()
+                ],
+                default=F('last_sync_at'),
+                output_field=DateTimeField()
+            )
+        }
+        if battery_updates:
+            updates['battery_level'] = Case(
+                *battery_updates,
+                default=F('battery_level'),
+                output_field=IntegerField()
+            )
+
+        try:
+            updated = SmartDevices.objects.filter(id__in=pending.keys()).update(**updates)
+        except Exception as e:
+            # Heartbeats are best effort; the next readings will carry fresh values
+            logger.error(f"Error flushing heartbeats for {len(pending)} devices: {str(e)}")
+            return 0
+
+        with self._lock:
+            self.flushes += 1
+            self.devices_updated += updated
+            self.last_flush_at = timezone.now()
+        logger.debug(f"Flushed heartbeats for {updated} devices")
+        return updated
+
+    def stats(self):
+        """Return pending and flushed heartbeat counters for monitoring."""
+        with self._lock:
+            return {
+                'pending_devices': len(self._pending),
+                'flush_interval_seconds': self.flush_interval,
+                'flushes': self.flushes,
+                'devices_updated': self.devices_updated,
+                'last_flush_at': self.last_flush_at.isoformat() if self.last_flush_at else None
+            }
+
+
+device_heartbeats = DeviceHeartbeatCoalescer(
+    flush_interval=settings.SENSOR_HEARTBEAT_FLUSH_INTERVAL
+)
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        device_heartbeats.flush()
+    except Exception:
+        pass
@@ -0,0 +1,252 @@
+"""
+Sensor Reading Ingest Service
+
+This service validates and stores sensor readings posted by IoT devices and
+gateways. A request may carry a single reading or a batch; a batch is
+validated item by item, every distinct device serial is resolved once
+through the device serial cache and the valid readings are written with a
+single bulk insert.
+
+Ingest is idempotent: SensorReadings is unique on (device, timestamp) and on
+(device, sequence_number), and the bulk insert uses ON CONFLICT DO NOTHING,
+so a reading retried by a gateway is skipped by the database and reported
+back as a duplicate instead of being stored twice. On the monthly
+partitioned table (migration 0005) the sequence number key is enforced per
+partition: a retry is only caught by it when it lands in the same month,
+which a reading resent with its original timestamp always does.
+
+With SENSOR_INGEST_WRITE_BEHIND enabled the validated readings are appended
+to the durable ingest spool instead (see ingest_buffer.py) and inserted later
+by the background flusher.
+
+Accepted readings also feed the device heartbeat coalescer (heartbeat.py),
+which keeps SmartDevices.last_sync_at and battery_level current without a
+device save per reading, and the per-hive latest reading snapshot
+(latest_reading.py), the per-device reading counters (reading_counters.py)
+and the streaming anomaly detector (production/services/anomaly_detector.py),
+which are updated in the same transaction as the insert. With
+ALERTS_EVALUATE_ON_INGEST enabled the hives that received readings get an
+alert check queued once the transaction commits
+(production/services/alert_events.py).
+"""
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+import logging
+
+from ..models import SensorReadings
+from ..serializers import SensorReadingsCreateSerializer
+from .device_cache import resolve_active_devices
+from .heartbeat import device_heartbeats
+from .latest_reading import LatestReadingSnapshotService
+from .reading_counters import DeviceReadingCounterService
+from production.services.alert_events import schedule_alert_checks
+from production.services.anomaly_detector import AnomalyDetector
+
+logger = logging.getLogger(__name__)
+
+
+class IngestResult:
+    """Outcome of an ingest call with one status entry per submitted item."""
+
+    def __init__(self, items):
+        self.items = items
+        self.readings = []
+        self.duplicates = []
+
+    @property
+    def created_count(self):
+        return sum(1 for item in self.items if item['status'] == 'created')
+
+    @property
+    def queued_count(self):
+        return sum(1 for item in self.items if item['status'] == 'queued')
+
+    @property
+    def duplicate_count(self):
+        return sum(1 for item in self.items if item['status'] == 'duplicate')
+
+    @property
+    def accepted_count(self):
+        return self.created_count + self.queued_count + self.duplicate_count
+
+    @property
+    def error_count(self):
+        return sum(1 for item in self.items if item['status'] == 'invalid')
+
+
+class SensorReadingsIngestService:
+    """Service for validating and bulk-writing sensor readings."""
+
+    def __init__(self, write_behind=None):
+        self.max_batch_size = settings.SENSOR_INGEST_MAX_BATCH_SIZE
+        if write_behind is None:
+            write_behind = settings.SENSOR_INGEST_WRITE_BEHIND
+        self.write_behind = write_behind
+
+    def ingest(self, items):
+        """Validate and store a list of reading payloads.
+
+        Returns an IngestResult whose `items` list is aligned with the input,
+        so callers can report a per-item status back to the gateway.
+        """
+        devices_by_serial = self.resolve_devices(items)
+        context = {'devices_by_serial': devices_by_serial}
+
+        accepted_status = 'queued' if self.write_behind else 'created'
+        results = []
+        pending = []
+        for index, item in enumerate(items):
+            serializer = SensorReadingsCreateSerializer(data=item, context=context)
+            if not serializer.is_valid():
+                results.append({
+                    'index': index,
+                    'status': 'invalid',
+                    'errors': serializer.errors
+                })
+                continue
+
+            reading = serializer.build_reading()
+            pending.append(reading)
+            results.append({
+                'index': index,
+                'status': accepted_status,
+                'id': str(reading.id)
+            })
+
+        return self.store(results, pending)
+
+    def ingest_binary(self, batch):
+        """Store readings decoded from the compact binary format.
+
+        Records are already typed, so they are range-checked and turned into
+        SensorReadings rows directly instead of going through the serializer.
+        Item indexes run across all frames in payload order.
+        """
+        from django.utils import timezone
+        from .binary_format import record_to_fields
+
+        devices_by_serial = resolve_active_devices({serial for serial, _ in batch.frames})
+        received_at = timezone.now()
+        accepted_status = 'queued' if self.write_behind else 'created'
+
+        results = []
+        pending = []
+        index = 0
+        for serial_number, records in batch.frames:
+            device = devices_by_serial.get(serial_number)
+            for record in records:
+                if device is None:
+                    results.append({
+                        'index': index,
+                        'status': 'invalid',
+                        'errors': {'device_serial': ['Device with this serial number not found or inactive.']}
+                    })
+                else:
+                    fields, errors = record_to_fields(record, received_at)
+                    if errors:
+                        results.append({'index': index, 'status': 'invalid', 'errors': errors})
+                    else:
+                        reading = SensorReadings(device=device, **fields)
+                        pending.append(reading)
+                        results.append({
+                            'index': index,
+                            'status': accepted_status,
+                            'id': str(reading.id)
+                        })
+                index += 1
+
+        return self.store(results, pending)
+
+    def store(self, results, pending):
+        """Write or queue the accepted readings and wrap up the per-item results.
+
+        Readings the database skipped as already stored are reported with
+        status 'duplicate'. Queued readings are deduplicated when flushed.
+        """
+        stored = pending
+        if pending:
+            if self.write_behind:
+                self.enqueue(pending)
+            else:
+                stored = self.write(pending)
+            # Duplicates count too: a retry still means the device is online
+            device_heartbeats.record(pending)
+
+        result = IngestResult(results)
+        result.readings = stored
+        if len(stored) < len(pending):
+            stored_ids = {reading.id for reading in stored}
+            result.duplicates = [reading for reading in pending if reading.id not in stored_ids]
+            duplicate_ids = {str(reading.id) for reading in result.duplicates}
+            for item in results:
+                if item.get('id') in duplicate_ids:
+                    item['status'] = 'duplicate'
+                    del item['id']
+        return result
+
+    def resolve_devices(self, items):
+        """Resolve every distinct device serial in the batch through the serial cache."""
+        serials = {
+            item.get('device_serial')
+            for item in items
+            if isinstance(item, dict) and isinstance(item.get('device_serial'), str)
+        }
+        if not serials:
+            return {}
+
+        return resolve_active_devices(serials)
+
+    def enqueue(self, readings):
+        """Durably queue validated readings for the background flusher."""
+        from .ingest_buffer import IngestSpool
+        IngestSpool().append(readings)
+        logger.debug(f"Queued {len(readings)} sensor readings for write-behind")
+
+    def write(self, readings):
+        """Persist validated readings in a single bulk insert, skipping duplicates.
+
+        Returns the readings that were actually inserted. Ids are generated
+        client side, so the rows that made it in are found by primary key
+        inside the same transaction. A replayed spool segment carries the ids
+        of rows that may already be stored, so a row only counts as inserted
+        when its created_at is the one this insert stamped on the instance.
+        """
+        stored_at = {}
+        with transaction.atomic():
+            SensorReadings.objects.bulk_create(
+                readings,
+                batch_size=self.max_batch_size,
+                ignore_conflicts=True
+            )
+            for start in range(0, len(readings), self.max_batch_size):
+                batch = readings[start:start + self.max_batch_size]
+                timestamps = [reading.timestamp for reading in batch]
+                # The timestamp range limits the lookup to the partitions the batch was written to
+                stored_at.update(SensorReadings.objects.filter(
+                    id__in=[reading.id for reading in batch],
+                    timestamp__gte=min(timestamps),
+                    timestamp__lte=max(timestamps)
+                ).values_list('id', 'created_at'))
+
+            inserted = [reading for reading in readings if stored_at.get(reading.id) == reading.created_at]
+            hive_ids = LatestReadingSnapshotService().record(inserted)
+            DeviceReadingCounterService().record(inserted)
+            AnomalyDetector().record(inserted)
+            schedule_alert_checks(hive_ids)
+
+        if len(inserted) < len(readings):
+            logger.info(f"Skipped {len(readings) - len(inserted)} duplicate sensor readings")
+        logger.debug(f"Stored {len(inserted)} sensor readings")
+        return inserted
+
+    def find_stored(self, reading):
+        """Return the stored reading that an unsaved duplicate collided with."""
+        match = Q(timestamp=reading.timestamp)
+        if reading.sequence_number is not None:
+            match |= Q(sequence_number=reading.sequence_number)
+        return SensorReadings.objects.select_related('device__hive').filter(
+            match,
+            device_id=reading.device_id
+        ).order_by('created_at').first()
@@ -0,0 +1,321 @@
+"""
+Write-Behind Ingest Buffer
+
+When SENSOR_INGEST_WRITE_BEHIND is enabled, validated readings are appended to
+a durable on-disk spool and acknowledged with 202 instead of being inserted
+inside the request. A background flusher (the flush_ingest_buffer_task Celery
+task or the flush_ingest_buffer management command) drains the spool into
+SensorReadings in large bulk inserts.
+
+Each request writes one NDJSON segment file. Segments are fsynced and then
+atomically renamed into place, so a segment is either fully visible or not at
+all. Flushers claim segments by renaming them, which lets several flushers run
+side by side without inserting the same segment twice. Retried readings are
+dropped at flush time by the ingest service's ON CONFLICT DO NOTHING insert.
+"""
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from decimal import Decimal
+from pathlib import Path
+import json
+import logging
+import os
+import time
+import uuid
+
+from ..models import SmartDevices, SensorReadings
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SUFFIX = '.ndjson'
+CLAIMED_SUFFIX = '.claimed'
+TEMP_SUFFIX = '.tmp'
+STATS_FILE = 'flush_stats.json'
+
+
+class IngestSpool:
+    """Durable directory-backed queue of validated sensor readings."""
+
+    def __init__(self, directory=None, max_batch_size=None, stale_claim_seconds=None):
+        self.directory = Path(directory or settings.SENSOR_INGEST_SPOOL_DIR)
+        self.failed_directory = self.directory / 'failed'
+        self.max_batch_size = max_batch_size or settings.SENSOR_INGEST_FLUSH_MAX_BATCH
+        self.stale_claim_seconds = stale_claim_seconds or settings.SENSOR_INGEST_STALE_CLAIM_SECONDS
+
+    def ensure_directories(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.failed_directory.mkdir(parents=True, exist_ok=True)
+
+    # Producer side
+
+    def append(self, readings):
+        """Durably append unsaved SensorReadings instances as one segment."""
+        if not readings:
+            return None
+
+        self.ensure_directories()
+        # Name encodes arrival time and row count so flushers can batch without reading files
+        name = f"{time.time_ns():020d}-{os.getpid()}-{uuid.uuid4().hex[:8]}-{len(readings)}{SEGMENT_SUFFIX}"
+        final_path = self.directory / name
+        temp_path = self.directory / (name + TEMP_SUFFIX)
+
+        with open(temp_path, 'w', encoding='utf-8') as segment:
+            for reading in readings:
+                segment.write(json.dumps(self.serialize_reading(reading)))
+                segment.write('\n')
+            segment.flush()
+            os.fsync(segment.fileno())
+
+        os.replace(temp_path, final_path)
+        self._fsync_directory()
+        return final_path
+
+    def serialize_reading(self, reading):
+        return {
+            'id': str(reading.id),
+            'device_id': str(reading.device_id),
+            'temperature': str(reading.temperature),
+            'humidity': str(reading.humidity),
+            'weight': str(reading.weight),
+            'sound_level': reading.sound_level,
+            'battery_level': reading.battery_level,
+            'status_code': reading.status_code,
+            'sequence_number': reading.sequence_number,
+            'timestamp': reading.timestamp.isoformat()
+        }
+
+    def _fsync_directory(self):
+        try:
+            fd = os.open(self.directory, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    # Consumer side
+
+    def pending_segments(self):
+        """Return ready segment paths, oldest first."""
+        if not self.directory.exists():
+            return []
+        return sorted(
+            path for path in self.directory.iterdir()
+            if path.name.endswith(SEGMENT_SUFFIX)
+        )
+
+    @staticmethod
+    def segment_row_count(path):
+        try:
+            return int(path.name[:-len(SEGMENT_SUFFIX)].rsplit('-', 1)[1])
+        except (IndexError, ValueError):
+            return 1
+
+    def claim_batch(self):
+        """Claim the oldest segments until they hold at least max_batch_size rows."""
+        claimed = []
+        rows = 0
+        for path in self.pending_segments():
+            claimed_path = path.with_name(path.name + CLAIMED_SUFFIX)
+            try:
+                os.rename(path, claimed_path)
+            except FileNotFoundError:
+                # Another flusher claimed it first
+                continue
+            # Stamp the claim time; stale claims are detected by mtime
+            os.utime(claimed_path)
+            claimed.append(claimed_path)
+            rows += self.segment_row_count(path)
+            if rows >= self.max_batch_size:
+                break
+        return claimed
+
+    def release_stale_claims(self):
+        """Return segments claimed by a flusher that died back to the queue."""
+        if not self.directory.exists():
+            return 0
+
+        released = 0
+        cutoff = time.time() - self.stale_claim_seconds
+        for path in self.directory.iterdir():
+            if not path.name.endswith(CLAIMED_SUFFIX):
+                continue
+            try:
+                if path.stat().st_mtime < cutoff:
+                    os.rename(path, path.with_name(path.name[:-len(CLAIMED_SUFFIX)]))
+                    released += 1
+            except FileNotFoundError:
+                continue
+        if released:
+            logger.warning(f"Released {released} stale ingest spool claims")
+        return released
+
+    def read_segment(self, path):
+        readings = []
+        with open(path, 'r', encoding='utf-8') as segment:
+            for line in segment:
+                line = line.strip()
+                if line:
+                    readings.append(self.deserialize_reading(json.loads(line)))
+        return readings
+
+    def deserialize_reading(self, row):
+        return SensorReadings(
+            id=uuid.UUID(row['id']),
+            device_id=uuid.UUID(row['device_id']),
+            temperature=Decimal(row['temperature']),
+            humidity=Decimal(row['humidity']),
+            weight=Decimal(row['weight']),
+            sound_level=row.get('sound_level'),
+            battery_level=row.get('battery_level'),
+            status_code=row.get('status_code'),
+            sequence_number=row.get('sequence_number'),
+            timestamp=parse_datetime(row['timestamp'])
+        )
+
+    def flush(self, max_seconds=None):
+        """Drain claimed segments into SensorReadings until the spool is empty.
+
+        Returns a dict of flush metrics, which is also written to the spool's
+        stats file so any process can report it.
+        """
+        from .ingest import SensorReadingsIngestService
+
+        started = time.monotonic()
+        ingest_service = SensorReadingsIngestService()
+        totals = {'batches': 0, 'rows_flushed': 0, 'rows_duplicate': 0, 'rows_dropped': 0, 'segments_failed': 0}
+
+        self.release_stale_claims()
+
+        while True:
+            claimed = self.claim_batch()
+            if not claimed:
+                break
+
+            batch_started = time.monotonic()
+            flushed, duplicate, dropped, failed = self._flush_segments(ingest_service, claimed)
+            totals['batches'] += 1
+            totals['rows_flushed'] += flushed
+            totals['rows_duplicate'] += duplicate
+            totals['rows_dropped'] += dropped
+            totals['segments_failed'] += failed
+            logger.info(
+                f"Flushed {flushed} buffered readings from {len(claimed)} segments "
+                f"in {(time.monotonic() - batch_started) * 1000:.1f}ms"
+            )
+
+            if max_seconds is not None and time.monotonic() - started >= max_seconds:
+                break
+
+        totals['duration_ms'] = round((time.monotonic() - started) * 1000, 1)
+        if totals['batches']:
+            self.record_flush(totals)
+        return totals
+
+    def _flush_segments(self, ingest_service, claimed):
+        segments = []
+        failed = 0
+        for path in claimed:
+            try:
+                segments.append((path, self.read_segment(path)))
+            except (OSError, ValueError) as e:
+                logger.error(f"Unreadable ingest spool segment {path.name}: {str(e)}")
+                self._move_to_failed(path)
+                failed += 1
+
+        readings = [reading for _, segment_readings in segments for reading in segment_readings]
+        readings, dropped = self._drop_orphaned(readings)
+
+        try:
+            flushed = len(ingest_service.write(readings)) if readings else 0
+        except Exception as e:
+            # Fall back to one segment at a time so a single bad segment cannot block the spool
+            logger.error(f"Bulk flush of {len(readings)} buffered readings failed: {str(e)}")
+            flushed = 0
+            duplicate = 0
+            dropped = 0
+            for path, segment_readings in segments:
+                segment_readings, segment_dropped = self._drop_orphaned(segment_readings)
+                dropped += segment_dropped
+                try:
+                    segment_flushed = len(ingest_service.write(segment_readings)) if segment_readings else 0
+                    flushed += segment_flushed
+                    duplicate += len(segment_readings) - segment_flushed
+                    path.unlink()
+                except Exception as segment_error:
+                    logger.error(f"Moving ingest spool segment {path.name} to failed/: {str(segment_error)}")
+                    self._move_to_failed(path)
+                    failed += 1
+            return flushed, duplicate, dropped, failed
+
+        for path, _ in segments:
+            path.unlink()
+        return flushed, len(readings) - flushed, dropped, failed
+
+    def _drop_orphaned(self, readings):
+        """Drop readings whose device was deleted after they were queued."""
+        device_ids = {reading.device_id for reading in readings}
+        if not device_ids:
+            return readings, 0
+        existing = set(SmartDevices.objects.filter(id__in=device_ids).values_list('id', flat=True))
+        kept = [reading for reading in readings if reading.device_id in existing]
+        return kept, len(readings) - len(kept)
+
+    def _move_to_failed(self, path):
+        self.failed_directory.mkdir(parents=True, exist_ok=True)
+        try:
+            os.replace(path, self.failed_directory / path.name[:-len(CLAIMED_SUFFIX)])
+        except FileNotFoundError:
+            pass
+
+    # Metrics
+
+    def record_flush(self, totals):
+        stats = self.read_flush_stats()
+        stats.update({
+            'total_batches': stats.get('total_batches', 0) + totals['batches'],
+            'total_rows_flushed': stats.get('total_rows_flushed', 0) + totals['rows_flushed'],
+            'total_rows_duplicate': stats.get('total_rows_duplicate', 0) + totals['rows_duplicate'],
+            'total_rows_dropped': stats.get('total_rows_dropped', 0) + totals['rows_dropped'],
+            'total_segments_failed': stats.get('total_segments_failed', 0) + totals['segments_failed'],
+            'last_flush_at': timezone.now().isoformat(),
+            'last_flush_rows': totals['rows_flushed'],
+            'last_flush_duration_ms': totals['duration_ms'],
+        })
+        temp_path = self.directory / (STATS_FILE + f'.{os.getpid()}' + TEMP_SUFFIX)
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as stats_file:
+                json.dump(stats, stats_file)
+            os.replace(temp_path, self.directory / STATS_FILE)
+        except OSError as e:
+            logger.warning(f"Could not write ingest flush stats: {str(e)}")
+
+    def read_flush_stats(self):
+        try:
+            with open(self.directory / STATS_FILE, 'r', encoding='utf-8') as stats_file:
+                return json.load(stats_file)
+        except (OSError, ValueError):
+            return {}
+
+    def stats(self):
+        """Return spool backlog and the most recent flush metrics."""
+        segments = self.pending_segments()
+        oldest_age = None
+        if segments:
+            oldest_ns = int(segments[0].name.split('-', 1)[0])
+            oldest_age = round(max(time.time_ns() - oldest_ns, 0) / 1e9, 1)
+
+        return {
+            'enabled': settings.SENSOR_INGEST_WRITE_BEHIND,
+            'pending_segments': len(segments),
+            'pending_rows': sum(self.segment_row_count(path) for path in segments),
+            'oldest_pending_age_seconds': oldest_age,
+            'max_batch_size': self.max_batch_size,
+            'max_latency_seconds': settings.SENSOR_INGEST_FLUSH_MAX_LATENCY,
+            'flush': self.read_flush_stats()
+        }
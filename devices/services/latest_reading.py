@@ -0,0 +1,146 @@
+"""
+Hive Latest Reading Snapshot
+
+Dashboards, hive detail pages and the alert checker all need "the newest
+reading of this hive's active devices". Answering that from SensorReadings
+means an ORDER BY timestamp DESC LIMIT 1 through the device join for every
+hive, so HiveLatestReading keeps one row per hive with those values instead.
+
+The ingest service upserts the snapshot in the same transaction as the
+readings, with a conditional ON CONFLICT DO UPDATE that only replaces a row
+with a newer reading. Device signals call refresh() when a device moves to
+another hive, is deactivated or is deleted, which recomputes the affected
+hives from SensorReadings.
+"""
+
+from django.db import connection, transaction
+from django.utils import timezone
+import logging
+
+from ..models import SmartDevices, SensorReadings, HiveLatestReading
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FIELDS = [
+    'temperature', 'humidity', 'weight', 'sound_level', 'battery_level',
+    'status_code', 'sequence_number', 'timestamp', 'created_at'
+]
+
+
+class LatestReadingSnapshotService:
+    """Maintain HiveLatestReading from stored sensor readings."""
+
+    def record(self, readings):
+        """Upsert the snapshot of every hive touched by these newly stored readings.
+
+        Only the newest reading per hive is sent, and an existing snapshot is
+        replaced only when the incoming reading is newer, so out-of-order and
+        concurrent batches cannot move a snapshot backwards. Returns the ids
+        of the hives the readings belong to.
+        """
+        newest_by_hive = {}
+        for reading, hive_id in self._with_hive_ids(readings):
+            current = newest_by_hive.get(hive_id)
+            if current is None or reading.timestamp > current.timestamp:
+                newest_by_hive[hive_id] = reading
+
+        if not newest_by_hive:
+            return []
+
+        # Sorted so concurrent upserts take row locks in the same order
+        rows = [
+            self._row(hive_id, newest_by_hive[hive_id])
+            for hive_id in sorted(newest_by_hive, key=str)
+        ]
+        self._upsert(rows)
+        return [row['hive_id'] for row in rows]
+
+    def _with_hive_ids(self, readings):
+        # Ingest passes readings with a cached device reference; readings
+        # from the write-behind spool only carry device_id
+        uncached = {
+            reading.device_id for reading in readings
+            if not SensorReadings.device.is_cached(reading)
+        }
+        hive_by_device = {}
+        if uncached:
+            hive_by_device = dict(
+                SmartDevices.objects.filter(
+                    id__in=uncached,
+                    is_active=True
+                ).values_list('id', 'hive_id')
+            )
+
+        for reading in readings:
+            if SensorReadings.device.is_cached(reading):
+                hive_id = reading.device.hive_id if reading.device.is_active else None
+            else:
+                hive_id = hive_by_device.get(reading.device_id)
+            if hive_id is not None:
+                yield reading, hive_id
+
+    def _row(self, hive_id, reading):
+        return {
+            'hive_id': hive_id,
+            'device_id': reading.device_id,
+            'reading_id': reading.id,
+            'updated_at': timezone.now(),
+            **{field: getattr(reading, field) for field in SNAPSHOT_FIELDS}
+        }
+
+    def _upsert(self, rows):
+        meta = HiveLatestReading._meta
+        quote = connection.ops.quote_name
+        fields = meta.concrete_fields
+
+        params = []
+        for row in rows:
+            params.extend(field.get_db_prep_save(row[field.attname], connection) for field in fields)
+
+        table = quote(meta.db_table)
+        pk_column = quote(meta.pk.column)
+        placeholders = '(' + ', '.join(['%s'] * len(fields)) + ')'
+        updates = ', '.join(
+            f'{quote(field.column)} = EXCLUDED.{quote(field.column)}'
+            for field in fields if not field.primary_key
+        )
+        sql = (
+            f"INSERT INTO {table} ({', '.join(quote(field.column) for field in fields)}) "
+            f"VALUES {', '.join([placeholders] * len(rows))} "
+            f"ON CONFLICT ({pk_column}) DO UPDATE SET {updates} "
+            f"WHERE {table}.{quote('timestamp')} < EXCLUDED.{quote('timestamp')}"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+    def refresh(self, hive_ids):
+        """Recompute the snapshot of the given hives from SensorReadings."""
+        refreshed = 0
+        for hive_id in {hive_id for hive_id in hive_ids if hive_id is not None}:
+            latest = SensorReadings.objects.filter(
+                device__hive_id=hive_id,
+                device__is_active=True
+            ).order_by('-timestamp').first()
+
+            with transaction.atomic():
+                if latest is None:
+                    HiveLatestReading.objects.filter(hive_id=hive_id).delete()
+                    continue
+                row = self._row(hive_id, latest)
+                del row['hive_id']
+                HiveLatestReading.objects.update_or_create(hive_id=hive_id, defaults=row)
+                refreshed += 1
+        return refreshed
+
+    def rebuild(self):
+        """Recompute the snapshot of every hive that has an active device."""
+        hive_ids = set(
+            SmartDevices.objects.filter(
+                is_active=True,
+                hive__isnull=False
+            ).values_list('hive_id', flat=True)
+        )
+        stale = HiveLatestReading.objects.exclude(hive_id__in=hive_ids).delete()[0]
+        refreshed = self.refresh(hive_ids)
+        logger.info(f"Rebuilt {refreshed} hive latest reading snapshots, removed {stale} stale")
+        return refreshed, stale
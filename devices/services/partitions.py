@@ -0,0 +1,183 @@
+"""
+SensorReadings Partition Manager
+
+On PostgreSQL the sensor readings table is range partitioned by timestamp into
+one partition per calendar month (UTC), named <table>_pYYYYMM, plus a default
+partition that catches readings outside every defined month. Time-filtered
+queries only touch the months they cover, and expiring a month is a DETACH and
+DROP of one partition instead of a long DELETE that leaves the table bloated.
+
+Partitions inherit the parent's primary key (id, timestamp), the unique
+(device, timestamp) constraint and the indexes. A unique index must contain
+the partition key to live on the parent, so the (device, sequence_number)
+uniqueness used by idempotent ingest is created on each partition instead and
+holds within a month.
+
+The table is converted by migration devices 0005; this module keeps partitions
+created ahead of time and removes expired ones, taking their rows off the
+per-device reading counters. It is a no-op on databases
+where the table is not partitioned.
+"""
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from datetime import datetime, timezone as dt_timezone
+import logging
+import re
+
+from ..models import SensorReadings
+from .reading_counters import DeviceReadingCounterService
+
+logger = logging.getLogger(__name__)
+
+
+def month_start(value):
+    """Return the first instant (UTC) of the month containing value."""
+    value = value.astimezone(dt_timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(value, months):
+    """Shift a month start by a number of months."""
+    month_index = value.year * 12 + value.month - 1 + months
+    return value.replace(year=month_index // 12, month=month_index % 12 + 1)
+
+
+class SensorReadingsPartitionManager:
+    """Create, list and expire monthly SensorReadings partitions."""
+
+    def __init__(self, months_ahead=None, retention_months=None):
+        self.table = SensorReadings._meta.db_table
+        self.months_ahead = (
+            settings.SENSOR_READINGS_PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+        )
+        self.retention_months = (
+            settings.SENSOR_READINGS_RETENTION_MONTHS if retention_months is None else retention_months
+        )
+        self.partition_pattern = re.compile(rf'^{re.escape(self.table)}_p(\d{{4}})(\d{{2}})$')
+
+    def quote(self, name):
+        return connection.ops.quote_name(name)
+
+    def partition_name(self, start):
+        return f'{self.table}_p{start.year}{start.month:02d}'
+
+    @property
+    def default_partition(self):
+        return f'{self.table}_default'
+
+    def is_partitioned(self):
+        """Return True when the readings table is a partitioned table."""
+        if connection.vendor != 'postgresql':
+            return False
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)",
+                [self.table]
+            )
+            row = cursor.fetchone()
+        return bool(row) and row[0] == 'p'
+
+    def partitions(self):
+        """Return {month start: partition name} for the attached monthly partitions."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT child.relname
+                FROM pg_inherits
+                JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+                WHERE pg_inherits.inhparent = to_regclass(%s)
+                """,
+                [self.table]
+            )
+            names = [row[0] for row in cursor.fetchall()]
+
+        months = {}
+        for name in names:
+            match = self.partition_pattern.match(name)
+            if match:
+                months[datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=dt_timezone.utc)] = name
+        return dict(sorted(months.items()))
+
+    def ensure_future_partitions(self, now=None):
+        """Create monthly partitions from the current month to months_ahead months out."""
+        current = month_start(now or timezone.now())
+        existing = self.partitions()
+        created = []
+        for offset in range(self.months_ahead + 1):
+            start = add_months(current, offset)
+            if start not in existing:
+                self.create_partition(start)
+                created.append(self.partition_name(start))
+        return created
+
+    def create_partition(self, start):
+        """Create the partition for the month beginning at start.
+
+        Rows for that month that already landed in the default partition are
+        moved into the new partition before it is attached.
+        """
+        end = add_months(start, 1)
+        name = self.partition_name(start)
+        table = self.quote(self.table)
+        partition = self.quote(name)
+        default = self.quote(self.default_partition)
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'CREATE TABLE {partition} (LIKE {table} INCLUDING DEFAULTS)')
+            cursor.execute(
+                f'WITH moved AS ('
+                f'DELETE FROM {default} WHERE timestamp >= %s AND timestamp < %s RETURNING *'
+                f') INSERT INTO {partition} SELECT * FROM moved',
+                [start, end]
+            )
+            moved = cursor.rowcount
+            cursor.execute(
+                f'ALTER TABLE {table} ATTACH PARTITION {partition} FOR VALUES FROM (%s) TO (%s)',
+                [start, end]
+            )
+            cursor.execute(
+                f'CREATE UNIQUE INDEX {self.quote(name + "_device_sequence_uniq")} '
+                f'ON {partition} (device_id, sequence_number) WHERE sequence_number IS NOT NULL'
+            )
+
+        logger.info(f"Created sensor readings partition {name}" + (f" ({moved} rows moved from default)" if moved else ""))
+        return name
+
+    def expired_partitions(self, now=None):
+        """Return {month start: name} of partitions entirely older than the retention window."""
+        if not self.retention_months:
+            return {}
+        cutoff = add_months(month_start(now or timezone.now()), -self.retention_months)
+        return {
+            start: name for start, name in self.partitions().items()
+            if add_months(start, 1) <= cutoff
+        }
+
+    def drop_partition(self, name, keep_table=False):
+        """Detach a monthly partition and drop it, or keep it as a standalone table."""
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'ALTER TABLE {self.quote(self.table)} DETACH PARTITION {self.quote(name)}')
+            cursor.execute(f'SELECT device_id, COUNT(*) FROM {self.quote(name)} GROUP BY device_id')
+            DeviceReadingCounterService().subtract(dict(cursor.fetchall()))
+            if not keep_table:
+                cursor.execute(f'DROP TABLE {self.quote(name)}')
+        logger.info(f"{'Detached' if keep_table else 'Dropped'} sensor readings partition {name}")
+
+    def row_count(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {self.quote(name)}')
+            return cursor.fetchone()[0]
+
+    def maintain(self, now=None, keep_detached=False):
+        """Create upcoming partitions and drop expired ones; return what was done."""
+        if not self.is_partitioned():
+            return {'partitioned': False, 'created': [], 'dropped': []}
+
+        created = self.ensure_future_partitions(now)
+        dropped = []
+        for name in self.expired_partitions(now).values():
+            self.drop_partition(name, keep_table=keep_detached)
+            dropped.append(name)
+        return {'partitioned': True, 'created': created, 'dropped': dropped}
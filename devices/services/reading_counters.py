@@ -0,0 +1,202 @@
+"""
+Device Reading Counters
+
+Device statistics, the device detail page and the apiary smart metrics show
+how many readings devices have stored in total and over the last 24 hours and
+week. DeviceReadingCounter keeps the running total per device and
+DeviceReadingHourlyCount the number of readings per device and hour (by reading
+timestamp) for the last READING_COUNTER_HOURLY_DAYS days, so those numbers are
+a few row reads instead of COUNT(*) scans over sensor_readings.
+
+The ingest path calls record() in the same transaction as the insert and the
+counters are bumped with INSERT ... ON CONFLICT DO UPDATE, so they commit or
+roll back together with the readings. Data retention deletes readings through
+delete_readings(), which subtracts what it removed in the same transaction;
+dropping a partition and expiring archived readings subtract their per-device
+row counts. Moving readings to the cold archive leaves the counters alone:
+archived readings still count until they expire.
+
+rebuild() recomputes the counters from the readings table and the archive
+manifest (python manage.py rebuild_reading_counters).
+"""
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Greatest, TruncHour
+from django.utils import timezone
+from collections import Counter
+from datetime import timedelta, timezone as dt_timezone
+import logging
+
+from ..models import (
+    SmartDevices, SensorReadings, SensorReadingsArchive, DeviceReadingCounter, DeviceReadingHourlyCount
+)
+
+logger = logging.getLogger(__name__)
+
+
+def utc_hour(value):
+    """Return the start of the UTC hour containing value."""
+    return value.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+class DeviceReadingCounterService:
+    """Maintain and query the per-device reading counters."""
+
+    def __init__(self, hourly_days=None):
+        self.hourly_days = settings.READING_COUNTER_HOURLY_DAYS if hourly_days is None else hourly_days
+
+    def horizon(self, now=None):
+        """Return the oldest hour that still has hourly counts."""
+        return utc_hour((now or timezone.now()) - timedelta(days=self.hourly_days))
+
+    def record(self, readings):
+        """Add newly stored readings to the counters; call inside the inserting transaction."""
+        horizon = self.horizon()
+        totals = Counter()
+        hourly = Counter()
+        for reading in readings:
+            totals[reading.device_id] += 1
+            bucket = utc_hour(reading.timestamp)
+            if bucket >= horizon:
+                hourly[(reading.device_id, bucket)] += 1
+
+        if not totals:
+            return
+        # Sorted so concurrent batches take row locks in the same order
+        self._increment(
+            DeviceReadingCounter, ['device_id'], 'total_readings',
+            sorted(totals.items(), key=lambda item: str(item[0])),
+            extra={'updated_at': timezone.now()}
+        )
+        if hourly:
+            self._increment(
+                DeviceReadingHourlyCount, ['device_id', 'bucket'], 'reading_count',
+                sorted(hourly.items(), key=lambda item: (str(item[0][0]), item[0][1]))
+            )
+
+    def subtract(self, totals, hourly=None):
+        """Take removed readings off the counters.
+
+        totals maps device id to rows removed, hourly maps (device id, hour)
+        to rows removed. Counters never go below zero.
+        """
+        for device_id in sorted(totals, key=str):
+            DeviceReadingCounter.objects.filter(device_id=device_id).update(
+                total_readings=Greatest(F('total_readings') - totals[device_id], 0),
+                updated_at=timezone.now()
+            )
+        for (device_id, bucket), removed in sorted((hourly or {}).items(), key=lambda item: (str(item[0][0]), item[0][1])):
+            DeviceReadingHourlyCount.objects.filter(device_id=device_id, bucket=bucket).update(
+                reading_count=Greatest(F('reading_count') - removed, 0)
+            )
+
+    def delete_readings(self, readings):
+        """Delete a SensorReadings queryset and subtract it from the counters in one transaction; return rows deleted."""
+        with transaction.atomic():
+            totals = dict(
+                readings.order_by().values('device_id').annotate(removed=Count('id')).values_list('device_id', 'removed')
+            )
+            if not totals:
+                return 0
+            hourly = {
+                (device_id, bucket): removed
+                for device_id, bucket, removed in readings.filter(
+                    timestamp__gte=self.horizon()
+                ).annotate(
+                    hour=TruncHour('timestamp', tzinfo=dt_timezone.utc)
+                ).order_by().values('device_id', 'hour').annotate(
+                    removed=Count('id')
+                ).values_list('device_id', 'hour', 'removed')
+            }
+            deleted, _ = readings.delete()
+            self.subtract(totals, hourly)
+        return deleted
+
+    def total(self, devices):
+        """Return the number of readings stored (and archived) for these devices."""
+        return DeviceReadingCounter.objects.filter(
+            device__in=devices
+        ).aggregate(total=Sum('total_readings'))['total'] or 0
+
+    def count_since(self, devices, since):
+        """Count readings of these devices since the start of the hour containing since.
+
+        Windows reaching further back than READING_COUNTER_HOURLY_DAYS only
+        count the hours that are still kept.
+        """
+        return DeviceReadingHourlyCount.objects.filter(
+            device__in=devices,
+            bucket__gte=utc_hour(since)
+        ).aggregate(total=Sum('reading_count'))['total'] or 0
+
+    def prune(self, now=None):
+        """Delete hourly counts older than the horizon; return the rows deleted."""
+        deleted, _ = DeviceReadingHourlyCount.objects.filter(bucket__lt=self.horizon(now)).delete()
+        if deleted:
+            logger.info(f"Pruned {deleted} hourly reading counts")
+        return deleted
+
+    def rebuild(self, devices=None):
+        """Recompute the counters of these devices (all by default) from the readings; return devices rebuilt.
+
+        Each device's counter row is locked while it is recounted. Ingest
+        updates the same row after inserting, so readings committed before
+        the lock are counted and readings committed after it are added on top.
+        """
+        if devices is None:
+            devices = SmartDevices.objects.all()
+        horizon = self.horizon()
+        rebuilt = 0
+        for device_id in devices.order_by('id').values_list('id', flat=True):
+            with transaction.atomic():
+                DeviceReadingCounter.objects.get_or_create(device_id=device_id)
+                counter = DeviceReadingCounter.objects.select_for_update().get(device_id=device_id)
+
+                readings = SensorReadings.objects.filter(device_id=device_id)
+                archived = SensorReadingsArchive.objects.filter(
+                    device_id=device_id
+                ).aggregate(rows=Sum('row_count'))['rows'] or 0
+                counter.total_readings = readings.count() + archived
+                counter.save(update_fields=['total_readings', 'updated_at'])
+
+                DeviceReadingHourlyCount.objects.filter(device_id=device_id).delete()
+                DeviceReadingHourlyCount.objects.bulk_create([
+                    DeviceReadingHourlyCount(device_id=device_id, bucket=bucket, reading_count=count)
+                    for bucket, count in readings.filter(timestamp__gte=horizon).annotate(
+                        hour=TruncHour('timestamp', tzinfo=dt_timezone.utc)
+                    ).order_by().values('hour').annotate(count=Count('id')).values_list('hour', 'count')
+                ])
+            rebuilt += 1
+
+        logger.info(f"Rebuilt reading counters of {rebuilt} devices")
+        return rebuilt
+
+    def _increment(self, model, key_fields, count_field, rows, extra=None):
+        """Upsert rows of (key values, count), adding count to existing rows."""
+        quote = connection.ops.quote_name
+        meta = model._meta
+        extra = extra or {}
+        columns = [meta.get_field(name).column for name in key_fields] + [count_field] + list(extra)
+
+        params = []
+        for key, count in rows:
+            params.extend(key if isinstance(key, tuple) else (key,))
+            params.append(count)
+            params.extend(extra.values())
+
+        table = quote(meta.db_table)
+        placeholders = '(' + ', '.join(['%s'] * len(columns)) + ')'
+        updates = ', '.join(
+            [f'{quote(count_field)} = {table}.{quote(count_field)} + EXCLUDED.{quote(count_field)}']
+            + [f'{quote(column)} = EXCLUDED.{quote(column)}' for column in extra]
+        )
+        sql = (
+            f"INSERT INTO {table} ({', '.join(quote(column) for column in columns)}) "
+            f"VALUES {', '.join([placeholders] * len(rows))} "
+            f"ON CONFLICT ({', '.join(quote(meta.get_field(name).column) for name in key_fields)}) "
+            f"DO UPDATE SET {updates}"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
@@ -0,0 +1,148 @@
+"""
+Data Retention Enforcement
+
+Deletes each user's sensor readings, audio recordings and device images older
+than DataSyncSettings.data_retention_days, together with the hourly and daily
+rollup buckets, cold archive rows and latest-reading snapshots that fall before
+the same cutoff. Sensor readings are subtracted from the per-device reading
+counters as they are deleted.
+Users without DataSyncSettings keep all their data.
+
+Rows are deleted oldest first in chunks of DATA_RETENTION_CHUNK_SIZE, sleeping
+DATA_RETENTION_SLEEP_SECONDS between chunks so autovacuum and replicas keep up
+instead of facing one huge DELETE. Progress is stored per user in the
+JobWatermark payload; an interrupted run resumes after the last finished user.
+"""
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from datetime import datetime, timedelta
+import logging
+import time
+
+from settings.models import DataSyncSettings
+from ..models import (
+    SmartDevices, SensorReadings, AudioRecordings, DeviceImages,
+    SensorReadingsHourly, SensorReadingsDaily, HiveLatestReading, SensorReadingsArchive, JobWatermark
+)
+from .archive import SensorReadingsArchiver
+from .reading_counters import DeviceReadingCounterService
+
+logger = logging.getLogger(__name__)
+
+RETENTION_JOB = 'data_retention'
+
+# (report key, model, time field, bucket width); a rollup bucket is removed
+# once all of it is older than the cutoff
+RETENTION_TARGETS = [
+    ('sensor_readings', SensorReadings, 'timestamp', timedelta(0)),
+    ('audio_recordings', AudioRecordings, 'recorded_at', timedelta(0)),
+    ('device_images', DeviceImages, 'captured_at', timedelta(0)),
+    ('hourly_rollups', SensorReadingsHourly, 'bucket', timedelta(hours=1)),
+    ('daily_rollups', SensorReadingsDaily, 'bucket', timedelta(days=1)),
+]
+
+
+class DataRetentionService:
+    """Delete user data older than each user's retention period."""
+
+    def __init__(self, chunk_size=None, sleep_seconds=None, dry_run=False):
+        self.chunk_size = chunk_size or settings.DATA_RETENTION_CHUNK_SIZE
+        self.sleep_seconds = settings.DATA_RETENTION_SLEEP_SECONDS if sleep_seconds is None else sleep_seconds
+        self.dry_run = dry_run
+
+    def run(self, now=None, user_id=None, restart=False):
+        """Enforce retention for every user with data sync settings; return the per-user report.
+
+        A run that was interrupted continues after the last finished user
+        unless restart is set. Dry runs and single-user runs neither use
+        nor change the resume state.
+        """
+        now = now or timezone.now()
+        track_progress = not self.dry_run and user_id is None
+
+        job, _ = JobWatermark.objects.get_or_create(name=RETENTION_JOB)
+        # Only a tracked run resumes; a dry run reports on every user
+        resume_after = job.payload.get('last_user_id') if track_progress and not restart else None
+        if resume_after:
+            now = datetime.fromisoformat(job.payload['run_started'])
+            logger.info(f"Resuming data retention run after user {resume_after}")
+        elif track_progress:
+            job.payload = {'run_started': now.isoformat()}
+            job.save(update_fields=['payload', 'updated_at'])
+
+        user_settings = DataSyncSettings.objects.select_related('user').order_by('user_id')
+        if user_id is not None:
+            user_settings = user_settings.filter(user_id=user_id)
+        elif resume_after:
+            user_settings = user_settings.filter(user_id__gt=resume_after)
+
+        report = []
+        for sync_settings in user_settings:
+            report.append(self.enforce_for_user(sync_settings, now))
+            if track_progress:
+                job.payload['last_user_id'] = str(sync_settings.user_id)
+                job.save(update_fields=['payload', 'updated_at'])
+
+        if track_progress:
+            job.watermark = now
+            job.payload = {}
+            job.save(update_fields=['watermark', 'payload', 'updated_at'])
+
+        return report
+
+    def enforce_for_user(self, sync_settings, now):
+        """Delete one user's expired rows; return the rows removed (or due, on a dry run) per kind."""
+        cutoff = now - timedelta(days=sync_settings.data_retention_days)
+        devices = SmartDevices.objects.filter(beekeeper__user_id=sync_settings.user_id)
+
+        result = {
+            'user_id': str(sync_settings.user_id),
+            'email': sync_settings.user.email,
+            'retention_days': sync_settings.data_retention_days,
+            'cutoff': cutoff.isoformat(),
+        }
+        for key, model, field, width in RETENTION_TARGETS:
+            expired = model.objects.filter(device__in=devices, **{f'{field}__lt': cutoff - width})
+            result[key] = expired.count() if self.dry_run else self._delete_in_chunks(expired, field, cutoff - width)
+
+        # Readings moved to the cold archive expire with the same cutoff
+        result['archived_readings'] = 0
+        if SensorReadingsArchive.objects.filter(device__in=devices, min_timestamp__lt=cutoff).exists():
+            archiver = SensorReadingsArchiver()
+            if self.dry_run:
+                result['archived_readings'] = archiver.expiring(devices, cutoff)
+            else:
+                result['archived_readings'] = archiver.expire(devices, cutoff)
+
+        # A snapshot whose reading has just expired would otherwise outlive it
+        stale_snapshots = HiveLatestReading.objects.filter(device__in=devices, timestamp__lt=cutoff)
+        result['latest_snapshots'] = stale_snapshots.count() if self.dry_run else stale_snapshots.delete()[0]
+
+        removed = sum(result[key] for key, *_ in RETENTION_TARGETS) + result['archived_readings']
+        if removed and not self.dry_run:
+            logger.info(f"Data retention removed {removed} rows for {result['email']} (older than {cutoff:%Y-%m-%d})")
+        return result
+
+    def _delete_in_chunks(self, expired, field, cutoff):
+        deleted = 0
+        while True:
+            # Oldest first so every chunk walks the same end of the time index
+            ids = list(expired.order_by(field).values_list('pk', flat=True)[:self.chunk_size])
+            if not ids:
+                return deleted
+
+            # The time bound lets PostgreSQL skip partitions that cannot hold the rows
+            chunk = expired.model.objects.filter(pk__in=ids, **{f'{field}__lt': cutoff})
+            if expired.model is SensorReadings:
+                count = DeviceReadingCounterService().delete_readings(chunk)
+            else:
+                with transaction.atomic():
+                    count, _ = chunk.delete()
+            deleted += count
+
+            if len(ids) < self.chunk_size:
+                return deleted
+            if self.sleep_seconds:
+                time.sleep(self.sleep_seconds)
@@ -0,0 +1,220 @@
+"""
+Sensor Readings Rollups
+
+SensorReadingsHourly and SensorReadingsDaily hold per-device count, sum, min,
+max and last value of every metric for each UTC hour and day. Dashboards read
+time-window statistics from them instead of aggregating every raw reading, so
+their cost depends on the number of devices and buckets, not on how many
+readings the window holds.
+
+SensorReadingsRollupService.run() is incremental: it aggregates readings stored
+(created_at) since the last run and merges them into the existing buckets with
+INSERT ... ON CONFLICT DO UPDATE, so late readings land in the right bucket.
+The high-water mark is kept in JobWatermark and advanced in the same
+transaction as the merge. It trails the clock by SENSOR_ROLLUP_LAG_SECONDS so
+that ingest transactions still in flight when a run starts are not skipped.
+
+Readings stored after the watermark are not in the rollups yet; window_stats()
+adds them from the raw table (the "tail").
+"""
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Sum, Min, Max
+from django.utils import timezone
+from datetime import timedelta
+import logging
+import time
+
+from ..models import SensorReadings, SensorReadingsHourly, SensorReadingsDaily, JobWatermark
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_METRICS = ['temperature', 'humidity', 'weight', 'sound_level', 'battery_level']
+ROLLUP_JOB = 'sensor_readings_rollup'
+
+
+def floor_hour(value):
+    """Return the start of the hour containing value."""
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+class SensorReadingsRollupService:
+    """Maintain and query the hourly and daily sensor reading rollups."""
+
+    ROLLUPS = [
+        (SensorReadingsHourly, 'hour'),
+        (SensorReadingsDaily, 'day'),
+    ]
+
+    def __init__(self, lag_seconds=None, chunk_hours=None):
+        self.lag = timedelta(seconds=(
+            settings.SENSOR_ROLLUP_LAG_SECONDS if lag_seconds is None else lag_seconds
+        ))
+        self.chunk = timedelta(hours=(
+            settings.SENSOR_ROLLUP_CHUNK_HOURS if chunk_hours is None else chunk_hours
+        ))
+
+    def watermark(self):
+        """Return the created_at up to which readings are rolled up, or None."""
+        return JobWatermark.objects.filter(name=ROLLUP_JOB).values_list('watermark', flat=True).first()
+
+    def run(self, now=None):
+        """Roll up readings stored since the last run; return the totals."""
+        started = time.monotonic()
+        target = (now or timezone.now()) - self.lag
+        totals = {'chunks': 0, 'readings': 0}
+
+        while True:
+            with transaction.atomic():
+                # Row lock serialises concurrent runs, which would otherwise merge the same rows twice
+                job, _ = JobWatermark.objects.get_or_create(name=ROLLUP_JOB)
+                job = JobWatermark.objects.select_for_update().get(pk=job.pk)
+
+                start = job.watermark
+                if start is None:
+                    first = SensorReadings.objects.order_by('created_at').values_list('created_at', flat=True).first()
+                    if first is None:
+                        break
+                    start = first - timedelta(microseconds=1)
+                if start >= target:
+                    break
+
+                end = min(start + self.chunk, target)
+                totals['readings'] += self._merge(start, end)
+                totals['chunks'] += 1
+
+                job.watermark = end
+                job.save(update_fields=['watermark', 'updated_at'])
+
+            if end >= target:
+                break
+
+        totals['duration_ms'] = round((time.monotonic() - started) * 1000, 1)
+        if totals['readings']:
+            logger.info(f"Rolled up {totals['readings']} sensor readings in {totals['chunks']} chunks ({totals['duration_ms']}ms)")
+        return totals
+
+    def rebuild(self):
+        """Drop every rollup row and roll up all stored readings again."""
+        with transaction.atomic():
+            for model, _ in self.ROLLUPS:
+                model.objects.all().delete()
+            JobWatermark.objects.filter(name=ROLLUP_JOB).delete()
+        return self.run()
+
+    def _merge(self, start, end):
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            for model, unit in self.ROLLUPS:
+                cursor.execute(self._merge_sql(model), [unit, start, end])
+            cursor.execute(
+                f"SELECT COUNT(*) FROM {quote(SensorReadings._meta.db_table)} "
+                f"WHERE created_at > %s AND created_at <= %s",
+                [start, end]
+            )
+            return cursor.fetchone()[0]
+
+    def _merge_sql(self, model):
+        quote = connection.ops.quote_name
+        table = quote(model._meta.db_table)
+        source = quote(SensorReadings._meta.db_table)
+
+        columns = ['device_id', 'bucket', 'reading_count', 'last_timestamp', 'updated_at']
+        selects = [
+            'device_id',
+            "date_trunc(%s, timestamp, 'UTC')",
+            'COUNT(*)',
+            'MAX(timestamp)',
+            'now()',
+        ]
+        updates = [
+            f'reading_count = {table}.reading_count + EXCLUDED.reading_count',
+            f'last_timestamp = GREATEST({table}.last_timestamp, EXCLUDED.last_timestamp)',
+            'updated_at = EXCLUDED.updated_at',
+        ]
+        newer = f'EXCLUDED.last_timestamp >= {table}.last_timestamp'
+
+        for metric in ROLLUP_METRICS:
+            column = quote(metric)
+            columns += [f'{metric}_count', f'{metric}_sum', f'{metric}_min', f'{metric}_max', f'{metric}_last']
+            selects += [
+                f'COUNT({column})',
+                f'COALESCE(SUM({column}), 0)',
+                f'MIN({column})',
+                f'MAX({column})',
+                f'(array_agg({column} ORDER BY timestamp DESC))[1]',
+            ]
+            # LEAST and GREATEST ignore NULLs, so empty sides keep the other side's value
+            updates += [
+                f'{metric}_count = {table}.{metric}_count + EXCLUDED.{metric}_count',
+                f'{metric}_sum = {table}.{metric}_sum + EXCLUDED.{metric}_sum',
+                f'{metric}_min = LEAST({table}.{metric}_min, EXCLUDED.{metric}_min)',
+                f'{metric}_max = GREATEST({table}.{metric}_max, EXCLUDED.{metric}_max)',
+                f'{metric}_last = CASE WHEN {newer} THEN EXCLUDED.{metric}_last ELSE {table}.{metric}_last END',
+            ]
+
+        return (
+            f"INSERT INTO {table} ({', '.join(columns)}) "
+            f"SELECT {', '.join(selects)} FROM {source} "
+            f"WHERE created_at > %s AND created_at <= %s "
+            f"GROUP BY 1, 2 "
+            f"ON CONFLICT (device_id, bucket) DO UPDATE SET {', '.join(updates)}"
+        )
+
+    def window_stats(self, devices, since):
+        """Aggregate the readings of these devices taken since the start of the hour containing since.
+
+        Returns reading_count plus count, sum, min, max and avg per metric,
+        combining hourly rollups with the not yet rolled up raw tail.
+        """
+        since = floor_hour(since)
+        watermark = self.watermark()
+
+        stats = {'reading_count': 0}
+        for metric in ROLLUP_METRICS:
+            stats[metric] = {'count': 0, 'sum': 0, 'min': None, 'max': None}
+
+        if watermark is not None:
+            rollup_aggregates = {'reading_count': Sum('reading_count')}
+            for metric in ROLLUP_METRICS:
+                rollup_aggregates.update({
+                    f'{metric}_count': Sum(f'{metric}_count'),
+                    f'{metric}_sum': Sum(f'{metric}_sum'),
+                    f'{metric}_min': Min(f'{metric}_min'),
+                    f'{metric}_max': Max(f'{metric}_max'),
+                })
+            self._combine(stats, SensorReadingsHourly.objects.filter(
+                device__in=devices,
+                bucket__gte=since
+            ).aggregate(**rollup_aggregates))
+
+        tail = SensorReadings.objects.filter(device__in=devices, timestamp__gte=since)
+        if watermark is not None:
+            tail = tail.filter(created_at__gt=watermark)
+        tail_aggregates = {'reading_count': Count('id')}
+        for metric in ROLLUP_METRICS:
+            tail_aggregates.update({
+                f'{metric}_count': Count(metric),
+                f'{metric}_sum': Sum(metric),
+                f'{metric}_min': Min(metric),
+                f'{metric}_max': Max(metric),
+            })
+        self._combine(stats, tail.aggregate(**tail_aggregates))
+
+        for metric in ROLLUP_METRICS:
+            values = stats[metric]
+            values['avg'] = values['sum'] / values['count'] if values['count'] else None
+        return stats
+
+    def _combine(self, stats, aggregate):
+        stats['reading_count'] += aggregate['reading_count'] or 0
+        for metric in ROLLUP_METRICS:
+            values = stats[metric]
+            values['count'] += aggregate[f'{metric}_count'] or 0
+            values['sum'] += float(aggregate[f'{metric}_sum'] or 0)
+            for name, pick in [('min', min), ('max', max)]:
+                value = aggregate[f'{metric}_{name}']
+                if value is not None:
+                    value = float(value)
+                    values[name] = value if values[name] is None else pick(values[name], value)
@@ -1,6 +1,10 @@
 from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
-from .models import SmartDevices
+from django.conf import settings
+from pathlib import Path
+from .models import SmartDevices, SensorReadingsArchive
+from .services.device_cache import device_serial_cache
+from .services.latest_reading import LatestReadingSnapshotService
 from apiaries.models import Hives
 
 
@@ -43,6 +47,8 @@ def handle_hive_change_before_save(sender, instance, **kwargs):
             
             # Store the old hive in the instance for use in post_save
             instance._old_hive = old_hive
+            instance._old_serial_number = old_instance.serial_number
+            instance._old_is_active = old_instance.is_active
             
             # If hive is being changed and there was an old hive
             if old_hive != new_hive and old_hive:
@@ -94,6 +100,54 @@ def update_hive_smart_device_status_on_delete(sender, instance, **kwargs):
             instance.hive.save(update_fields=['has_smart_device'])
 
 
+@receiver(post_save, sender=SmartDevices)
+@receiver(post_delete, sender=SmartDevices)
+def invalidate_device_serial_cache(sender, instance, **kwargs):
+    """
+    Drop the device from the ingest serial cache so the next reading
+    picks up its new hive assignment or active flag.
+    """
+    serial_numbers = {instance.serial_number}
+    old_serial_number = getattr(instance, '_old_serial_number', None)
+    if old_serial_number:
+        serial_numbers.add(old_serial_number)
+    device_serial_cache.invalidate(*serial_numbers)
+
+
+@receiver(post_save, sender=SmartDevices)
+def refresh_hive_latest_reading_on_save(sender, instance, created, **kwargs):
+    """
+    Recompute the latest-reading snapshot of the hives a device left or
+    joined, or whose readings it stopped or started counting towards.
+    """
+    if created:
+        return
+    
+    old_hive = getattr(instance, '_old_hive', None)
+    old_hive_id = old_hive.pk if old_hive else None
+    old_is_active = getattr(instance, '_old_is_active', instance.is_active)
+    
+    if old_hive_id != instance.hive_id or old_is_active != instance.is_active:
+        LatestReadingSnapshotService().refresh({old_hive_id, instance.hive_id})
+
+
+@receiver(post_delete, sender=SmartDevices)
+def refresh_hive_latest_reading_on_delete(sender, instance, **kwargs):
+    """
+    Recompute the snapshot of the deleted device's hive from its other devices.
+    """
+    if instance.hive_id:
+        LatestReadingSnapshotService().refresh({instance.hive_id})
+
+
+@receiver(post_delete, sender=SensorReadingsArchive)
+def delete_sensor_archive_file(sender, instance, **kwargs):
+    """
+    Remove the archive file of a deleted manifest entry (retention or device deletion).
+    """
+    Path(settings.SENSOR_ARCHIVE_DIR, instance.file_path).unlink(missing_ok=True)
+
+
 def update_hive_smart_device_status(hive):
     """
     Utility function to manually update a hive's smart device status.
@@ -0,0 +1,197 @@
+"""
+Celery tasks for the devices app.
+
+This module contains background tasks for the sensor ingest pipeline.
+"""
+
+from celery import shared_task
+from django.conf import settings
+from django.utils import timezone
+import logging
+
+from .services.ingest_buffer import IngestSpool
+from .services.partitions import SensorReadingsPartitionManager
+from .services.rollups import SensorReadingsRollupService
+from .services.reading_counters import DeviceReadingCounterService
+from .services.retention import DataRetentionService
+from .services.archive import SensorReadingsArchiver
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def flush_ingest_buffer_task():
+    """
+    Periodic task to drain the write-behind ingest spool.
+    
+    Runs every SENSOR_INGEST_FLUSH_MAX_LATENCY seconds and inserts queued
+    readings into SensorReadings in SENSOR_INGEST_FLUSH_MAX_BATCH sized batches.
+    """
+    try:
+        totals = IngestSpool().flush()
+        
+        if totals['rows_flushed']:
+            logger.info(
+                f"Flushed {totals['rows_flushed']} buffered readings in "
+                f"{totals['batches']} batches ({totals['duration_ms']}ms)"
+            )
+        
+        return {
+            'status': 'success',
+            **totals,
+            'timestamp': timezone.now().isoformat()
+        }
+        
+    except Exception as e:
+        logger.error(f"Error flushing ingest buffer: {str(e)}")
+        return {
+            'status': 'error',
+            'error': str(e),
+            'timestamp': timezone.now().isoformat()
+        }
+
+
+
+@shared_task
+def maintain_sensor_partitions_task():
+    """
+    Daily task to keep monthly SensorReadings partitions in shape.
+    
+    Creates partitions SENSOR_READINGS_PARTITION_MONTHS_AHEAD months ahead and
+    drops partitions older than SENSOR_READINGS_RETENTION_MONTHS.
+    """
+    try:
+        result = SensorReadingsPartitionManager().maintain()
+        
+        if result['created'] or result['dropped']:
+            logger.info(
+                f"Sensor partitions: created {len(result['created'])}, "
+                f"dropped {len(result['dropped'])}"
+            )
+        
+        return {
+            'status': 'success',
+            **result,
+            'timestamp': timezone.now().isoformat()
+        }
+        
+    except Exception as e:
+        logger.error(f"Error maintaining sensor partitions: {str(e)}")
+        return {
+            'status': 'error',
+            'error': str(e),
+            'timestamp': timezone.now().isoformat()
+        }
+
+
+
+@shared_task
+def refresh_sensor_rollups_task():
+    """
+    Periodic task to merge newly stored readings into the hourly and daily rollups.
+    
+    Picks up from the rollup watermark, so a missed or failed run is caught up
+    by the next one.
+    """
+    try:
+        totals = SensorReadingsRollupService().run()
+        
+        return {
+            'status': 'success',
+            **totals,
+            'timestamp': timezone.now().isoformat()
+        }
+        
+    except Exception as e:
+        logger.error(f"Error refreshing sensor rollups: {str(e)}")
+        return {
+            'status': 'error',
+            'error': str(e),
+            'timestamp': timezone.now().isoformat()
+        }
+
+
+
+@shared_task
+def prune_reading_counters_task():
+    """
+    Daily task to delete hourly reading counts older than READING_COUNTER_HOURLY_DAYS.
+    """
+    try:
+        deleted = DeviceReadingCounterService().prune()
+        
+        return {
+            'status': 'success',
+            'hourly_counts_deleted': deleted,
+            'timestamp': timezone.now().isoformat()
+        }
+        
+    except Exception as e:
+        logger.error(f"Error pruning reading counters: {str(e)}")
+        return {
+            'status': 'error',
+            'error': str(e),
+            'timestamp': timezone.now().isoformat()
+        }
+
+
+
+@shared_task
+def enforce_data_retention_task():
+    """
+    Daily task to delete user data older than each user's data_retention_days.
+    
+    Resumes an interrupted run after the last user it finished.
+    """
+    try:
+        report = DataRetentionService().run()
+        
+        return {
+            'status': 'success',
+            'users_processed': len(report),
+            'sensor_readings_deleted': sum(item['sensor_readings'] for item in report),
+            'audio_recordings_deleted': sum(item['audio_recordings'] for item in report),
+            'device_images_deleted': sum(item['device_images'] for item in report),
+            'timestamp': timezone.now().isoformat()
+        }
+        
+    except Exception as e:
+        logger.error(f"Error enforcing data retention: {str(e)}")
+        return {
+            'status': 'error',
+            'error': str(e),
+            'timestamp': timezone.now().isoformat()
+        }
+
+
+
+@shared_task
+def archive_sensor_readings_task():
+    """
+    Daily task to move device-months older than SENSOR_ARCHIVE_AFTER_DAYS into the cold archive.
+    
+    Does nothing while SENSOR_ARCHIVE_AFTER_DAYS is 0.
+    """
+    if not settings.SENSOR_ARCHIVE_AFTER_DAYS:
+        return {
+            'status': 'skipped',
+            'reason': 'SENSOR_ARCHIVE_AFTER_DAYS is not set',
+            'timestamp': timezone.now().isoformat()
+        }
+    
+    try:
+        totals = SensorReadingsArchiver().archive()
+        
+        return {
+            'status': 'success',
+            **totals,
+            'timestamp': timezone.now().isoformat()
+        }
+        
+    except Exception as e:
+        logger.error(f"Error archiving sensor readings: {str(e)}")
+        return {
+            'status': 'error',
+            'error': str(e),
+            'timestamp': timezone.now().isoformat()
+        }
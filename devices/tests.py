@@ -1,3 +1,695 @@
-from django.test import TestCase
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
+from urllib.parse import parse_qsl, urlparse
+import csv
+import json
+import os
+import tempfile
+from rest_framework.exceptions import ParseError
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from settings.models import DataSyncSettings
+from smart_nyuki_backend.testing import make_device, make_reading, reading_payload
+from .models import (
+    SmartDevices, SensorReadings, HiveLatestReading, DeviceReadingCounter, SensorReadingsArchive, JobWatermark,
+    SensorReadingsHourly, SensorReadingsDaily
+)
+from .parsers import NDJSONParser, BinaryReadingsParser
+from .services import binary_format
+from .services.archive import SensorReadingsArchiver, SensorReadingsArchiveReader
+from .services.device_cache import device_serial_cache, resolve_active_devices
+from .services.heartbeat import DeviceHeartbeatCoalescer
+from .services.ingest import SensorReadingsIngestService
+from .services.ingest_buffer import CLAIMED_SUFFIX, IngestSpool
+from .services.partitions import SensorReadingsPartitionManager
+from .services.reading_counters import DeviceReadingCounterService
+from .services.retention import RETENTION_JOB, DataRetentionService
+from .services.rollups import ROLLUP_JOB, SensorReadingsRollupService, floor_hour
+
+
+class BatchIngestIdempotencyTests(TestCase):
+    def setUp(self):
+        device_serial_cache.clear()
+        self.device = make_device()
+        self.service = SensorReadingsIngestService(write_behind=False)
+        self.batch = [reading_payload(self.device.serial_number, minutes, minutes) for minutes in range(1, 6)]
+
+    def test_first_batch_stores_every_reading(self):
+        result = self.service.ingest(self.batch)
+
+        self.assertEqual(result.created_count, 5)
+        self.assertEqual(result.duplicate_count, 0)
+        self.assertEqual(SensorReadings.objects.filter(device=self.device).count(), 5)
+        self.assertEqual(
+            {str(reading.id) for reading in result.readings},
+            {str(reading_id) for reading_id in SensorReadings.objects.values_list('id', flat=True)}
+        )
+
+    def test_replayed_readings_insert_nothing(self):
+        first = self.service.ingest(self.batch)
+        # Same rows with the same client side ids, as the write-behind flusher replays them
+        replayed = self.service.write([
+            SensorReadings(**{field.attname: getattr(reading, field.attname) for field in SensorReadings._meta.concrete_fields})
+            for reading in first.readings
+        ])
+
+        self.assertEqual(replayed, [])
+        self.assertEqual(SensorReadings.objects.filter(device=self.device).count(), 5)
+
+    def test_retried_sequence_numbers_are_reported_as_duplicates(self):
+        self.service.ingest(self.batch)
+        # A gateway retry gets new ids and, without a device clock, new timestamps
+        retry = [
+            dict(item, timestamp=(timezone.now() - timedelta(seconds=i + 1)).isoformat())
+            for i, item in enumerate(self.batch[:3])
+        ]
+
+        result = self.service.ingest(retry)
+
+        self.assertEqual(result.created_count, 0)
+        self.assertEqual(result.duplicate_count, 3)
+        self.assertEqual([item['status'] for item in result.items], ['duplicate'] * 3)
+        self.assertEqual(SensorReadings.objects.filter(device=self.device).count(), 5)
+
+    def test_read_back_returns_the_stored_rows(self):
+        self.service.ingest(self.batch)
+        retry = self.service.ingest(self.batch[:1])
+
+        stored = self.service.find_stored(retry.duplicates[0])
+
+        self.assertIsNotNone(stored)
+        self.assertEqual(stored.device_id, self.device.id)
+        self.assertEqual(stored.sequence_number, self.batch[0]['sequence_number'])
+        self.assertNotEqual(stored.id, retry.duplicates[0].id)
+
+    def test_batch_with_invalid_items_keeps_the_valid_ones(self):
+        batch = self.batch[:2] + [dict(self.batch[2], device_serial='UNKNOWN'), dict(self.batch[3], battery_level=150)]
+
+        result = self.service.ingest(batch)
+
+        self.assertEqual([item['status'] for item in result.items], ['created', 'created', 'invalid', 'invalid'])
+        self.assertIn('device_serial', result.items[2]['errors'])
+        self.assertIn('battery_level', result.items[3]['errors'])
+
+    def test_endpoint_answers_a_replayed_batch_with_200(self):
+        client = APIClient()
+        url = reverse('devices:sensor-reading-create-unauthenticated')
+
+        first = client.post(url, self.batch, format='json')
+        replay = client.post(url, self.batch, format='json')
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(replay.status_code, 200)
+        self.assertEqual(replay.data['created'], 0)
+        self.assertEqual(replay.data['duplicates'], 5)
+        self.assertEqual(SensorReadings.objects.filter(device=self.device).count(), 5)
+
+
+class AuthenticatedCreateTests(TestCase):
+    def setUp(self):
+        device_serial_cache.clear()
+        self.device = make_device()
+        self.client = APIClient()
+        self.client.force_authenticate(self.device.beekeeper.user)
+        self.url = reverse('devices:sensor-reading-list-create')
+
+    def test_created_reading_updates_the_hive_snapshot_and_counter(self):
+        response = self.client.post(self.url, reading_payload(self.device.serial_number, 1, 1), format='json')
+
+        self.assertEqual(response.status_code, 201)
+        reading = SensorReadings.objects.get(device=self.device)
+        snapshot = HiveLatestReading.objects.get(hive=self.device.hive)
+        self.assertEqual(snapshot.reading_id, reading.id)
+        self.assertEqual(DeviceReadingCounter.objects.get(device=self.device).total_readings, 1)
+
+    def test_duplicate_reading_is_rejected(self):
+        payload = reading_payload(self.device.serial_number, 1, 1)
+        self.client.post(self.url, payload, format='json')
+
+        response = self.client.post(self.url, payload, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(SensorReadings.objects.filter(device=self.device).count(), 1)
+        self.assertEqual(DeviceReadingCounter.objects.get(device=self.device).total_readings, 1)
+
+
+class DeviceSerialCacheTests(TestCase):
+    def setUp(self):
+        device_serial_cache.clear()
+
+    def test_unknown_serial_is_cached_until_the_device_is_registered(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(resolve_active_devices(['NODE-UNKNOWN']), {})
+        with self.assertNumQueries(0):
+            self.assertEqual(resolve_active_devices(['NODE-UNKNOWN']), {})
+
+        device = make_device('NODE-UNKNOWN')
+
+        self.assertEqual(resolve_active_devices(['NODE-UNKNOWN'])['NODE-UNKNOWN'].id, device.id)
+
+    def test_inactive_device_is_cached_and_picked_up_when_activated(self):
+        device = make_device('NODE-INACTIVE')
+        SmartDevices.objects.filter(pk=device.pk).update(is_active=False)
+        device_serial_cache.clear()
+
+        self.assertEqual(resolve_active_devices(['NODE-INACTIVE']), {})
+        with self.assertNumQueries(0):
+            self.assertEqual(resolve_active_devices(['NODE-INACTIVE']), {})
+
+        device.refresh_from_db()
+        device.is_active = True
+        device.save()
+
+        self.assertIn('NODE-INACTIVE', resolve_active_devices(['NODE-INACTIVE']))
+
+
+class NDJSONParserTests(SimpleTestCase):
+    def parse(self, body):
+        return NDJSONParser().parse(BytesIO(body), parser_context={'encoding': 'utf-8'})
+
+    def test_parses_one_object_per_line_and_skips_blank_lines(self):
+        items = self.parse(b'{"device_serial": "A"}\n\n{"device_serial": "B"}\n')
+
+        self.assertEqual(items, [{'device_serial': 'A'}, {'device_serial': 'B'}])
+
+    def test_invalid_line_reports_its_line_number(self):
+        with self.assertRaisesMessage(ParseError, 'line 3'):
+            self.parse(b'{"device_serial": "A"}\n\n{"device_serial": \n')
+
+    def test_invalid_encoding_is_a_parse_error(self):
+        with self.assertRaises(ParseError):
+            self.parse(b'{"device_serial": "\xff"}\n')
+
+
+class BinaryReadingsParserTests(SimpleTestCase):
+    reading = {'temperature': '35.10', 'humidity': '55.00', 'weight': '42.50', 'battery_level': 90, 'sequence_number': 7}
+
+    def parse(self, body):
+        return BinaryReadingsParser().parse(BytesIO(body))
+
+    def test_decodes_frames(self):
+        batch = self.parse(binary_format.encode_frame('NODE-001', [self.reading, self.reading]))
+
+        self.assertEqual(len(batch), 2)
+        self.assertEqual(batch.frames[0][0], 'NODE-001')
+
+    def assertParseError(self, body, message):
+        with self.assertRaisesMessage(ParseError, message):
+            self.parse(body)
+
+    def test_truncated_header(self):
+        self.assertParseError(b'NY\x01', 'Truncated frame header')
+
+    def test_bad_magic(self):
+        frame = binary_format.encode_frame('NODE-001', [self.reading])
+        self.assertParseError(b'XX' + frame[2:], 'Bad frame magic')
+
+    def test_unsupported_version(self):
+        frame = binary_format.encode_frame('NODE-001', [self.reading])
+        self.assertParseError(frame[:2] + b'\x02' + frame[3:], 'Unsupported frame version')
+
+    def test_reserved_flags(self):
+        frame = binary_format.encode_frame('NODE-001', [self.reading])
+        self.assertParseError(frame[:3] + b'\x03' + frame[4:], 'Unsupported frame flags')
+
+    def test_serial_is_not_utf8(self):
+        frame = binary_format.encode_frame('NODE', [self.reading])
+        self.assertParseError(frame[:5] + b'\xff\xfe\xfd\xfc' + frame[9:], 'not valid UTF-8')
+
+    def test_truncated_records(self):
+        frame = binary_format.encode_frame('NODE-001', [self.reading, self.reading])
+        self.assertParseError(frame[:-1], 'declares 2 records but is truncated')
+
+    def test_out_of_range_record_values(self):
+        batch = self.parse(binary_format.encode_frame('NODE-001', [dict(self.reading, battery_level=150)]))
+
+        fields, errors = binary_format.record_to_fields(batch.frames[0][1][0], timezone.now())
+
+        self.assertIsNone(fields)
+        self.assertIn('battery_level', errors)
+
+
+class DataRetentionTests(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        self.devices = sorted(
+            [make_device('NODE-KEEP-A'), make_device('NODE-KEEP-B')],
+            key=lambda device: str(device.beekeeper.user_id)
+        )
+        for device in self.devices:
+            DataSyncSettings.objects.create(user=device.beekeeper.user, data_retention_days=30)
+            make_reading(device, self.now - timedelta(days=40))
+            make_reading(device, self.now - timedelta(days=1))
+
+    def interrupt_after_first_user(self):
+        JobWatermark.objects.create(name=RETENTION_JOB, payload={
+            'run_started': self.now.isoformat(),
+            'last_user_id': str(self.devices[0].beekeeper.user_id),
+        })
+
+    def test_dry_run_counts_without_deleting(self):
+        report = DataRetentionService(dry_run=True).run(now=self.now)
+
+        self.assertEqual([result['sensor_readings'] for result in report], [1, 1])
+        self.assertEqual(SensorReadings.objects.count(), 4)
+
+    def test_dry_run_reports_every_user_after_an_interrupted_run(self):
+        self.interrupt_after_first_user()
+
+        report = DataRetentionService(dry_run=True).run(now=self.now)
+
+        self.assertEqual(len(report), 2)
+        self.assertEqual(JobWatermark.objects.get(name=RETENTION_JOB).payload['last_user_id'],
+                         str(self.devices[0].beekeeper.user_id))
+
+    def test_interrupted_run_resumes_after_the_last_finished_user(self):
+        self.interrupt_after_first_user()
+
+        report = DataRetentionService(sleep_seconds=0).run(now=self.now)
+
+        self.assertEqual([result['user_id'] for result in report], [str(self.devices[1].beekeeper.user_id)])
+        self.assertEqual(SensorReadings.objects.filter(device=self.devices[0]).count(), 2)
+        self.assertEqual(SensorReadings.objects.filter(device=self.devices[1]).count(), 1)
+        job = JobWatermark.objects.get(name=RETENTION_JOB)
+        self.assertEqual((job.payload, job.watermark), ({}, self.now))
+
+    def test_archived_readings_are_counted_on_a_dry_run_and_expired_on_a_real_run(self):
+        device = self.devices[0]
+        month = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+        for day in (5, 20):
+            make_reading(device, month + timedelta(days=day - 1))
+        # The cutoff falls between the two archived January readings
+        now = month + timedelta(days=9 + 30)
+        with tempfile.TemporaryDirectory() as archive_dir, override_settings(SENSOR_ARCHIVE_DIR=archive_dir):
+            SensorReadingsArchiver().archive(older_than_days=0, device_id=device.id, now=month + timedelta(days=40))
+
+            dry_run = DataRetentionService(dry_run=True).run(now=now, user_id=device.beekeeper.user_id)
+            self.assertEqual(dry_run[0]['archived_readings'], 1)
+            self.assertEqual(SensorReadingsArchive.objects.get(device=device).row_count, 2)
+
+            report = DataRetentionService(sleep_seconds=0).run(now=now, user_id=device.beekeeper.user_id)
+            self.assertEqual(report[0]['archived_readings'], 1)
+            self.assertEqual(SensorReadingsArchive.objects.get(device=device).row_count, 1)
+
+
+class ArchivedReadingsTests(TestCase):
+    """Archived months round-trip through the Arrow files and merge with the hot rows by timestamp."""
+
+    def setUp(self):
+        self.archive_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.archive_dir.cleanup)
+        self.device = make_device('NODE-ARCHIVE')
+        self.client = APIClient()
+        self.client.force_authenticate(self.device.beekeeper.user)
+
+        january = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+        for hours in range(0, 20 * 24, 12):
+            make_reading(self.device, january + timedelta(hours=hours), weight=Decimal('40.00') + Decimal(hours) / 100)
+        self.archived_values = sorted(
+            SensorReadings.objects.values_list('id', 'timestamp', 'weight', 'battery_level'), key=lambda row: row[1]
+        )
+        with override_settings(SENSOR_ARCHIVE_DIR=self.archive_dir.name):
+            SensorReadingsArchiver().archive(older_than_days=0, now=datetime(2025, 3, 1, tzinfo=dt_timezone.utc))
+
+        # A late reading of the archived month and two recent ones stay in the hot table
+        self.late = make_reading(self.device, january + timedelta(days=4, hours=18))
+        for days in (2, 1):
+            make_reading(self.device, timezone.now() - timedelta(days=days))
+
+    def expected(self, descending):
+        rows = [(row[0], row[1]) for row in self.archived_values]
+        rows += SensorReadings.objects.values_list('id', 'timestamp')
+        rows.sort(key=lambda row: (row[1], str(row[0])), reverse=descending)
+        return [str(row[0]) for row in rows]
+
+    def get(self, **params):
+        params.setdefault('timestamp_after', '2024-12-01T00:00:00Z')
+        with override_settings(SENSOR_ARCHIVE_DIR=self.archive_dir.name):
+            response = self.client.get(reverse('devices:sensor-reading-list-create'), params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.data
+
+    def test_archive_round_trip(self):
+        self.assertFalse(SensorReadings.objects.filter(timestamp__lt=datetime(2025, 2, 1, tzinfo=dt_timezone.utc))
+                         .exclude(pk=self.late.pk).exists())
+        manifest = SensorReadingsArchive.objects.get(device=self.device)
+        self.assertEqual(manifest.row_count, len(self.archived_values))
+
+        reader = SensorReadingsArchiveReader(archive_dir=self.archive_dir.name)
+        read_back = [
+            (reading.id, reading.timestamp, reading.weight, reading.battery_level)
+            for reading in reader.iter_read(SmartDevices.objects.filter(pk=self.device.pk))
+        ]
+        self.assertEqual(read_back, self.archived_values)
+
+    def test_page_mode_merges_late_hot_rows_by_timestamp(self):
+        for ordering in ('-timestamp', 'timestamp'):
+            ids, page = [], 1
+            while True:
+                data = self.get(ordering=ordering, page=page)
+                ids += [reading['id'] for reading in data['results']]
+                if not data['next']:
+                    break
+                page += 1
+            self.assertEqual(data['count'], len(self.archived_values) + 3)
+            self.assertEqual(ids, self.expected(descending=ordering == '-timestamp'))
+
+    def test_cursor_pages_read_only_rows_past_the_cursor(self):
+        read_first = SensorReadingsArchiveReader.read_first
+        limits = []
+
+        def spy(reader, *args, **kwargs):
+            limits.append(kwargs['limit'])
+            return read_first(reader, *args, **kwargs)
+
+        ids, data = [], self.get(pagination='cursor', page_size=5)
+        with mock.patch.object(SensorReadingsArchiveReader, 'read_first', spy):
+            while True:
+                ids += [reading['id'] for reading in data['results']]
+                if not data['next']:
+                    break
+                data = self.get(cursor=dict(parse_qsl(urlparse(data['next']).query))['cursor'], page_size=5)
+
+        self.assertEqual(ids, self.expected(descending=True))
+        self.assertEqual(set(limits), {6})
+
+
+class KeysetPaginationPageSizeTests(TestCase):
+    """?page_size sizes keyset pages only; page number mode keeps PAGE_SIZE."""
+
+    def setUp(self):
+        self.device = make_device('NODE-PAGES')
+        self.client = APIClient()
+        self.client.force_authenticate(self.device.beekeeper.user)
+        for minutes in range(30):
+            make_reading(self.device, timezone.now() - timedelta(minutes=minutes))
+
+    def get(self, **params):
+        response = self.client.get(reverse('devices:sensor-reading-list-create'), params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.data
+
+    def test_page_mode_ignores_page_size(self):
+        self.assertEqual(len(self.get(page_size=5)['results']), 20)
+
+    def test_cursor_mode_honours_page_size(self):
+        self.assertEqual(len(self.get(pagination='cursor', page_size=5)['results']), 5)
+        self.assertEqual(len(self.get(pagination='cursor')['results']), 20)
+        with mock.patch('smart_nyuki_backend.pagination.KeysetPagination.max_page_size', 7):
+            self.assertEqual(len(self.get(pagination='cursor', page_size=500)['results']), 7)
+
+
+class SensorReadingsRollupTests(TestCase):
+    """Rollups trail the clock by the lag, merge late readings and never count a reading twice."""
+
+    def setUp(self):
+        self.device = make_device('NODE-ROLLUP')
+        self.devices = SmartDevices.objects.filter(pk=self.device.pk)
+        self.hour = floor_hour(timezone.now()) - timedelta(hours=3)
+        for minutes, weight in [(10, '40.00'), (20, '42.00'), (70, '41.00')]:
+            make_reading(self.device, self.hour + timedelta(minutes=minutes), weight=Decimal(weight))
+        self.service = SensorReadingsRollupService(lag_seconds=60)
+
+    def catch_up(self):
+        """Run as if the lag had passed since every reading was stored."""
+        now = timezone.now() + timedelta(seconds=61)
+        return now - self.service.lag, self.service.run(now=now)
+
+    def test_readings_inside_the_lag_wait_for_the_next_run(self):
+        self.assertEqual(self.service.run()['readings'], 0)
+        self.assertFalse(SensorReadingsHourly.objects.exists())
+        self.assertIsNone(self.service.watermark())
+
+        watermark, totals = self.catch_up()
+
+        self.assertEqual(totals['readings'], 3)
+        self.assertEqual(self.service.watermark(), watermark)
+        self.assertEqual(JobWatermark.objects.get(name=ROLLUP_JOB).watermark, watermark)
+        self.assertEqual(
+            list(SensorReadingsHourly.objects.order_by('bucket').values_list('bucket', 'reading_count', 'weight_max')),
+            [(self.hour, 2, Decimal('42.00')), (self.hour + timedelta(hours=1), 1, Decimal('41.00'))]
+        )
+        self.assertEqual(sum(SensorReadingsDaily.objects.values_list('reading_count', flat=True)), 3)
+        self.assertEqual(self.service.run(now=timezone.now() + timedelta(seconds=61))['readings'], 0)
+
+    def test_window_stats_add_the_tail_once(self):
+        before = self.service.window_stats(self.devices, self.hour)
+        watermark, _ = self.catch_up()
+        self.assertEqual(self.service.window_stats(self.devices, self.hour), before)
+        self.assertEqual(before['reading_count'], 3)
+        self.assertEqual((before['weight']['min'], before['weight']['max'], before['weight']['avg']), (40.0, 42.0, 41.0))
+
+        # A late reading of the first hour is in the tail until the next run merges it
+        late = make_reading(self.device, self.hour + timedelta(minutes=30), weight=Decimal('45.00'))
+        SensorReadings.objects.filter(pk=late.pk).update(created_at=watermark + timedelta(microseconds=1))
+        with_tail = self.service.window_stats(self.devices, self.hour)
+        self.assertEqual((with_tail['reading_count'], with_tail['weight']['max']), (4, 45.0))
+
+        self.catch_up()
+        self.assertEqual(self.service.window_stats(self.devices, self.hour), with_tail)
+        bucket = SensorReadingsHourly.objects.get(bucket=self.hour)
+        self.assertEqual((bucket.reading_count, bucket.weight_last), (3, Decimal('45.00')))
+
+
+@override_settings(SENSOR_EXPORT_CHUNK_SIZE=2)
+class SensorReadingsExportTests(TestCase):
+    """Exports stream archived then hot readings of the user's own devices, a chunk of lines at a time."""
+
+    def setUp(self):
+        self.archive_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.archive_dir.cleanup)
+        self.device = make_device('NODE-EXPORT')
+        make_device('NODE-OTHER')
+        self.client = APIClient()
+        self.client.force_authenticate(self.device.beekeeper.user)
+
+        january = datetime(2025, 1, 10, tzinfo=dt_timezone.utc)
+        self.archived = [make_reading(self.device, january + timedelta(hours=hours)) for hours in range(3)]
+        with override_settings(SENSOR_ARCHIVE_DIR=self.archive_dir.name):
+            SensorReadingsArchiver().archive(older_than_days=0, now=datetime(2025, 3, 1, tzinfo=dt_timezone.utc))
+        self.hot = [make_reading(self.device, timezone.now() - timedelta(hours=hours)) for hours in (2, 1)]
+        make_reading(SmartDevices.objects.get(serial_number='NODE-OTHER'), timezone.now())
+
+    def export(self, **params):
+        with override_settings(SENSOR_ARCHIVE_DIR=self.archive_dir.name):
+            response = self.client.get(reverse('devices:sensor-reading-export'), params)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.streaming)
+            chunks = [chunk.decode() for chunk in response.streaming_content]
+        return response, chunks
+
+    def test_csv_streams_archived_then_hot_rows(self):
+        response, chunks = self.export()
+
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(len(chunks), 3)
+        rows = list(csv.reader(StringIO(''.join(chunks))))
+        self.assertEqual(rows[0][:2], ['id', 'device_serial'])
+        self.assertEqual([row[0] for row in rows[1:]], [str(reading.id) for reading in self.archived + self.hot])
+        self.assertEqual({row[1] for row in rows[1:]}, {'NODE-EXPORT'})
+
+    def test_ndjson_honours_the_time_filter(self):
+        response, chunks = self.export(output='ndjson', timestamp_after='2025-01-10T01:00:00Z',
+                                       timestamp_before='2025-02-01T00:00:00Z')
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = [json.loads(line) for line in ''.join(chunks).splitlines()]
+        self.assertEqual([line['id'] for line in lines], [str(reading.id) for reading in self.archived[1:]])
+        self.assertEqual(lines[0]['hive_name'], self.device.hive.name)
+
+    def test_unknown_output_is_rejected(self):
+        response = self.client.get(reverse('devices:sensor-reading-export'), {'output': 'xml'})
+        self.assertEqual(response.status_code, 400)
+
+
+class WriteBehindIngestTests(TestCase):
+    """Queued readings are acknowledged without a row and inserted exactly once by the flusher."""
+
+    def setUp(self):
+        device_serial_cache.clear()
+        spool_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(spool_dir.cleanup)
+        self.enterContext(override_settings(SENSOR_INGEST_SPOOL_DIR=spool_dir.name))
+        self.spool = IngestSpool(max_batch_size=4)
+        self.device = make_device('NODE-SPOOL')
+        self.service = SensorReadingsIngestService(write_behind=True)
+        self.batch = [reading_payload(self.device.serial_number, minutes, minutes) for minutes in range(1, 4)]
+
+    def test_queued_readings_are_flushed_once(self):
+        result = self.service.ingest(self.batch)
+
+        self.assertEqual([item['status'] for item in result.items], ['queued'] * 3)
+        self.assertFalse(SensorReadings.objects.exists())
+        segments = self.spool.pending_segments()
+        self.assertEqual([IngestSpool.segment_row_count(path) for path in segments], [3])
+
+        # A replayed segment carries the same ids and must not insert anything twice
+        self.spool.append(self.spool.read_segment(segments[0]))
+        self.service.ingest(self.batch[:2])
+        totals = self.spool.flush()
+
+        self.assertEqual(totals['batches'], 2)
+        self.assertEqual((totals['rows_flushed'], totals['rows_duplicate']), (3, 5))
+        self.assertEqual(SensorReadings.objects.filter(device=self.device).count(), 3)
+        self.assertEqual(
+            {str(reading_id) for reading_id in SensorReadings.objects.values_list('id', flat=True)},
+            {item['id'] for item in result.items}
+        )
+        self.assertEqual(self.spool.pending_segments(), [])
+        self.assertEqual(self.spool.stats()['flush']['total_rows_flushed'], 3)
+
+    def test_stale_claims_and_orphaned_readings(self):
+        self.service.ingest(self.batch)
+        claimed = self.spool.claim_batch()
+        self.assertEqual(self.spool.pending_segments(), [])
+        self.assertTrue(claimed[0].name.endswith(CLAIMED_SUFFIX))
+
+        # A flusher that died leaves its claim behind until it goes stale
+        self.assertEqual(IngestSpool(stale_claim_seconds=3600).release_stale_claims(), 0)
+        os.utime(claimed[0], (0, 0))
+        self.device.delete()
+        totals = self.spool.flush()
+
+        self.assertEqual((totals['rows_flushed'], totals['rows_dropped']), (0, 3))
+        self.assertEqual(list(self.spool.directory.glob('*' + CLAIMED_SUFFIX)), [])
+
+
+@mock.patch.object(DeviceHeartbeatCoalescer, 'start_flusher')
+class DeviceHeartbeatTests(TestCase):
+    """Heartbeats are written in one UPDATE per interval and never move last_sync_at back."""
+
+    def setUp(self):
+        self.device = make_device('NODE-HEARTBEAT')
+        self.heartbeats = DeviceHeartbeatCoalescer(flush_interval=3600)
+        self.now = timezone.now()
+
+    def reading(self, minutes_ago, battery_level):
+        return SensorReadings(device=self.device, timestamp=self.now - timedelta(minutes=minutes_ago),
+                              battery_level=battery_level)
+
+    def refreshed(self):
+        self.device.refresh_from_db()
+        return self.device.last_sync_at, self.device.battery_level
+
+    def test_heartbeats_wait_for_the_flush_interval(self, start_flusher):
+        self.heartbeats.record([self.reading(5, 60)], synced_at=self.now)
+
+        self.assertTrue(start_flusher.called)
+        self.assertIsNone(self.refreshed()[0])
+        with self.assertNumQueries(1):
+            self.assertEqual(self.heartbeats.flush(), 1)
+        self.assertEqual(self.refreshed(), (self.now, 60))
+        self.assertEqual(self.heartbeats.flush(), 0)
+
+    def test_newest_reading_sets_the_battery_and_sync_time_only_moves_forward(self, start_flusher):
+        self.heartbeats.record([self.reading(1, 55), self.reading(9, 70), self.reading(3, None)], synced_at=self.now)
+        self.heartbeats.flush()
+        self.assertEqual(self.refreshed(), (self.now, 55))
+
+        # Another process flushing an older sync time later must not roll it back
+        self.heartbeats.record([self.reading(0, 50)], synced_at=self.now - timedelta(minutes=2))
+        self.heartbeats.flush()
+        self.assertEqual(self.refreshed(), (self.now, 50))
+
+
+class SensorQueryBenchmarkTests(TestCase):
+    """The benchmark seeds its own fleet, reports every hot query and flags regressions against a baseline."""
+
+    def setUp(self):
+        output_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(output_dir.cleanup)
+        self.output = os.path.join(output_dir.name, 'report.json')
+
+    def benchmark(self, *args):
+        call_command(
+            'benchmark_sensor_queries', '--rows', '40', '--devices', '2', '--iterations', '2',
+            '--output', self.output, *args, stdout=StringIO()
+        )
+        with open(self.output) as report:
+            return json.load(report)
+
+    def test_report_and_baseline_comparison(self):
+        report = self.benchmark('--seed')
+
+        self.assertEqual(SensorReadings.objects.filter(device__serial_number__startswith='BENCH-').count(), 40)
+        self.assertIn('sensor_readings_ts_brin', report['indexes'])
+        self.assertEqual(set(report['queries']), {
+            'latest_reading_for_hive', 'latest_reading_for_device', 'device_window_count_7d',
+            'hive_window_24h', 'hive_previous_day_reading', 'all_devices_window_1h'
+        })
+        self.assertEqual(report['queries']['latest_reading_for_device']['rows_returned'], 1)
+
+        for result in report['queries'].values():
+            result['latency_ms']['p50'] = 0.0001
+        baseline = self.output + '.baseline'
+        with open(baseline, 'w') as baseline_file:
+            json.dump(report, baseline_file)
+        with self.assertRaisesMessage(CommandError, 'Query regressions'):
+            self.benchmark('--baseline', baseline, '--tolerance', '0', '--min-delta-ms', '-1')
+
+        call_command('benchmark_sensor_queries', '--cleanup', stdout=StringIO())
+        self.assertFalse(SmartDevices.objects.filter(serial_number__startswith='BENCH-').exists())
+
+
+class SensorReadingsPartitionTests(TestCase):
+    """Monthly partitions take over rows from the default partition and expire with the counters."""
+
+    def setUp(self):
+        self.device = make_device('NODE-PARTITION')
+        self.manager = SensorReadingsPartitionManager(months_ahead=0, retention_months=1)
+        self.month = datetime(2001, 1, 1, tzinfo=dt_timezone.utc)
+
+    def test_new_partition_takes_rows_from_the_default_partition(self):
+        self.assertTrue(self.manager.is_partitioned())
+        reading = make_reading(self.device, self.month + timedelta(days=3))
+        self.assertEqual(self.manager.row_count(self.manager.default_partition), 1)
+
+        name = self.manager.create_partition(self.month)
+
+        self.assertEqual(self.manager.partitions()[self.month], name)
+        self.assertEqual(self.manager.row_count(self.manager.default_partition), 0)
+        self.assertEqual(self.manager.row_count(name), 1)
+        self.assertEqual(SensorReadings.objects.get(timestamp__lt=self.month + timedelta(days=31)).pk, reading.pk)
+
+    def test_expired_partition_is_dropped_and_uncounted(self):
+        name = self.manager.create_partition(self.month)
+        readings = [make_reading(self.device, self.month + timedelta(days=day)) for day in (1, 2)]
+        readings.append(make_reading(self.device, timezone.now()))
+        DeviceReadingCounterService().record(readings)
+        # Fire the deferred foreign key checks of the inserts, as their commit would, before the DROP
+        with connection.cursor() as cursor:
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+        self.assertEqual(self.manager.expired_partitions(now=self.month + timedelta(days=40)), {})
+        expired = self.manager.expired_partitions(now=self.month + timedelta(days=70))
+        self.assertEqual(expired, {self.month: name})
+        self.manager.drop_partition(name)
+
+        self.assertNotIn(self.month, self.manager.partitions())
+        self.assertEqual(list(SensorReadings.objects.values_list('pk', flat=True)), [readings[2].pk])
+        self.assertEqual(DeviceReadingCounter.objects.get(device=self.device).total_readings, 1)
+
+    def test_read_back_is_bounded_to_the_batch_time_range(self):
+        service = SensorReadingsIngestService(write_behind=False)
+        batch = [
+            SensorReadings(device=self.device, timestamp=timestamp, temperature=Decimal('35.00'),
+                           humidity=Decimal('50.00'), weight=Decimal('40.00'))
+            for timestamp in (self.month + timedelta(days=2), self.month + timedelta(days=40))
+        ]
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(service.write(batch), batch)
+
+        read_back = [query['sql'] for query in queries if query['sql'].startswith('SELECT')
+                     and 'devices_sensorreadings' in query['sql'] and '"created_at"' in query['sql']]
+        self.assertEqual(len(read_back), 1)
+        self.assertIn('"timestamp" >=', read_back[0])
+        self.assertIn('"timestamp" <=', read_back[0])
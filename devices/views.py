@@ -2,11 +2,14 @@ from rest_framework import generics, status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 from django.db.models import Q
 from drf_spectacular.utils import extend_schema, OpenApiResponse
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters
 from rest_framework.views import APIView
+from rest_framework.parsers import JSONParser, FormParser, MultiPartParser
 
 from .models import SmartDevices, SensorReadings, AudioRecordings, DeviceImages
 from .serializers import (
@@ -17,7 +20,18 @@ from .serializers import (
     AudioRecordingsSerializer,
     DeviceImagesSerializer
 )
+from .filters import SensorReadingsFilter
+from .parsers import NDJSONParser, BinaryReadingsParser
+from .services.binary_format import BinaryReadingBatch
+from .services.ingest import SensorReadingsIngestService
+from .services.device_cache import device_serial_cache
+from .services.heartbeat import device_heartbeats
+from .services.ingest_buffer import IngestSpool
+from .services.reading_counters import DeviceReadingCounterService
+from .services.archive import SensorReadingsArchiveReader, HotAndArchivedReadings
+from .services.export import SensorReadingsExporter, EXPORT_FORMATS
 from apiaries.models import Hives
+from smart_nyuki_backend.pagination import KeysetPagination
 
 
 class SmartDevicesListCreateView(generics.ListCreateAPIView):
@@ -74,7 +88,7 @@ class SmartDevicesDetailView(generics.RetrieveUpdateDestroyAPIView):
     def get_queryset(self):
         """Return devices for the current user"""
         user = self.request.user
-        return SmartDevices.objects.for_user(user).select_related('beekeeper__user', 'hive__apiary').prefetch_related('sensor_readings')
+        return SmartDevices.objects.for_user(user).select_related('beekeeper__user', 'hive__apiary', 'reading_counter')
     
     @extend_schema(
         summary="Get smart device details",
@@ -108,9 +122,11 @@ class SensorReadingsListCreateView(generics.ListCreateAPIView):
     """List and create sensor readings"""
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
-    filterset_fields = ['device', 'device__serial_number']
+    filterset_class = SensorReadingsFilter
     ordering_fields = ['timestamp', 'created_at', 'temperature', 'humidity', 'weight']
     ordering = ['-timestamp']
+    pagination_class = KeysetPagination
+    keyset_field = 'timestamp'
     
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -124,9 +140,63 @@ class SensorReadingsListCreateView(generics.ListCreateAPIView):
             device__beekeeper__user=user
         ).select_related('device__beekeeper__user', 'device__hive')
     
+    def get_archive_window(self):
+        """Return (devices, start, end) of the requested window when it reaches the archive, else None"""
+        readings_filter = SensorReadingsFilter(self.request.GET, queryset=SensorReadings.objects.none())
+        if not readings_filter.is_valid() or not readings_filter.form.cleaned_data.get('timestamp_after'):
+            return None
+        if self.request.GET.get('ordering', '-timestamp') not in ('timestamp', '-timestamp'):
+            return None
+        
+        devices = readings_filter.filter_devices(
+            SmartDevices.objects.filter(beekeeper__user=self.request.user)
+        )
+        start = readings_filter.form.cleaned_data['timestamp_after']
+        end = readings_filter.form.cleaned_data.get('timestamp_before')
+        if not SensorReadingsArchiveReader().has_archived(devices, start, end):
+            return None
+        return devices, start, end
+    
+    def list(self, request, *args, **kwargs):
+        # Windows reaching into archived months are served from the hot table and the archive files
+        window = self.get_archive_window()
+        if window is None:
+            return super().list(request, *args, **kwargs)
+        
+        devices, start, end = window
+        reader = SensorReadingsArchiveReader()
+        if self.paginator.use_keyset(request):
+            # Each page reads at most page_size + 1 archived rows past its cursor
+            def read_archived(position, descending, limit):
+                ordering = '-timestamp' if descending else 'timestamp'
+                return reader.read_first(devices, start, end, ordering=ordering, limit=limit, after=position)[0]
+            
+            page = self.paginator.paginate_queryset(
+                self.filter_queryset(self.get_queryset()), request, view=self, read_extra=read_archived
+            )
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        
+        ordering = request.GET.get('ordering', '-timestamp')
+        readings = HotAndArchivedReadings(
+            self.filter_queryset(self.get_queryset()).order_by(ordering, ordering.replace('timestamp', 'id')),
+            lambda limit: reader.read_first(devices, start, end, ordering=ordering, limit=limit)[0],
+            reader.count(devices, start, end),
+            descending=ordering == '-timestamp'
+        )
+        page = self.paginate_queryset(readings)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+    
     @extend_schema(
         summary="List sensor readings",
-        description="Get list of sensor readings for the current user's devices",
+        description=(
+            "Get list of sensor readings for the current user's devices. "
+            "Use timestamp_after/timestamp_before to limit the time window; "
+            "windows reaching into archived months include archived readings "
+            "when ordered by timestamp. Pass pagination=cursor for keyset "
+            "pagination (next/previous cursors, no count)."
+        ),
         responses={200: SensorReadingsSerializer(many=True)}
     )
     def get(self, request, *args, **kwargs):
@@ -145,6 +215,55 @@ class SensorReadingsListCreateView(generics.ListCreateAPIView):
         return super().post(request, *args, **kwargs)
 
 
+class SensorReadingsExportView(APIView):
+    """Stream sensor readings of the current user's devices as CSV or NDJSON"""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    @extend_schema(
+        summary="Export sensor readings",
+        description=(
+            "Stream every sensor reading of the current user's devices matching the "
+            "device/device_serial/timestamp_after/timestamp_before filters. "
+            "Use output=csv (default) or output=ndjson."
+        ),
+        responses={
+            200: OpenApiResponse(description="CSV or NDJSON stream"),
+            400: OpenApiResponse(description="Invalid filters or output format")
+        }
+    )
+    def get(self, request):
+        output = request.GET.get('output', 'csv')
+        if output not in EXPORT_FORMATS:
+            return Response(
+                {'output': [f"Must be one of: {', '.join(EXPORT_FORMATS)}"]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        readings_filter = SensorReadingsFilter(
+            request.GET,
+            queryset=SensorReadings.objects.filter(device__beekeeper__user=request.user)
+        )
+        if not readings_filter.is_valid():
+            return Response(readings_filter.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Archived months are streamed file by file ahead of the hot rows
+        devices = readings_filter.filter_devices(SmartDevices.objects.filter(beekeeper__user=request.user))
+        archived = SensorReadingsArchiveReader().iter_read(
+            devices,
+            readings_filter.form.cleaned_data.get('timestamp_after'),
+            readings_filter.form.cleaned_data.get('timestamp_before')
+        )
+        
+        response = StreamingHttpResponse(
+            SensorReadingsExporter().stream(output, readings_filter.qs, archived),
+            content_type=EXPORT_FORMATS[output]
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="sensor_readings_{timezone.now():%Y%m%d_%H%M%S}.{output}"'
+        )
+        return response
+
+
 class SensorReadingsDetailView(generics.RetrieveAPIView):
     """Retrieve sensor reading details"""
     serializer_class = SensorReadingsSerializer
@@ -174,6 +293,8 @@ class AudioRecordingsListCreateView(generics.ListCreateAPIView):
     filterset_fields = ['device', 'upload_status', 'analysis_status', 'is_analyzed']
     ordering_fields = ['recorded_at', 'created_at', 'duration', 'file_size']
     ordering = ['-recorded_at']
+    pagination_class = KeysetPagination
+    keyset_field = 'recorded_at'
     
     def get_queryset(self):
         """Return recordings for the current user's devices"""
@@ -243,6 +364,8 @@ class DeviceImagesListCreateView(generics.ListCreateAPIView):
     filterset_fields = ['device', 'image_type', 'upload_status', 'analysis_status', 'is_analyzed']
     ordering_fields = ['captured_at', 'created_at']
     ordering = ['-captured_at']
+    pagination_class = KeysetPagination
+    keyset_field = 'captured_at'
     
     def get_queryset(self):
         """Return images for the current user's devices"""
@@ -342,10 +465,12 @@ def device_stats(request, device_id):
     last_24h = now - timedelta(hours=24)
     last_week = now - timedelta(days=7)
     
-    # Get statistics
-    total_readings = device.sensor_readings.count()
-    readings_last_24h = device.sensor_readings.filter(timestamp__gte=last_24h).count()
-    readings_last_week = device.sensor_readings.filter(timestamp__gte=last_week).count()
+    # Get statistics (reading counts come from the counters maintained on ingest)
+    counters = DeviceReadingCounterService()
+    devices = SmartDevices.objects.filter(id=device.id)
+    total_readings = counters.total(devices)
+    readings_last_24h = counters.count_since(devices, last_24h)
+    readings_last_week = counters.count_since(devices, last_week)
     audio_recordings = device.audio_recordings.count()
     device_images = device.device_images.count()
     
@@ -376,29 +501,113 @@ def device_stats(request, device_id):
         }, status=status.HTTP_200_OK)
 
 
+@extend_schema(
+    summary="Get ingest statistics",
+    description="Get runtime counters of the sensor ingest path for the current worker process (staff only)",
+    responses={200: OpenApiResponse(description="Ingest statistics")}
+)
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def ingest_stats(request):
+    """Get ingest path counters for this worker process"""
+    return Response({
+        'device_cache': device_serial_cache.stats(),
+        'heartbeats': device_heartbeats.stats(),
+        'write_behind': IngestSpool().stats()
+    }, status=status.HTTP_200_OK)
+
+
 class SensorReadingsCreateUnauthenticatedView(APIView):
     """Create sensor readings without authentication - for IoT devices"""
     permission_classes = []  # No authentication required
+    parser_classes = [JSONParser, NDJSONParser, BinaryReadingsParser, FormParser, MultiPartParser]
     
     @extend_schema(
         summary="Create sensor reading (unauthenticated)",
-        description="Create a new sensor reading using device serial number without authentication - intended for IoT devices",
+        description=(
+            "Create a new sensor reading using device serial number without authentication - intended for IoT devices. "
+            "Gateways can submit a batch as a JSON array, as NDJSON (application/x-ndjson) or as "
+            "compact binary frames (application/vnd.smart-nyuki.readings); "
+            "the response then carries a per-item status. When write-behind ingest is enabled "
+            "readings are queued and acknowledged with 202. Ingest is idempotent: a retried reading with the "
+            "same timestamp or sequence_number is not stored again; it is answered with 200 and the stored "
+            "reading, or reported with status 'duplicate' in a batch."
+        ),
         request=SensorReadingsCreateSerializer,
         responses={
+            200: OpenApiResponse(description="Reading(s) already stored, nothing was inserted"),
             201: SensorReadingsSerializer,
+            202: OpenApiResponse(description="Readings queued for write-behind insertion"),
+            207: OpenApiResponse(description="Batch partially stored, see per-item results"),
             400: OpenApiResponse(description="Validation errors"),
             404: OpenApiResponse(description="Device not found")
         }
     )
     def post(self, request):
-        """Create a sensor reading without authentication"""
-        serializer = SensorReadingsCreateSerializer(data=request.data)
-        if serializer.is_valid():
-            # Create the sensor reading
-            sensor_reading = serializer.save()
-            
-            # Return the created reading using the regular serializer
-            response_serializer = SensorReadingsSerializer(sensor_reading)
-            return Response(response_serializer.data, status=status.HTTP_201_CREATED)
+        """Create a sensor reading (or a batch of readings) without authentication"""
+        ingest_service = SensorReadingsIngestService()
+        
+        if isinstance(request.data, BinaryReadingBatch):
+            return self.create_batch(ingest_service, request.data, ingest_service.ingest_binary)
+        
+        if isinstance(request.data, list):
+            return self.create_batch(ingest_service, request.data, ingest_service.ingest)
+        
+        result = ingest_service.ingest([request.data])
+        if result.error_count:
+            return Response(result.items[0]['errors'], status=status.HTTP_400_BAD_REQUEST)
+        
+        if result.queued_count:
+            # Write-behind mode: the reading is durably queued and inserted by the flusher
+            return Response({
+                'id': result.items[0]['id'],
+                'status': result.items[0]['status']
+            }, status=status.HTTP_202_ACCEPTED)
+        
+        if result.duplicate_count:
+            # Retried reading: answer with the copy that is already stored
+            stored = ingest_service.find_stored(result.duplicates[0])
+            if stored is None:
+                return Response({'status': 'duplicate'}, status=status.HTTP_200_OK)
+            return Response(SensorReadingsSerializer(stored).data, status=status.HTTP_200_OK)
+        
+        # Return the created reading using the regular serializer
+        response_serializer = SensorReadingsSerializer(result.readings[0])
+        return Response(response_serializer.data, status=status.HTTP_201_CREATED)
+    
+    def create_batch(self, ingest_service, items, ingest):
+        """Validate and store a batch of readings, reporting a status per item"""
+        if not items:
+            return Response(
+                {'error': 'Batch must contain at least one reading'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if len(items) > ingest_service.max_batch_size:
+            return Response(
+                {'error': f'Batch exceeds the maximum of {ingest_service.max_batch_size} readings'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        result = ingest(items)
+        
+        if not result.error_count:
+            if result.queued_count:
+                response_status = status.HTTP_202_ACCEPTED
+            elif result.created_count:
+                response_status = status.HTTP_201_CREATED
+            else:
+                # Every reading was a retry of one already stored
+                response_status = status.HTTP_200_OK
+        elif result.accepted_count:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
         
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'created': result.created_count,
+            'queued': result.queued_count,
+            'duplicates': result.duplicate_count,
+            'failed': result.error_count,
+            'results': result.items
+        }, status=response_status)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Harvests, Alerts
+from .models import Harvests, Alerts, DeviceAnomalyState
 
 
 @admin.register(Harvests)
@@ -116,10 +116,21 @@ class AlertsAdmin(admin.ModelAdmin):
             is_resolved=False,
             resolved_at=None,
             resolved_by=None,
-            resolution_notes=''
+            resolution_notes='',
+            suppresses_duplicates=False
         )
         self.message_user(
             request,
             f'{updated} alert(s) were successfully marked as unresolved.'
         )
     mark_as_unresolved.short_description = 'Mark selected alerts as unresolved'
+
+
+@admin.register(DeviceAnomalyState)
+class DeviceAnomalyStateAdmin(admin.ModelAdmin):
+    """Admin configuration for DeviceAnomalyState model"""
+    
+    list_display = ['device', 'last_timestamp', 'updated_at']
+    search_fields = ['device__serial_number']
+    readonly_fields = ['device', 'metrics', 'last_timestamp', 'updated_at']
+    ordering = ['-updated_at']
@@ -8,6 +8,7 @@ from celery.schedules import crontab
 
 # Celery Beat Schedule
 CELERY_BEAT_SCHEDULE = {
+    # Safety net when ALERTS_EVALUATE_ON_INGEST is on: hives checked after ingest are skipped
     'check-alerts-every-10-minutes': {
         'task': 'production.tasks.check_alerts_task',
         'schedule': crontab(minute='*/10'),  # Run every 10 minutes
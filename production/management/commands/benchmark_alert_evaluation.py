@@ -0,0 +1,209 @@
+"""
+Django management command to benchmark the vectorized alert evaluation.
+
+Builds a synthetic fleet of hives, each with a latest-reading snapshot, its
+owner's thresholds (one hive in ten has its own) and the windowed metrics the
+alert rules read (previous day's weight, recent peak weight, varroa count,
+days until the next inspection), then times two ways of running the compiled rule plans:
+a per-hive loop over CompiledRule.severity and VectorizedAlertEvaluator from
+production.services.alert_evaluator. Compiling the plans and array
+construction are also reported separately. Both sets of alerts are compared
+so the speed-up is not bought with different alerts. No database access is
+needed.
+
+Usage:
+    python manage.py benchmark_alert_evaluation
+    python manage.py benchmark_alert_evaluation --hives 50000 --violation-rate 0.2 --repeat 5
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from datetime import timedelta
+from decimal import Decimal
+import math
+import numpy as np
+import random
+import time
+import uuid
+
+from production.services.alert_checker import AlertChecker
+from production.services.alert_evaluator import HiveMetrics, VectorizedAlertEvaluator
+from production.services.alert_rules import ALERT_RULES, RulePlanCache
+from devices.models import HiveLatestReading
+from settings.models import AlertThresholds
+from apiaries.models import Hives
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the vectorized alert rule evaluation against a per-hive loop'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hives',
+            type=int,
+            nargs='+',
+            default=[10000, 100000],
+            help='Fleet sizes to benchmark (default: 10000 100000)',
+        )
+        parser.add_argument(
+            '--violation-rate',
+            type=float,
+            default=0.1,
+            help='Share of readings pushed outside a threshold (default: 0.1)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Runs per implementation; the fastest is reported (default: 3)',
+        )
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1 or any(hives < 1 for hives in options['hives']):
+            raise CommandError('--hives and --repeat must be positive')
+        if not 0 <= options['violation_rate'] <= 1:
+            raise CommandError('--violation-rate must be between 0 and 1')
+
+        for hives in options['hives']:
+            self.benchmark(hives, options['violation_rate'], options['repeat'])
+
+    def benchmark(self, hive_count, violation_rate, repeat):
+        snapshots, thresholds, windowed = self.make_fleet(hive_count, violation_rate)
+        plans = RulePlanCache(ALERT_RULES, max_size=hive_count)
+        evaluator = VectorizedAlertEvaluator(AlertChecker().build_alert, plans)
+        self.stdout.write(f"\n{hive_count} hives ({violation_rate:.0%} of readings outside a threshold)")
+
+        compile_seconds, _ = self.best_of(1, lambda: [plans.get(threshold) for threshold in thresholds])
+        loop_seconds, loop_alerts = self.best_of(repeat, lambda: self.loop_alerts(
+            evaluator, snapshots, thresholds, HiveMetrics(snapshots, windowed)
+        ))
+        numpy_seconds, numpy_alerts = self.best_of(repeat, lambda: evaluator.evaluate(
+            snapshots, thresholds, HiveMetrics(snapshots, windowed)
+        ))
+        load_seconds, _ = self.best_of(repeat, lambda: HiveMetrics(snapshots, windowed).load_snapshot_metrics())
+
+        self.stdout.write(f"{'implementation':<22} {'ms':>10} {'hives/s':>14}")
+        for name, seconds in (
+            ('compile plans (once)', compile_seconds),
+            ('per-hive loop', loop_seconds),
+            ('numpy', numpy_seconds),
+            ('  rows to arrays', load_seconds),
+            ('  passes and alerts', numpy_seconds - load_seconds),
+        ):
+            self.stdout.write(f'{name:<22} {seconds * 1000:>10.1f} {hive_count / max(seconds, 1e-9):>14.0f}')
+
+        expected, actual = self.alert_keys(loop_alerts), self.alert_keys(numpy_alerts)
+        if expected != actual:
+            for key in sorted(expected - actual)[:10]:
+                self.stdout.write(self.style.ERROR(f'missing: {key}'))
+            for key in sorted(actual - expected)[:10]:
+                self.stdout.write(self.style.ERROR(f'unexpected: {key}'))
+            raise CommandError('The implementations disagree')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Alerts match; numpy is {loop_seconds / numpy_seconds:.1f}x faster ({len(numpy_alerts)} alerts)'
+        ))
+
+    def make_fleet(self, hive_count, violation_rate):
+        """Return aligned (snapshots, thresholds) and the windowed metrics as HiveMetrics preloads."""
+        random.seed(42)
+        owner_thresholds = [self.make_thresholds() for _ in range(max(1, hive_count // 20))]
+
+        snapshots, thresholds = [], []
+        previous_weights, peaks, mite_counts, days_until = [], [], [], []
+        for i in range(hive_count):
+            hive = Hives(id=uuid.uuid4(), name=f'Hive {i}')
+            threshold = self.make_thresholds() if i % 10 == 0 else random.choice(owner_thresholds)
+            values = {
+                'temperature': Decimal(f'{random.uniform(33, 37):.2f}'),
+                'humidity': Decimal(f'{random.uniform(45, 65):.2f}'),
+                'weight': Decimal(f'{random.uniform(20, 60):.2f}'),
+                'sound_level': random.randint(40, 80) if i % 7 else None,
+                'battery_level': random.randint(25, 100),
+            }
+            previous_weight = values['weight'] + Decimal(f'{random.uniform(-1, 1):.2f}') if i % 5 else None
+            peak = values['weight'] + Decimal(f'{random.uniform(0, 1):.2f}')
+            mites = random.randint(0, 7) if i % 4 == 0 else None
+            due_in = random.randint(15, 60) if i % 6 == 0 else None
+
+            if random.random() < violation_rate:
+                # Push one metric past its threshold by a random margin so every severity band is hit
+                metric = random.choice([
+                    'temperature', 'humidity', 'weight', 'sound_level', 'battery_level',
+                    'swarm', 'varroa', 'inspection'
+                ])
+                if metric == 'temperature':
+                    values[metric] = Decimal(f'{random.choice([25, 45]) + random.uniform(-4, 4):.2f}')
+                elif metric == 'humidity':
+                    values[metric] = Decimal(f'{random.choice([15, 95]) + random.uniform(-12, 12):.2f}')
+                elif metric == 'weight':
+                    previous_weight = values['weight'] + Decimal(f'{random.choice([-1, 1]) * random.uniform(2, 8):.2f}')
+                elif metric == 'sound_level':
+                    values[metric] = random.randint(86, 110)
+                elif metric == 'battery_level':
+                    values[metric] = random.randint(1, 20)
+                elif metric == 'swarm':
+                    peak = values['weight'] + Decimal(f'{random.uniform(1, 4):.2f}')
+                elif metric == 'varroa':
+                    mites = random.randint(10, 40)
+                else:
+                    due_in = random.randint(-30, 7)
+
+            snapshots.append(HiveLatestReading(hive=hive, reading_id=uuid.uuid4(), **values))
+            thresholds.append(threshold)
+            previous_weights.append(previous_weight if previous_weight else None)
+            peaks.append(peak)
+            mite_counts.append(mites)
+            days_until.append(due_in)
+
+        windowed = {
+            ('previous_weight', timedelta(days=1)): np.array(previous_weights, dtype=np.float64),
+            ('weight_peak', timedelta(hours=1)): np.array(peaks, dtype=np.float64),
+            ('varroa_mite_count', timedelta(days=30)): np.array(mite_counts, dtype=np.float64),
+            ('inspection_days_until', None): np.array(days_until, dtype=np.float64),
+        }
+        return snapshots, thresholds, windowed
+
+    def make_thresholds(self):
+        return AlertThresholds(
+            temperature_min=Decimal(f'{random.uniform(31, 33):.2f}'),
+            temperature_max=Decimal(f'{random.uniform(37, 39):.2f}'),
+            humidity_min=Decimal('40.00'),
+            humidity_max=Decimal('70.00'),
+            weight_change_threshold=Decimal(random.choice(['1.50', '2.00', '2.50'])),
+            sound_level_threshold=85,
+            battery_warning_level=20,
+            inspection_reminder_days=random.choice([3, 7]),
+            swarm_weight_drop_threshold=Decimal(random.choice(['1.50', '2.00'])),
+            varroa_mite_threshold=random.choice([8, 10]),
+        )
+
+    def best_of(self, repeat, run):
+        best, result = None, None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = run()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    def loop_alerts(self, evaluator, snapshots, thresholds, metrics):
+        """Run each hive's compiled rules one value at a time."""
+        alerts = []
+        for i, (snapshot, threshold) in enumerate(zip(snapshots, thresholds)):
+            fired = set()
+            for compiled in evaluator.plans.get(threshold).rules:
+                rule = compiled.rule
+                if rule.alert_type in fired:
+                    continue
+                value = float(metrics.get(rule.metric, rule.window)[i])
+                severity = compiled.severity(None if math.isnan(value) else value)
+                if severity:
+                    fired.add(rule.alert_type)
+                    alerts.append(evaluator.alert(rule, snapshot, threshold, metrics, i, severity))
+        return alerts
+
+    def alert_keys(self, alerts):
+        return {
+            (str(alert.hive_id), alert.alert_type, alert.severity, alert.message, repr(sorted(alert.trigger_values.items())))
+            for alert in alerts
+        }
@@ -9,6 +9,7 @@ Usage:
     python manage.py check_alerts
     python manage.py check_alerts --verbose
     python manage.py check_alerts --hive-id <hive_uuid>
+    python manage.py check_alerts --shards 8 --processes 4
 """
 
 from django.core.management.base import BaseCommand, CommandError
@@ -17,6 +18,7 @@ from datetime import timedelta
 import logging
 
 from production.services.alert_checker import AlertChecker
+from production.services.alert_shards import check_shards_locally
 from apiaries.models import Hives
 
 logger = logging.getLogger(__name__)
@@ -31,6 +33,17 @@ class Command(BaseCommand):
             type=str,
             help='Check alerts for a specific hive only (UUID)',
         )
+        parser.add_argument(
+            '--shards',
+            type=int,
+            default=1,
+            help='Split the hives into this many shards checked in parallel local processes (default: 1)',
+        )
+        parser.add_argument(
+            '--processes',
+            type=int,
+            help='Worker processes for --shards (default: one per shard)',
+        )
         parser.add_argument(
             '--verbose',
             action='store_true',
@@ -56,6 +69,9 @@ class Command(BaseCommand):
             if options['hive_id']:
                 # Check alerts for a specific hive
                 alerts_created = self.check_single_hive(alert_checker, options['hive_id'])
+            elif options['shards'] > 1:
+                # Check shards of the hives in parallel processes
+                alerts_created = self.check_sharded(options['shards'], options['processes'])
             else:
                 # Check alerts for all hives
                 alerts_created = alert_checker.check_all_hives()
@@ -76,6 +92,23 @@ class Command(BaseCommand):
             )
             raise CommandError(f'Alert check failed: {str(e)}')
 
+    def check_sharded(self, shards, processes):
+        """Check all hives in shards on a local process pool."""
+        if processes is not None and processes < 1:
+            raise CommandError('--processes must be positive')
+        
+        result = check_shards_locally(shards, processes)
+        for shard_result in result['shard_results']:
+            self.stdout.write(
+                f"Shard {shard_result['shard'] + 1}/{shards}: {shard_result['alerts_created']} alerts "
+                f"in {shard_result['duration_seconds']:.2f} seconds"
+            )
+        self.stdout.write(
+            f"Slowest shard {result['slowest_shard_seconds']:.2f} seconds, "
+            f"{result['total_shard_seconds']:.2f} seconds across all shards"
+        )
+        return result['alerts_created']
+    
     def check_single_hive(self, alert_checker, hive_id):
         """Check alerts for a single hive."""
         try:
@@ -0,0 +1,35 @@
+"""
+Django management command to reset the streaming anomaly detector state.
+
+The detector learns each device's normal readings as they arrive. Reset a
+device after replacing or recalibrating its sensors so it warms up on the new
+readings instead of flagging the change as an anomaly.
+
+Usage:
+    python manage.py reset_anomaly_state
+    python manage.py reset_anomaly_state --device-id <uuid>
+"""
+
+from django.core.management.base import BaseCommand
+
+from devices.models import SmartDevices
+from production.services.anomaly_detector import AnomalyDetector
+
+
+class Command(BaseCommand):
+    help = 'Delete DeviceAnomalyState so the anomaly detector warms up again'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--device-id',
+            type=str,
+            help='Reset only a specific device by ID',
+        )
+
+    def handle(self, *args, **options):
+        devices = None
+        if options.get('device_id'):
+            devices = SmartDevices.objects.filter(id=options['device_id'])
+
+        deleted = AnomalyDetector().reset(devices)
+        self.stdout.write(self.style.SUCCESS(f'Reset the anomaly state of {deleted} devices'))
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apiaries', '0001_initial'),
+        ('production', '0002_add_sound_battery_alert_types'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='alerts',
+            index=models.Index(fields=['created_at', 'id'], name='alerts_keyset_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0009_device_reading_counters'),
+        ('production', '0003_alerts_keyset_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeviceAnomalyState',
+            fields=[
+                ('device', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='anomaly_state', serialize=False, to='devices.smartdevices')),
+                ('metrics', models.JSONField(default=dict, help_text='Per metric: [samples, EWMA mean, EWMA variance, anomalous]')),
+                ('last_timestamp', models.DateTimeField(blank=True, help_text='Timestamp of the newest reading folded into the state', null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Device Anomaly State',
+                'verbose_name_plural': 'Device Anomaly States',
+            },
+        ),
+        migrations.AlterField(
+            model_name='alerts',
+            name='alert_type',
+            field=models.CharField(choices=[('Temperature', 'Temperature'), ('Humidity', 'Humidity'), ('Weight', 'Weight'), ('Sound', 'Sound'), ('Battery', 'Battery'), ('Inspection_Due', 'Inspection Due'), ('Pest_Risk', 'Pest Risk'), ('Swarm_Risk', 'Swarm Risk'), ('Anomaly', 'Anomaly')], max_length=20),
+        ),
+    ]
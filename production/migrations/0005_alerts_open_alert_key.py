@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:25
+
+from datetime import timedelta
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def release_duplicate_open_alerts(apps, schema_editor):
+    """Keep the open-alert key only on the newest unresolved alert per hive and type of the last hour"""
+    Alerts = apps.get_model('production', 'Alerts')
+
+    # Picked in Python rather than with DISTINCT ON, which only PostgreSQL supports
+    newest_open = {}
+    recent_open = Alerts.objects.filter(
+        is_resolved=False,
+        created_at__gte=timezone.now() - timedelta(minutes=60)
+    ).exclude(alert_type='Anomaly').order_by('-created_at').values_list('id', 'hive_id', 'alert_type')
+    for alert_id, hive_id, alert_type in recent_open.iterator():
+        newest_open.setdefault((hive_id, alert_type), alert_id)
+
+    released = Alerts.objects.filter(is_resolved=False).exclude(id__in=list(newest_open.values())).update(
+        suppresses_duplicates=False
+    )
+    if released:
+        logger.info(f"Released the open-alert key of {released} older or duplicate alerts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apiaries', '0001_initial'),
+        ('production', '0004_device_anomaly_state'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alerts',
+            name='suppresses_duplicates',
+            field=models.BooleanField(default=True, help_text='Whether this unresolved alert still blocks new alerts of the same type for its hive'),
+        ),
+        migrations.RunPython(
+            release_duplicate_open_alerts,
+            migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='alerts',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_resolved', False), ('suppresses_duplicates', True)), fields=('hive', 'alert_type'), name='unique_open_alert_hive_type'),
+        ),
+    ]
@@ -3,6 +3,7 @@ import uuid
 from django.core.validators import DecimalValidator
 from accounts.models import User
 from apiaries.models import Hives
+from devices.models import SmartDevices
 
 
 class Harvests(models.Model):
@@ -86,6 +87,7 @@ class Alerts(models.Model):
         INSPECTION_DUE = 'Inspection_Due', 'Inspection Due'
         PEST_RISK = 'Pest_Risk', 'Pest Risk'
         SWARM_RISK = 'Swarm_Risk', 'Swarm Risk'
+        ANOMALY = 'Anomaly', 'Anomaly'
     
     class Severity(models.TextChoices):
         LOW = 'Low', 'Low'
@@ -132,12 +134,28 @@ class Alerts(models.Model):
         null=True,
         help_text="Notes about how the alert was resolved"
     )
+    suppresses_duplicates = models.BooleanField(
+        default=True,
+        help_text="Whether this unresolved alert still blocks new alerts of the same type for its hive"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         verbose_name = "Alert"
         verbose_name_plural = "Alerts"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='alerts_keyset_idx'),
+        ]
+        constraints = [
+            # One open alert per hive and type inside the dedupe window; alert inserts
+            # use ON CONFLICT DO NOTHING against it
+            models.UniqueConstraint(
+                fields=['hive', 'alert_type'],
+                condition=models.Q(is_resolved=False, suppresses_duplicates=True),
+                name='unique_open_alert_hive_type'
+            ),
+        ]
     
     def __str__(self):
         status = "Resolved" if self.is_resolved else "Active"
@@ -152,3 +170,30 @@ class Alerts(models.Model):
         if notes:
             self.resolution_notes = notes
         self.save()
+
+
+class DeviceAnomalyState(models.Model):
+    """Streaming anomaly detector state of a device: EWMA mean and variance per metric"""
+    device = models.OneToOneField(
+        SmartDevices,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='anomaly_state'
+    )
+    metrics = models.JSONField(
+        default=dict,
+        help_text="Per metric: [samples, EWMA mean, EWMA variance, anomalous]"
+    )
+    last_timestamp = models.DateTimeField(
+        blank=True,
+        null=True,
+        help_text="Timestamp of the newest reading folded into the state"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Device Anomaly State"
+        verbose_name_plural = "Device Anomaly States"
+    
+    def __str__(self):
+        return f"{self.device_id} - {self.last_timestamp}"
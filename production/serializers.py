@@ -95,6 +95,17 @@ class AlertsSerializer(serializers.ModelSerializer):
                         "You must have a beekeeper profile to create alerts."
                     )
         return data
+    
+    def create(self, validated_data):
+        # Only alerts raised by the alert checker hold the hive's open-alert key
+        validated_data['suppresses_duplicates'] = False
+        return super().create(validated_data)
+    
+    def update(self, instance, validated_data):
+        # A reopened alert may share its hive and type with a newer open alert
+        if instance.is_resolved and validated_data.get('is_resolved') is False:
+            validated_data['suppresses_duplicates'] = False
+        return super().update(instance, validated_data)
 
 
 class HarvestsDetailSerializer(HarvestsSerializer):
@@ -3,17 +3,43 @@ Alert Checker Service
 
 This service monitors sensor readings and creates alerts when thresholds are exceeded.
 It runs every 10 minutes to check the latest sensor readings against alert thresholds.
+
+Hives are checked as a set with a fixed number of queries however many there
+are: the latest readings come from the per-hive snapshot in one query, the
+thresholds of every owner from the threshold resolver (one query for the
+owners it has not cached). Hives with inspection data (an open inspection
+schedule or a recent varroa count) but no recent reading are checked too,
+with an empty snapshot, so the inspection rules run for hives without a
+smart device or whose device went quiet.
+
+What raises an alert is declared as data in alert_rules.py. The rules are
+compiled once per threshold set and evaluated for all hives at once on NumPy
+arrays (alert_evaluator.py), with one query per windowed metric (previous
+day's weight, recent peak weight, latest varroa count, overdue inspections).
+New alerts are written with a single bulk insert. Duplicates are skipped by the
+database: the insert uses ON CONFLICT DO NOTHING against a partial unique
+index allowing one open alert per hive and type, so concurrent checks (the
+periodic sweep, ingest-driven checks and the manual API action) cannot create
+the same alert twice. An unresolved alert stops blocking new ones after
+duplicate_alert_threshold_minutes.
+
+With event-driven checks enabled (alert_events.py) hives are mostly checked
+right after ingest, and the periodic sweep skips hives checked recently.
 """
 
 from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
 from django.utils import timezone
-from django.db.models import Q
 from datetime import timedelta
 import logging
 
 from ..models import Alerts
-from devices.models import SensorReadings
-from settings.models import AlertThresholds
+from .alert_evaluator import VectorizedAlertEvaluator
+from .alert_events import mark_evaluated, recently_evaluated
+from .alert_rules import ALERT_RULES, INSPECTION_METRICS
+from devices.models import HiveLatestReading, SmartDevices
+from inspections.models import InspectionReports, InspectionSchedules
+from settings.services.threshold_resolver import threshold_resolver
 from apiaries.models import Hives
 
 logger = logging.getLogger(__name__)
@@ -26,369 +52,155 @@ class AlertChecker:
         self.alert_duration_minutes = 10  # Check readings from last 10 minutes
         self.duplicate_alert_threshold_minutes = 60  # Prevent duplicate alerts within 1 hour
     
-    def check_all_hives(self):
-        """Check all active hives with smart devices for alerts."""
-        logger.info("Starting alert check for all hives...")
+    def check_all_hives(self, hives=None, skip_evaluated=False):
+        """Check all active hives with smart devices (or the given hives) for alerts.
         
-        # Get all active hives with smart devices
-        hives = Hives.objects.filter(
-            is_active=True,
-            has_smart_device=True,
-            smart_devices__is_active=True
-        ).distinct()
+        With skip_evaluated, hives already checked after ingest within
+        ALERTS_SWEEP_SKIP_SECONDS are left out.
+        """
+        logger.info("Starting alert check for all hives...")
         
-        total_alerts_created = 0
+        if hives is None:
+            hives = self.get_active_hives()
         
-        for hive in hives:
-            try:
-                alerts_created = self.check_hive_alerts(hive)
-                total_alerts_created += alerts_created
-            except Exception as e:
-                logger.error(f"Error checking alerts for hive {hive.id}: {str(e)}")
+        total_alerts_created = self.check_hives(hives, skip_evaluated)
         
         logger.info(f"Alert check completed. Created {total_alerts_created} new alerts.")
         return total_alerts_created
     
+    def get_active_hives(self):
+        """Get the active hives with an active smart device or with inspection data."""
+        has_device = Q(has_smart_device=True) & Q(Exists(
+            SmartDevices.objects.filter(hive=OuterRef('pk'), is_active=True)
+        ))
+        return Hives.objects.filter(has_device | self.has_inspection_data(), is_active=True)
+    
+    def has_inspection_data(self):
+        """Q for hives with data the inspection rules read: an open schedule or a varroa count in the window."""
+        report_window = max(
+            (rule.window for rule in ALERT_RULES if rule.metric in INSPECTION_METRICS and rule.window),
+            default=timedelta(0)
+        )
+        open_schedules = InspectionSchedules.objects.filter(hive=OuterRef('pk'), is_completed=False)
+        recent_counts = InspectionReports.objects.filter(
+            hive=OuterRef('pk'),
+            inspection_date__gte=timezone.localdate() - report_window,
+            varroa_mite_count__isnull=False
+        )
+        return Q(Exists(open_schedules)) | Q(Exists(recent_counts))
+    
     def check_hive_alerts(self, hive):
         """Check alerts for a specific hive."""
         logger.debug(f"Checking alerts for hive: {hive.name}")
-        
-        # Get the latest sensor reading for this hive
-        latest_reading = self.get_latest_sensor_reading(hive)
-        if not latest_reading:
-            logger.debug(f"No sensor readings found for hive: {hive.name}")
-            return 0
-        
-        # Get alert thresholds for this hive (hive-specific or global)
-        thresholds = self.get_alert_thresholds(hive)
-        if not thresholds:
-            logger.debug(f"No alert thresholds found for hive: {hive.name}")
+        return self.check_hives(Hives.objects.filter(pk=hive.pk))
+    
+    def check_hives(self, hives, skip_evaluated=False):
+        """Check a queryset of hives as a set and bulk-create their alerts; return alerts created."""
+        snapshots = self.get_latest_sensor_readings(hives)
+        if skip_evaluated and snapshots:
+            evaluated = recently_evaluated([snapshot.hive_id for snapshot in snapshots])
+            snapshots = [snapshot for snapshot in snapshots if snapshot.hive_id not in evaluated]
+        sensor_hive_ids = [snapshot.hive_id for snapshot in snapshots]
+        snapshots += self.get_inspection_only_snapshots(hives, sensor_hive_ids)
+        if not snapshots:
+            logger.debug("No recent sensor readings or inspection data found for the hives checked")
             return 0
         
-        alerts_created = 0
-        
-        # Check each threshold type
-        alerts_created += self.check_temperature_alerts(hive, latest_reading, thresholds)
-        alerts_created += self.check_humidity_alerts(hive, latest_reading, thresholds)
-        alerts_created += self.check_weight_alerts(hive, latest_reading, thresholds)
-        alerts_created += self.check_sound_alerts(hive, latest_reading, thresholds)
-        alerts_created += self.check_battery_alerts(hive, latest_reading, thresholds)
+        thresholds_by_user = threshold_resolver.get_many(
+            {snapshot.hive.apiary.beekeeper.user_id for snapshot in snapshots}
+        )
+        
+        checked, checked_thresholds = [], []
+        for snapshot in snapshots:
+            hive = snapshot.hive
+            thresholds = thresholds_by_user[hive.apiary.beekeeper.user_id].for_hive(hive.id)
+            if not thresholds:
+                logger.debug(f"No alert thresholds found for hive: {hive.name}")
+                continue
+            checked.append(snapshot)
+            checked_thresholds.append(thresholds)
+        
+        # The alert rules run for all hives at once on aligned arrays
+        try:
+            candidates = VectorizedAlertEvaluator(self.build_alert).evaluate(checked, checked_thresholds)
+        except Exception as e:
+            logger.error(f"Error evaluating alerts for {len(checked)} hives: {str(e)}")
+            candidates = []
         
+        alerts_created = self.create_alerts(candidates)
+        mark_evaluated(sensor_hive_ids)
         return alerts_created
     
-    def get_latest_sensor_reading(self, hive):
-        """Get the latest sensor reading for a hive."""
+    def get_latest_sensor_readings(self, hives):
+        """Get the recent latest-reading snapshots of the hives, with hive owners, in one query."""
         now = timezone.now()
         time_threshold = now - timedelta(minutes=self.alert_duration_minutes)
         
-        return SensorReadings.objects.filter(
-            device__hive=hive,
-            device__is_active=True,
+        # The per-hive snapshot holds the newest reading of the hive's active devices
+        return list(HiveLatestReading.objects.filter(
+            hive__in=hives,
             timestamp__gte=time_threshold
-        ).order_by('-timestamp').first()
-    
-    def get_alert_thresholds(self, hive):
-        """Get alert thresholds for a hive (hive-specific or global fallback)."""
-        user = hive.apiary.beekeeper.user
-        
-        # First try to get hive-specific thresholds
-        hive_thresholds = AlertThresholds.objects.filter(
-            user=user,
-            hive=hive
-        ).first()
-        
-        if hive_thresholds:
-            return hive_thresholds
-        
-        # Fall back to global thresholds
-        global_thresholds = AlertThresholds.objects.filter(
-            user=user,
-            hive__isnull=True
-        ).first()
-        
-        return global_thresholds
-    
-    def check_temperature_alerts(self, hive, reading, thresholds):
-        """Check temperature-related alerts."""
-        if not reading.temperature:
-            return 0
-        
-        temperature = float(reading.temperature)
-        alerts_created = 0
-        
-        # Check minimum temperature
-        if temperature < float(thresholds.temperature_min):
-            alert_created = self.create_alert(
-                hive=hive,
-                alert_type=Alerts.AlertType.TEMPERATURE,
-                severity=self.get_temperature_severity(temperature, thresholds),
-                message=f"Temperature too low: {temperature}°C (minimum: {thresholds.temperature_min}°C)",
-                trigger_values={
-                    'temperature': temperature,
-                    'threshold_min': float(thresholds.temperature_min),
-                    'threshold_max': float(thresholds.temperature_max),
-                    'reading_id': str(reading.id)
-                }
-            )
-            if alert_created:
-                alerts_created += 1
-        
-        # Check maximum temperature
-        elif temperature > float(thresholds.temperature_max):
-            alert_created = self.create_alert(
-                hive=hive,
-                alert_type=Alerts.AlertType.TEMPERATURE,
-                severity=self.get_temperature_severity(temperature, thresholds),
-                message=f"Temperature too high: {temperature}°C (maximum: {thresholds.temperature_max}°C)",
-                trigger_values={
-                    'temperature': temperature,
-                    'threshold_min': float(thresholds.temperature_min),
-                    'threshold_max': float(thresholds.temperature_max),
-                    'reading_id': str(reading.id)
-                }
-            )
-            if alert_created:
-                alerts_created += 1
-        
-        return alerts_created
-    
-    def check_humidity_alerts(self, hive, reading, thresholds):
-        """Check humidity-related alerts."""
-        if not reading.humidity:
-            return 0
-        
-        humidity = float(reading.humidity)
-        alerts_created = 0
-        
-        # Check minimum humidity
-        if humidity < float(thresholds.humidity_min):
-            alert_created = self.create_alert(
-                hive=hive,
-                alert_type=Alerts.AlertType.HUMIDITY,
-                severity=self.get_humidity_severity(humidity, thresholds),
-                message=f"Humidity too low: {humidity}% (minimum: {thresholds.humidity_min}%)",
-                trigger_values={
-                    'humidity': humidity,
-                    'threshold_min': float(thresholds.humidity_min),
-                    'threshold_max': float(thresholds.humidity_max),
-                    'reading_id': str(reading.id)
-                }
-            )
-            if alert_created:
-                alerts_created += 1
-        
-        # Check maximum humidity
-        elif humidity > float(thresholds.humidity_max):
-            alert_created = self.create_alert(
-                hive=hive,
-                alert_type=Alerts.AlertType.HUMIDITY,
-                severity=self.get_humidity_severity(humidity, thresholds),
-                message=f"Humidity too high: {humidity}% (maximum: {thresholds.humidity_max}%)",
-                trigger_values={
-                    'humidity': humidity,
-                    'threshold_min': float(thresholds.humidity_min),
-                    'threshold_max': float(thresholds.humidity_max),
-                    'reading_id': str(reading.id)
-                }
-            )
-            if alert_created:
-                alerts_created += 1
-        
-        return alerts_created
-    
-    def check_weight_alerts(self, hive, reading, thresholds):
-        """Check weight change alerts."""
-        if not reading.weight:
-            return 0
-        
-        current_weight = float(reading.weight)
-        alerts_created = 0
-        
-        # Get previous weight reading from 24 hours ago
-        yesterday = timezone.now() - timedelta(days=1)
-        previous_reading = SensorReadings.objects.filter(
-            device__hive=hive,
-            device__is_active=True,
-            timestamp__date=yesterday.date()
-        ).order_by('-timestamp').first()
-        
-        if previous_reading and previous_reading.weight:
-            previous_weight = float(previous_reading.weight)
-            weight_change = abs(current_weight - previous_weight)
-            
-            if weight_change > float(thresholds.weight_change_threshold):
-                alert_created = self.create_alert(
-                    hive=hive,
-                    alert_type=Alerts.AlertType.WEIGHT,
-                    severity=self.get_weight_severity(weight_change, thresholds),
-                    message=f"Significant weight change: {weight_change:.2f}kg in 24h (threshold: {thresholds.weight_change_threshold}kg)",
-                    trigger_values={
-                        'current_weight': current_weight,
-                        'previous_weight': previous_weight,
-                        'weight_change': weight_change,
-                        'threshold': float(thresholds.weight_change_threshold),
-                        'reading_id': str(reading.id)
-                    }
-                )
-                if alert_created:
-                    alerts_created += 1
-        
-        return alerts_created
-    
-    def check_sound_alerts(self, hive, reading, thresholds):
-        """Check sound level alerts."""
-        if not reading.sound_level:
-            return 0
-        
-        sound_level = reading.sound_level
-        alerts_created = 0
-        
-        if sound_level > thresholds.sound_level_threshold:
-            alert_created = self.create_alert(
-                hive=hive,
-                alert_type=Alerts.AlertType.SOUND,
-                severity=self.get_sound_severity(sound_level, thresholds),
-                message=f"High sound level detected: {sound_level}dB (threshold: {thresholds.sound_level_threshold}dB)",
-                trigger_values={
-                    'sound_level': sound_level,
-                    'threshold': thresholds.sound_level_threshold,
-                    'reading_id': str(reading.id)
-                }
-            )
-            if alert_created:
-                alerts_created += 1
-        
-        return alerts_created
-    
-    def check_battery_alerts(self, hive, reading, thresholds):
-        """Check battery level alerts."""
-        if not reading.battery_level:
-            return 0
-        
-        battery_level = reading.battery_level
-        alerts_created = 0
-        
-        if battery_level <= thresholds.battery_warning_level:
-            alert_created = self.create_alert(
-                hive=hive,
-                alert_type=Alerts.AlertType.BATTERY,
-                severity=self.get_battery_severity(battery_level, thresholds),
-                message=f"Low battery level: {battery_level}% (warning level: {thresholds.battery_warning_level}%)",
-                trigger_values={
-                    'battery_level': battery_level,
-                    'threshold': thresholds.battery_warning_level,
-                    'reading_id': str(reading.id)
-                }
-            )
-            if alert_created:
-                alerts_created += 1
-        
-        return alerts_created
-    
-    def create_alert(self, hive, alert_type, severity, message, trigger_values):
-        """Create an alert if it doesn't already exist."""
-        # Check if a similar alert already exists within the threshold time
+        ).select_related('hive__apiary__beekeeper', 'device'))
+    
+    def get_inspection_only_snapshots(self, hives, sensor_hive_ids):
+        """Empty snapshots of the hives with inspection data but no recent reading, in one query.
+        
+        Their sensor metrics are missing, so only the inspection rules can fire.
+        """
+        inspection_hives = Hives.objects.filter(
+            self.has_inspection_data(),
+            pk__in=hives,
+            is_active=True
+        ).exclude(pk__in=sensor_hive_ids).select_related('apiary__beekeeper')
+        return [HiveLatestReading(hive=hive) for hive in inspection_hives]
+    
+    def release_expired_alerts(self, hive_ids):
+        """Let unresolved alerts older than the dedupe window stop blocking new alerts; return alerts released."""
         time_threshold = timezone.now() - timedelta(minutes=self.duplicate_alert_threshold_minutes)
         
-        existing_alert = Alerts.objects.filter(
+        return Alerts.objects.filter(
+            hive_id__in=hive_ids,
+            is_resolved=False,
+            suppresses_duplicates=True,
+            created_at__lt=time_threshold
+        ).update(suppresses_duplicates=False)
+    
+    def build_alert(self, hive, alert_type, severity, message, trigger_values):
+        """Build an unsaved alert for create_alerts."""
+        return Alerts(
             hive=hive,
             alert_type=alert_type,
-            is_resolved=False,
-            created_at__gte=time_threshold
-        ).first()
-        
-        if existing_alert:
-            logger.debug(f"Similar alert already exists for hive {hive.name}, type {alert_type}")
-            return False
+            severity=severity,
+            message=message,
+            trigger_values=trigger_values
+        )
+    
+    def create_alerts(self, alerts):
+        """Bulk-create the alerts that don't duplicate an open alert; return alerts created.
+        
+        Deduplication is done by the database: unique_open_alert_hive_type
+        allows one open alert per hive and type, and the insert uses ON
+        CONFLICT DO NOTHING, so concurrent checks cannot both create one. Ids
+        are generated client side, so the rows that made it in are found by
+        primary key inside the same transaction.
+        """
+        if not alerts:
+            return 0
         
         try:
             with transaction.atomic():
-                alert = Alerts.objects.create(
-                    hive=hive,
-                    alert_type=alert_type,
-                    severity=severity,
-                    message=message,
-                    trigger_values=trigger_values
-                )
-                logger.info(f"Created alert: {alert}")
-                return True
+                self.release_expired_alerts({alert.hive_id for alert in alerts})
+                Alerts.objects.bulk_create(alerts, ignore_conflicts=True)
+                created_ids = set(Alerts.objects.filter(
+                    id__in=[alert.id for alert in alerts]
+                ).values_list('id', flat=True))
         except Exception as e:
-            logger.error(f"Error creating alert: {str(e)}")
-            return False
-    
-    def get_temperature_severity(self, temperature, thresholds):
-        """Determine severity based on temperature deviation."""
-        min_temp = float(thresholds.temperature_min)
-        max_temp = float(thresholds.temperature_max)
-        
-        if temperature < min_temp:
-            deviation = min_temp - temperature
-        else:
-            deviation = temperature - max_temp
-        
-        if deviation >= 5:
-            return Alerts.Severity.CRITICAL
-        elif deviation >= 3:
-            return Alerts.Severity.HIGH
-        elif deviation >= 1:
-            return Alerts.Severity.MEDIUM
-        else:
-            return Alerts.Severity.LOW
-    
-    def get_humidity_severity(self, humidity, thresholds):
-        """Determine severity based on humidity deviation."""
-        min_hum = float(thresholds.humidity_min)
-        max_hum = float(thresholds.humidity_max)
-        
-        if humidity < min_hum:
-            deviation = min_hum - humidity
-        else:
-            deviation = humidity - max_hum
-        
-        if deviation >= 20:
-            return Alerts.Severity.CRITICAL
-        elif deviation >= 15:
-            return Alerts.Severity.HIGH
-        elif deviation >= 10:
-            return Alerts.Severity.MEDIUM
-        else:
-            return Alerts.Severity.LOW
-    
-    def get_weight_severity(self, weight_change, thresholds):
-        """Determine severity based on weight change."""
-        threshold = float(thresholds.weight_change_threshold)
-        
-        if weight_change >= threshold * 3:
-            return Alerts.Severity.CRITICAL
-        elif weight_change >= threshold * 2:
-            return Alerts.Severity.HIGH
-        elif weight_change >= threshold * 1.5:
-            return Alerts.Severity.MEDIUM
-        else:
-            return Alerts.Severity.LOW
-    
-    def get_sound_severity(self, sound_level, thresholds):
-        """Determine severity based on sound level."""
-        threshold = thresholds.sound_level_threshold
-        
-        if sound_level >= threshold + 20:
-            return Alerts.Severity.CRITICAL
-        elif sound_level >= threshold + 15:
-            return Alerts.Severity.HIGH
-        elif sound_level >= threshold + 10:
-            return Alerts.Severity.MEDIUM
-        else:
-            return Alerts.Severity.LOW
-    
-    def get_battery_severity(self, battery_level, thresholds):
-        """Determine severity based on battery level."""
-        threshold = thresholds.battery_warning_level
+            logger.error(f"Error creating alerts: {str(e)}")
+            return 0
         
-        if battery_level <= 5:
-            return Alerts.Severity.CRITICAL
-        elif battery_level <= 10:
-            return Alerts.Severity.HIGH
-        elif battery_level <= threshold:
-            return Alerts.Severity.MEDIUM
-        else:
-            return Alerts.Severity.LOW
+        new_alerts = [alert for alert in alerts if alert.id in created_ids]
+        if len(new_alerts) < len(alerts):
+            logger.debug(f"Skipped {len(alerts) - len(new_alerts)} alerts duplicating an open alert")
+        for alert in new_alerts:
+            logger.info(f"Created alert: {alert}")
+        return len(new_alerts)
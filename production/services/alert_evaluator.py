@@ -0,0 +1,216 @@
+"""
+Vectorized Alert Evaluator
+
+Runs the compiled alert rule plans (alert_rules.py) of every hive in a check
+as one batch. HiveMetrics loads each metric the rules read as a float64 array
+aligned with the hives, with one query per metric and window at most whatever
+the number of hives or rules; the plans' thresholds and band limits are
+spread into arrays the same way. Each rule is then one pass of whole-array
+comparisons and only the hives that violate it go back to Python to build
+their alert.
+
+Missing values are NaN and never fire. A zero sensor value counts as missing,
+as the device sends 0 for a sensor it does not have.
+"""
+
+from django.db.models import Max, Min
+from django.utils import timezone
+from datetime import datetime, time, timedelta
+import numpy as np
+
+from .alert_rules import (
+    COMPARATORS, INTEGER_METRICS, band_test, rule_plans, threshold_value, trigger_number
+)
+from devices.models import SensorReadings
+from inspections.models import InspectionReports, InspectionSchedules
+
+SNAPSHOT_METRICS = ['temperature', 'humidity', 'weight', 'sound_level', 'battery_level']
+
+
+class HiveMetrics:
+    """Metric arrays aligned with a list of latest-reading snapshots, loaded on first use.
+
+    Values can be preloaded as {(metric, window): array} for the loaders that
+    read the database.
+    """
+
+    def __init__(self, snapshots, preloaded=None):
+        self.snapshots = snapshots
+        self.hive_ids = [snapshot.hive_id for snapshot in snapshots]
+        self.arrays = dict(preloaded or {})
+
+    def get(self, metric, window=None):
+        """Return the float64 array of metric over window (snapshot metrics have no window)."""
+        if metric in SNAPSHOT_METRICS:
+            if (metric, None) not in self.arrays:
+                self.load_snapshot_metrics()
+            return self.arrays[(metric, None)]
+
+        key = (metric, window)
+        if key not in self.arrays:
+            loader = getattr(self, f'load_{metric}', None)
+            if loader is None:
+                raise ValueError(f"Unknown alert metric: {metric}")
+            self.arrays[key] = loader(window)
+        return self.arrays[key]
+
+    def align(self, values):
+        """Return {hive id: value} as an array in snapshot order, NaN where missing."""
+        return np.array([values.get(hive_id) for hive_id in self.hive_ids], dtype=np.float64)
+
+    def load_snapshot_metrics(self):
+        # One conversion pass for all snapshot fields: None becomes NaN, Decimal becomes float
+        rows = np.array(
+            [[getattr(snapshot, field) for field in SNAPSHOT_METRICS] for snapshot in self.snapshots],
+            dtype=np.float64
+        ).reshape(-1, len(SNAPSHOT_METRICS))
+        rows[rows == 0] = np.nan
+        for i, metric in enumerate(SNAPSHOT_METRICS):
+            self.arrays[(metric, None)] = rows[:, i]
+
+    def load_previous_weight(self, window):
+        """Weight of each hive's last reading on the calendar day window.days ago, in one DISTINCT ON query."""
+        weight = self.get('weight')
+        hive_ids = [hive_id for hive_id, value in zip(self.hive_ids, weight) if not np.isnan(value)]
+        if not hive_ids:
+            return np.full(len(self.hive_ids), np.nan)
+
+        day = timezone.localdate() - timedelta(days=window.days)
+        # Range on the raw column (not timestamp__date) so the (device, timestamp) index is usable
+        day_start = timezone.make_aware(datetime.combine(day, time.min))
+        day_end = timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+        previous = self.align(dict(SensorReadings.objects.filter(
+            device__hive_id__in=hive_ids,
+            device__is_active=True,
+            timestamp__gte=day_start,
+            timestamp__lt=day_end
+        ).order_by('device__hive_id', '-timestamp').distinct('device__hive_id').values_list(
+            'device__hive_id', 'weight'
+        )))
+        previous[previous == 0] = np.nan
+        return previous
+
+    def load_weight_change(self, window):
+        """Absolute change from the previous day's closing weight."""
+        return np.abs(self.get('weight') - self.get('previous_weight', window))
+
+    def load_weight_peak(self, window):
+        """Heaviest reading of each hive's active devices within the window, in one grouped query."""
+        return self.align(dict(SensorReadings.objects.filter(
+            device__hive_id__in=self.hive_ids,
+            device__is_active=True,
+            timestamp__gte=timezone.now() - window
+        ).order_by().values('device__hive_id').annotate(peak=Max('weight')).values_list(
+            'device__hive_id', 'peak'
+        )))
+
+    def load_weight_drop(self, window):
+        """Weight lost since the heaviest reading within the window."""
+        return self.get('weight_peak', window) - self.get('weight')
+
+    def load_varroa_mite_count(self, window):
+        """Mites counted at each hive's latest inspection within the window, in one DISTINCT ON query."""
+        return self.align(dict(InspectionReports.objects.filter(
+            hive_id__in=self.hive_ids,
+            inspection_date__gte=timezone.localdate() - window,
+            varroa_mite_count__isnull=False
+        ).order_by('hive_id', '-inspection_date', '-created_at').distinct('hive_id').values_list(
+            'hive_id', 'varroa_mite_count'
+        )))
+
+    def load_inspection_days_until(self, window):
+        """Days until each hive's oldest open inspection schedule falls due (negative once overdue), in one grouped query."""
+        today = timezone.localdate()
+        first_due = InspectionSchedules.objects.filter(
+            hive_id__in=self.hive_ids,
+            is_completed=False
+        ).order_by().values('hive_id').annotate(first=Min('scheduled_date')).values_list('hive_id', 'first')
+        return self.align({hive_id: (first - today).days for hive_id, first in first_due})
+
+    def load_inspection_overdue_days(self, window):
+        """Days since each hive's oldest open inspection schedule fell due."""
+        return -self.get('inspection_days_until')
+
+class VectorizedAlertEvaluator:
+    """Evaluate the compiled rule plans of many hives in vectorized passes."""
+
+    def __init__(self, build_alert, plans=None):
+        self.build_alert = build_alert
+        self.plans = rule_plans if plans is None else plans
+
+    def evaluate(self, snapshots, thresholds, metrics=None):
+        """Return the unsaved alerts the rules raise for each snapshot against its thresholds.
+
+        snapshots are HiveLatestReading rows and thresholds the AlertThresholds
+        resolved for each snapshot's hive; the lists are aligned.
+        """
+        if not snapshots:
+            return []
+
+        metrics = metrics or HiveMetrics(snapshots)
+        plans, plan_index = self.plan_index(thresholds)
+        fired = {}
+        alerts = []
+        no_hives = np.zeros(len(snapshots), dtype=bool)
+        # Thresholds and band limits of every rule, one row per hive
+        table = np.array([plan.vector for plan in plans], dtype=np.float64)[plan_index]
+        for position, rule in enumerate(self.plans.rules):
+            values = metrics.get(rule.metric, rule.window)
+            start, stop = plans[0].columns(position)
+            threshold, limits = table[:, start], table[:, start + 1:stop]
+
+            with np.errstate(invalid='ignore'):
+                violated = ~np.isnan(values) & COMPARATORS[rule.comparator](values, threshold)
+                # Only the first rule of an alert type that fires raises an alert
+                violated &= ~fired.get(rule.alert_type, no_hives)
+                score, reaches = band_test(rule, values, threshold)
+                severity = np.select(
+                    [reaches(score, limits[:, band]) for band in range(len(rule.bands))] or [no_hives],
+                    [severity for _, severity in rule.bands] or [rule.default_severity],
+                    default=rule.default_severity
+                )
+            fired[rule.alert_type] = fired.get(rule.alert_type, no_hives) | violated
+
+            for i in np.flatnonzero(violated):
+                alerts.append(self.alert(rule, snapshots[i], thresholds[i], metrics, i, str(severity[i])))
+        return alerts
+
+    def plan_index(self, thresholds):
+        """Return (distinct plans, index of each hive's plan).
+
+        Hives mostly share their owner's global thresholds, so each distinct
+        threshold set is looked up once and spread with an index array.
+        """
+        positions = {}
+        index = np.array([positions.setdefault(id(item), len(positions)) for item in thresholds], dtype=np.intp)
+        distinct = {position: item for item, position in zip(thresholds, index.tolist())}
+        return [self.plans.get(distinct[position]) for position in range(len(distinct))], index
+
+    def alert(self, rule, snapshot, thresholds, metrics, i, severity):
+        """Build the alert rule raised for the i-th hive."""
+        def metric_value(metric):
+            value = metrics.get(metric, rule.window)[i]
+            return int(value) if metric in INTEGER_METRICS else float(value)
+
+        value = metric_value(rule.metric)
+        threshold = threshold_value(rule, thresholds)
+        trigger_values = {}
+        for key, source in rule.trigger_values.items():
+            if source == 'value':
+                trigger_values[key] = value
+            elif source == 'threshold':
+                trigger_values[key] = trigger_number(threshold)
+            elif source == 'reading_id':
+                trigger_values[key] = str(snapshot.reading_id)
+            elif hasattr(thresholds, source):
+                trigger_values[key] = trigger_number(getattr(thresholds, source))
+            else:
+                trigger_values[key] = metric_value(source)
+
+        return self.build_alert(
+            hive=snapshot.hive,
+            alert_type=rule.alert_type,
+            severity=severity,
+            message=rule.message.format(value=value, threshold=threshold),
+            trigger_values=trigger_values
+        )
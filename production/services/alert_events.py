@@ -0,0 +1,90 @@
+"""
+Event-Driven Alert Evaluation
+
+The periodic alert check runs every 10 minutes, so a hive can be out of range
+for that long before an alert is raised, and every run rescans hives whose
+readings have not changed. With ALERTS_EVALUATE_ON_INGEST enabled the ingest
+service calls schedule_alert_checks() with the hives that received readings;
+once the ingest transaction commits, their check is queued on Celery
+(evaluate_hive_alerts_task), off the request path.
+
+Checks are debounced per hive: the first reading queues a check right away
+and blocks further immediate checks of the hive for
+ALERTS_INGEST_DEBOUNCE_SECONDS. A reading that arrives inside that interval
+queues one trailing check, delayed by the same interval, so it is checked
+soon after all the same; further readings until then are covered by that
+trailing check. Both are claimed with cache.add so concurrent ingest
+requests agree on who queues them. Checked hives are remembered for
+ALERTS_SWEEP_SKIP_SECONDS, and the periodic sweep, which stays as a safety
+net for missed events, skips them.
+
+Debounce and skip marks live in the Django cache. With the default per-process
+cache they only hold within one worker process; configure a shared cache
+(Redis, Memcached) to debounce across the fleet.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEBOUNCE_KEY = 'alerts:ingest-debounce:{}'
+TRAILING_KEY = 'alerts:ingest-trailing:{}'
+EVALUATED_KEY = 'alerts:evaluated:{}'
+
+
+def schedule_alert_checks(hive_ids):
+    """Queue an alert check of hives that received readings, once the current transaction commits.
+
+    Returns the hive ids that were not debounced.
+    """
+    if not settings.ALERTS_EVALUATE_ON_INGEST or not hive_ids:
+        return []
+
+    interval = settings.ALERTS_INGEST_DEBOUNCE_SECONDS
+    due, trailing = [], []
+    for hive_id in sorted(set(hive_ids), key=str):
+        if cache.add(DEBOUNCE_KEY.format(hive_id), True, timeout=interval):
+            due.append(str(hive_id))
+        elif cache.add(TRAILING_KEY.format(hive_id), True, timeout=interval):
+            trailing.append(str(hive_id))
+
+    if due:
+        transaction.on_commit(lambda: enqueue_alert_checks(due))
+    if trailing:
+        transaction.on_commit(lambda: enqueue_alert_checks(trailing, countdown=interval))
+    return due
+
+
+def enqueue_alert_checks(hive_ids, countdown=None):
+    """Send the alert check of these hives to the Celery queue, after countdown seconds for a trailing check."""
+    from ..tasks import evaluate_hive_alerts_task
+    try:
+        evaluate_hive_alerts_task.apply_async(args=[hive_ids], countdown=countdown)
+    except Exception as e:
+        # Release the debounce so the next reading of these hives tries again
+        key = DEBOUNCE_KEY if countdown is None else TRAILING_KEY
+        cache.delete_many([key.format(hive_id) for hive_id in hive_ids])
+        logger.error(f"Error queueing alert check for {len(hive_ids)} hives: {str(e)}")
+
+
+def mark_evaluated(hive_ids):
+    """Remember that these hives were just checked so the periodic sweep can skip them."""
+    if not settings.ALERTS_EVALUATE_ON_INGEST or not hive_ids:
+        return
+    checked_at = timezone.now().isoformat()
+    cache.set_many(
+        {EVALUATED_KEY.format(hive_id): checked_at for hive_id in hive_ids},
+        timeout=settings.ALERTS_SWEEP_SKIP_SECONDS
+    )
+
+
+def recently_evaluated(hive_ids):
+    """Return the subset of hive ids checked within ALERTS_SWEEP_SKIP_SECONDS."""
+    if not settings.ALERTS_EVALUATE_ON_INGEST or not hive_ids:
+        return set()
+    keys = {EVALUATED_KEY.format(hive_id): hive_id for hive_id in hive_ids}
+    return {keys[key] for key in cache.get_many(list(keys))}
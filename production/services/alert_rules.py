@@ -0,0 +1,271 @@
+"""
+Alert Rules
+
+Threshold alerts are declared here as data instead of a check_*_alerts and
+get_*_severity method pair per alert type. An AlertRule names the metric it
+reads, the window the metric is read over, how the value is compared with its
+threshold and the severity bands past the threshold. Adding a condition means
+adding a rule, plus a loader in alert_evaluator.HiveMetrics when it needs a
+new kind of data.
+
+Rules are compiled once per threshold set into a RulePlan: thresholds are read
+from the AlertThresholds fields (or taken from the rule when it has a fixed
+threshold) and band limits relative to the threshold become absolute numbers.
+Plans are cached on the threshold set's id and updated_at, so an edited
+threshold set compiles a new plan. VectorizedAlertEvaluator runs the plans of
+every hive in a check as one batch.
+
+Band scales:
+- value: bands are limits on the value itself
+- offset: bands are added to the threshold (sound level + 20 dB)
+- ratio: bands multiply the threshold (weight change of 3x the threshold)
+- excess: bands are limits on the distance past the threshold
+Bands are checked in order and the first one reached gives the severity.
+"""
+
+from django.conf import settings
+from collections import OrderedDict, namedtuple
+from datetime import timedelta
+from decimal import Decimal
+import operator
+import threading
+
+from ..models import Alerts
+
+COMPARATORS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+BAND_SCALES = ('value', 'offset', 'ratio', 'excess')
+
+# Metrics read from inspections rather than sensor readings; their rules also run for hives without a recent reading
+INSPECTION_METRICS = {'varroa_mite_count', 'inspection_overdue_days', 'inspection_days_until'}
+
+# Metrics reported as whole numbers in messages and trigger values
+INTEGER_METRICS = {
+    'sound_level', 'battery_level', 'varroa_mite_count', 'inspection_overdue_days', 'inspection_days_until'
+}
+
+
+class AlertRule(namedtuple('AlertRule', [
+    'alert_type', 'metric', 'window', 'comparator', 'threshold', 'band_scale', 'bands', 'default_severity',
+    'message', 'trigger_values'
+])):
+    """One alert condition.
+
+    threshold is an AlertThresholds field name or a fixed number. bands is
+    [(limit, severity)] on band_scale, message a format string with {value}
+    and {threshold}, and trigger_values maps each key to 'value', 'threshold',
+    'reading_id', a metric name or an AlertThresholds field name. Rules of the
+    same alert type are tried in order and only the first one that fires
+    raises an alert.
+    """
+
+    @property
+    def lower_is_worse(self):
+        return self.comparator in ('<', '<=')
+
+
+ALERT_RULES = [
+    AlertRule(
+        alert_type=Alerts.AlertType.TEMPERATURE, metric='temperature', window=None,
+        comparator='<', threshold='temperature_min', band_scale='excess',
+        bands=[(5, Alerts.Severity.CRITICAL), (3, Alerts.Severity.HIGH), (1, Alerts.Severity.MEDIUM)],
+        default_severity=Alerts.Severity.LOW,
+        message="Temperature too low: {value}°C (minimum: {threshold}°C)",
+        trigger_values={'temperature': 'value', 'threshold_min': 'temperature_min',
+                        'threshold_max': 'temperature_max', 'reading_id': 'reading_id'},
+    ),
+    AlertRule(
+        alert_type=Alerts.AlertType.TEMPERATURE, metric='temperature', window=None,
+        comparator='>', threshold='temperature_max', band_scale='excess',
+        bands=[(5, Alerts.Severity.CRITICAL), (3, Alerts.Severity.HIGH), (1, Alerts.Severity.MEDIUM)],
+        default_severity=Alerts.Severity.LOW,
+        message="Temperature too high: {value}°C (maximum: {threshold}°C)",
+        trigger_values={'temperature': 'value', 'threshold_min': 'temperature_min',
+                        'threshold_max': 'temperature_max', 'reading_id': 'reading_id'},
+    ),
+    AlertRule(
+        alert_type=Alerts.AlertType.HUMIDITY, metric='humidity', window=None,
+        comparator='<', threshold='humidity_min', band_scale='excess',
+        bands=[(20, Alerts.Severity.CRITICAL), (15, Alerts.Severity.HIGH), (10, Alerts.Severity.MEDIUM)],
+        default_severity=Alerts.Severity.LOW,
+        message="Humidity too low: {value}% (minimum: {threshold}%)",
+        trigger_values={'humidity': 'value', 'threshold_min': 'humidity_min',
+                        'threshold_max': 'humidity_max', 'reading_id': 'reading_id'},
+    ),
+    AlertRule(
+        alert_type=Alerts.AlertType.HUMIDITY, metric='humidity', window=None,
+        comparator='>', threshold='humidity_max', band_scale='excess',
+        bands=[(20, Alerts.Severity.CRITICAL), (15, Alerts.Severity.HIGH), (10, Alerts.Severity.MEDIUM)],
+        default_severity=Alerts.Severity.LOW,
+        message="Humidity too high: {value}% (maximum: {threshold}%)",
+        trigger_values={'humidity': 'value', 'threshold_min': 'humidity_min',
+                        'threshold_max': 'humidity_max', 'reading_id': 'reading_id'},
+    ),
+    # Change since the last reading of the previous day
+    AlertRule(
+        alert_type=Alerts.AlertType.WEIGHT, metric='weight_change', window=timedelta(days=1),
+        comparator='>', threshold='weight_change_threshold', band_scale='ratio',
+        bands=[(3, Alerts.Severity.CRITICAL), (2, Alerts.Severity.HIGH), (1.5, Alerts.Severity.MEDIUM)],
+        default_severity=Alerts.Severity.LOW,
+        message="Significant weight change: {value:.2f}kg in 24h (threshold: {threshold}kg)",
+        trigger_values={'current_weight': 'weight', 'previous_weight': 'previous_weight',
+                        'weight_change': 'value', 'threshold': 'weight_change_threshold',
+                        'reading_id': 'reading_id'},
+    ),
+    AlertRule(
+        alert_type=Alerts.AlertType.SOUND, metric='sound_level', window=None,
+        comparator='>', threshold='sound_level_threshold', band_scale='offset',
+        bands=[(20, Alerts.Severity.CRITICAL), (15, Alerts.Severity.HIGH), (10, Alerts.Severity.MEDIUM)],
+        default_severity=Alerts.Severity.LOW,
+        message="High sound level detected: {value}dB (threshold: {threshold}dB)",
+        trigger_values={'sound_level': 'value', 'threshold': 'sound_level_threshold', 'reading_id': 'reading_id'},
+    ),
+    AlertRule(
+        alert_type=Alerts.AlertType.BATTERY, metric='battery_level', window=None,
+        comparator='<=', threshold='battery_warning_level', band_scale='value',
+        bands=[(5, Alerts.Severity.CRITICAL), (10, Alerts.Severity.HIGH)],
+        default_severity=Alerts.Severity.MEDIUM,
+        message="Low battery level: {value}% (warning level: {threshold}%)",
+        trigger_values={'battery_level': 'value', 'threshold': 'battery_warning_level', 'reading_id': 'reading_id'},
+    ),
+    # A departing swarm takes a large share of the bees and their honey with it in minutes
+    AlertRule(
+        alert_type=Alerts.AlertType.SWARM_RISK, metric='weight_drop', window=timedelta(hours=1),
+        comparator='>=', threshold='swarm_weight_drop_threshold', band_scale='offset',
+        bands=[(1, Alerts.Severity.HIGH)],
+        default_severity=Alerts.Severity.MEDIUM,
+        message="Possible swarm: weight dropped {value:.2f}kg within the last hour (threshold: {threshold}kg)",
+        trigger_values={'weight_drop': 'value', 'current_weight': 'weight', 'threshold': 'threshold',
+                        'reading_id': 'reading_id'},
+    ),
+    # Mites counted at the latest inspection in the window
+    AlertRule(
+        alert_type=Alerts.AlertType.PEST_RISK, metric='varroa_mite_count', window=timedelta(days=30),
+        comparator='>=', threshold='varroa_mite_threshold', band_scale='ratio',
+        bands=[(3, Alerts.Severity.CRITICAL), (2, Alerts.Severity.HIGH)],
+        default_severity=Alerts.Severity.MEDIUM,
+        message="High varroa mite count: {value} mites at the last inspection (threshold: {threshold})",
+        trigger_values={'varroa_mite_count': 'value', 'threshold': 'threshold'},
+    ),
+    # Days since the oldest open inspection schedule was due
+    AlertRule(
+        alert_type=Alerts.AlertType.INSPECTION_DUE, metric='inspection_overdue_days', window=None,
+        comparator='>=', threshold=1, band_scale='value',
+        bands=[(14, Alerts.Severity.HIGH), (7, Alerts.Severity.MEDIUM)],
+        default_severity=Alerts.Severity.LOW,
+        message="Inspection overdue by {value} days",
+        trigger_values={'overdue_days': 'value'},
+    ),
+    # Reminder for an open inspection schedule falling due within the reminder days
+    AlertRule(
+        alert_type=Alerts.AlertType.INSPECTION_DUE, metric='inspection_days_until', window=None,
+        comparator='<=', threshold='inspection_reminder_days', band_scale='value',
+        bands=[],
+        default_severity=Alerts.Severity.LOW,
+        message="Inspection due in {value} days (reminder: {threshold} days before)",
+        trigger_values={'days_until_due': 'value', 'reminder_days': 'inspection_reminder_days'},
+    ),
+]
+
+
+class CompiledRule(namedtuple('CompiledRule', ['rule', 'threshold', 'limits'])):
+    """A rule with its threshold and band limits resolved to floats for one threshold set."""
+
+    def severity(self, value):
+        """Return the severity of an alert for value, or None when the rule does not fire."""
+        if value is None or not COMPARATORS[self.rule.comparator](value, self.threshold):
+            return None
+        score, reaches = band_test(self.rule, value, self.threshold)
+        for limit, (_, severity) in zip(self.limits, self.rule.bands):
+            if reaches(score, limit):
+                return severity
+        return self.rule.default_severity
+
+
+def band_test(rule, value, threshold):
+    """Return (score, comparison) that places value in the bands of rule; works on floats and arrays."""
+    if rule.band_scale == 'excess':
+        return abs(value - threshold), operator.ge
+    return value, operator.le if rule.lower_is_worse else operator.ge
+
+
+def threshold_value(rule, thresholds):
+    """Return the threshold of rule as configured: a field of the threshold set or the rule's own number."""
+    if isinstance(rule.threshold, str):
+        return getattr(thresholds, rule.threshold)
+    return rule.threshold
+
+
+def compile_rule(rule, thresholds):
+    threshold = float(threshold_value(rule, thresholds))
+    if rule.band_scale == 'offset':
+        limits = tuple(threshold + band for band, _ in rule.bands)
+    elif rule.band_scale == 'ratio':
+        limits = tuple(threshold * band for band, _ in rule.bands)
+    else:
+        limits = tuple(float(band) for band, _ in rule.bands)
+    return CompiledRule(rule, threshold, limits)
+
+
+class RulePlan(namedtuple('RulePlan', ['thresholds', 'rules', 'vector'])):
+    """Compiled rules of one threshold set.
+
+    vector holds every rule's threshold followed by its band limits, so the
+    plans of a batch stack into one array; columns(position) locates a rule.
+    """
+
+    def columns(self, position):
+        start = sum(len(compiled.limits) + 1 for compiled in self.rules[:position])
+        return start, start + len(self.rules[position].limits) + 1
+
+
+def compile_plan(rules, thresholds):
+    """Compile rules against one threshold set."""
+    for rule in rules:
+        if rule.comparator not in COMPARATORS or rule.band_scale not in BAND_SCALES:
+            raise ValueError(f"Invalid alert rule for {rule.alert_type}: {rule.comparator} / {rule.band_scale}")
+    compiled = [compile_rule(rule, thresholds) for rule in rules]
+    vector = tuple(value for rule in compiled for value in (rule.threshold, *rule.limits))
+    return RulePlan(thresholds, compiled, vector)
+
+
+def trigger_number(value):
+    """Decimal threshold fields are reported as float, integer fields as int."""
+    return float(value) if isinstance(value, Decimal) else value
+
+
+class RulePlanCache:
+    """LRU cache of compiled plans keyed on the threshold set's id and last update."""
+
+    def __init__(self, rules=None, max_size=None):
+        self.rules = ALERT_RULES if rules is None else rules
+        self.max_size = max_size or settings.ALERT_THRESHOLD_CACHE_SIZE
+        self._plans = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, thresholds):
+        """Return the plan of a threshold set, compiling it on first use."""
+        key = (thresholds.pk, thresholds.updated_at)
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is not None:
+                self._plans.move_to_end(key)
+                return plan
+
+        plan = compile_plan(self.rules, thresholds)
+        with self._lock:
+            self._plans[key] = plan
+            while len(self._plans) > self.max_size:
+                self._plans.popitem(last=False)
+        return plan
+
+    def clear(self):
+        with self._lock:
+            self._plans.clear()
+
+
+rule_plans = RulePlanCache()
@@ -0,0 +1,233 @@
+"""
+Streaming Anomaly Detector
+
+Static thresholds miss slow drifts and fire constantly on noisy sensors. This
+service scores every stored reading against an exponentially weighted moving
+mean and variance (EWMA) kept per device and metric, and raises an ANOMALY
+alert when the z-score, |value - mean| / standard deviation, crosses
+ANOMALY_Z_THRESHOLD.
+
+Each reading updates the state in O(1): the detector never rescans history,
+so its cost follows the ingest rate rather than the size of sensor_readings.
+The state is one DeviceAnomalyState row per device holding
+[samples, mean, variance, anomalous] per metric. The ingest path calls
+record() in the same transaction as the insert, with the device rows locked
+in a fixed order, so concurrent batches of one device fold in one after the
+other and the state commits or rolls back together with the readings.
+
+A metric is scored once it has seen ANOMALY_MIN_SAMPLES readings. Alerts are
+edge triggered: a metric that crossed the bound raises one alert and re-arms
+only after its score falls back below half the bound. Readings older than the
+newest reading already folded in (late gateway retries, backfills) are
+skipped, since an EWMA only moves forward in time.
+"""
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from collections import defaultdict
+import logging
+import math
+
+from ..models import Alerts, DeviceAnomalyState
+from devices.models import SmartDevices
+
+logger = logging.getLogger(__name__)
+
+# Metric: (label, unit, smallest standard deviation used for scoring). The floor
+# keeps a sensor that has read the same value for hours from turning the next
+# small step into a huge score.
+ANOMALY_METRICS = {
+    'temperature': ('Temperature', '°C', 0.2),
+    'humidity': ('Humidity', '%', 1.0),
+    'weight': ('Weight', 'kg', 0.05),
+    'sound_level': ('Sound level', 'dB', 1.0),
+}
+REARM_FRACTION = 0.5
+
+
+class MetricState:
+    """EWMA mean and variance of one metric of one device."""
+
+    __slots__ = ('samples', 'mean', 'variance', 'anomalous')
+
+    def __init__(self, samples=0, mean=0.0, variance=0.0, anomalous=False):
+        self.samples = samples
+        self.mean = mean
+        self.variance = variance
+        self.anomalous = anomalous
+
+    @classmethod
+    def from_list(cls, values):
+        return cls(*values) if values else cls()
+
+    def to_list(self):
+        return [self.samples, self.mean, self.variance, self.anomalous]
+
+    def std(self, min_std):
+        return max(math.sqrt(self.variance), min_std)
+
+    def score(self, value, min_std):
+        """Return the z-score of value against the current mean and variance."""
+        return (value - self.mean) / self.std(min_std)
+
+    def update(self, value, alpha):
+        """Fold value into the mean and variance; the first sample seeds the mean."""
+        if self.samples == 0:
+            self.mean = value
+            self.variance = 0.0
+        else:
+            diff = value - self.mean
+            increment = alpha * diff
+            self.mean += increment
+            self.variance = (1 - alpha) * (self.variance + diff * increment)
+        self.samples += 1
+
+
+class AnomalyDetector:
+    """Score stored readings against per-device EWMA state and create anomaly alerts."""
+
+    def __init__(self, alpha=None, z_threshold=None, min_samples=None, enabled=None):
+        self.alpha = settings.ANOMALY_EWMA_ALPHA if alpha is None else alpha
+        self.z_threshold = settings.ANOMALY_Z_THRESHOLD if z_threshold is None else z_threshold
+        self.min_samples = settings.ANOMALY_MIN_SAMPLES if min_samples is None else min_samples
+        self.enabled = settings.ANOMALY_DETECTION_ENABLED if enabled is None else enabled
+
+    def record(self, readings):
+        """Fold newly stored readings into the device states; call inside the inserting transaction.
+
+        Returns the anomaly alerts created.
+        """
+        if not self.enabled or not readings:
+            return []
+
+        by_device = defaultdict(list)
+        for reading in readings:
+            by_device[reading.device_id].append(reading)
+        # Sorted so concurrent batches take row locks in the same order
+        device_ids = sorted(by_device, key=str)
+
+        with transaction.atomic():
+            states = self.lock_states(device_ids)
+            now = timezone.now()
+            anomalies = []
+            for device_id in device_ids:
+                state = states[device_id]
+                metrics = {metric: MetricState.from_list(state.metrics.get(metric)) for metric in ANOMALY_METRICS}
+                for reading in sorted(by_device[device_id], key=lambda reading: reading.timestamp):
+                    if state.last_timestamp is not None and reading.timestamp <= state.last_timestamp:
+                        continue
+                    anomalies.extend(self.fold(metrics, reading))
+                    state.last_timestamp = reading.timestamp
+                state.metrics = {metric: metric_state.to_list() for metric, metric_state in metrics.items()}
+                state.updated_at = now
+
+            DeviceAnomalyState.objects.bulk_update(
+                [states[device_id] for device_id in device_ids],
+                ['metrics', 'last_timestamp', 'updated_at']
+            )
+            alerts = self.create_alerts(anomalies)
+
+        if alerts:
+            logger.info(f"Created {len(alerts)} anomaly alerts")
+        return alerts
+
+    def lock_states(self, device_ids):
+        """Return {device id: DeviceAnomalyState} for these devices, locked, creating missing rows."""
+        def select():
+            return {
+                state.device_id: state
+                for state in DeviceAnomalyState.objects.select_for_update().filter(
+                    device_id__in=device_ids
+                ).order_by('device_id')
+            }
+
+        states = select()
+        missing = [device_id for device_id in device_ids if device_id not in states]
+        if missing:
+            DeviceAnomalyState.objects.bulk_create(
+                [DeviceAnomalyState(device_id=device_id) for device_id in missing],
+                ignore_conflicts=True
+            )
+            states = select()
+        return states
+
+    def fold(self, metrics, reading):
+        """Score one reading and update the metric states; return (reading, metric, value, z, mean, std) anomalies."""
+        anomalies = []
+        for metric, (_, _, min_std) in ANOMALY_METRICS.items():
+            value = getattr(reading, metric)
+            if value is None:
+                continue
+            value = float(value)
+            state = metrics[metric]
+
+            if state.samples >= self.min_samples:
+                z_score = state.score(value, min_std)
+                if not state.anomalous and abs(z_score) >= self.z_threshold:
+                    state.anomalous = True
+                    anomalies.append((reading, metric, value, z_score, state.mean, state.std(min_std)))
+                elif state.anomalous and abs(z_score) < self.z_threshold * REARM_FRACTION:
+                    state.anomalous = False
+
+            state.update(value, self.alpha)
+        return anomalies
+
+    def create_alerts(self, anomalies):
+        """Create one ANOMALY alert per crossing on the device's hive."""
+        if not anomalies:
+            return []
+
+        hive_ids = dict(SmartDevices.objects.filter(
+            id__in={reading.device_id for reading, *_ in anomalies}
+        ).values_list('id', 'hive_id'))
+
+        alerts = []
+        for reading, metric, value, z_score, mean, std in anomalies:
+            hive_id = hive_ids.get(reading.device_id)
+            if hive_id is None:
+                continue
+            label, unit, _ = ANOMALY_METRICS[metric]
+            direction = 'above' if z_score > 0 else 'below'
+            alerts.append(Alerts(
+                hive_id=hive_id,
+                alert_type=Alerts.AlertType.ANOMALY,
+                severity=self.get_severity(z_score),
+                message=(
+                    f"Unusual {label.lower()}: {value:g}{unit} is {abs(z_score):.1f} standard deviations "
+                    f"{direction} the recent average of {mean:.2f}{unit}"
+                ),
+                trigger_values={
+                    'metric': metric,
+                    'value': value,
+                    'z_score': round(z_score, 2),
+                    'ewma_mean': round(mean, 4),
+                    'ewma_std': round(std, 4),
+                    'threshold': self.z_threshold,
+                    'device_id': str(reading.device_id),
+                    'reading_id': str(reading.id),
+                    'timestamp': reading.timestamp.isoformat()
+                },
+                # Edge triggering already deduplicates, and each metric may have its own open alert
+                suppresses_duplicates=False
+            ))
+        return Alerts.objects.bulk_create(alerts)
+
+    def get_severity(self, z_score):
+        """Determine severity based on how far the score is past the bound."""
+        ratio = abs(z_score) / self.z_threshold
+
+        if ratio >= 2:
+            return Alerts.Severity.CRITICAL
+        elif ratio >= 1.5:
+            return Alerts.Severity.HIGH
+        else:
+            return Alerts.Severity.MEDIUM
+
+    def reset(self, devices=None):
+        """Delete the state of these devices (all by default) so they warm up again; return rows deleted."""
+        states = DeviceAnomalyState.objects.all()
+        if devices is not None:
+            states = states.filter(device__in=devices)
+        deleted, _ = states.delete()
+        return deleted
@@ -4,12 +4,15 @@ Celery tasks for the production app.
 This module contains background tasks for alert checking and monitoring.
 """
 
-from celery import shared_task
+from celery import shared_task, chord, group
+from celery.backends.base import DisabledBackend
+from django.conf import settings
 from django.utils import timezone
-from datetime import timedelta
+from datetime import datetime, timedelta
 import logging
 
 from .services.alert_checker import AlertChecker
+from .services.alert_shards import check_shard, aggregate_shards
 from apiaries.models import Hives
 
 logger = logging.getLogger(__name__)
@@ -21,14 +24,21 @@ def check_alerts_task(self):
     Periodic task to check sensor readings and create alerts.
     
     This task runs every 10 minutes to monitor sensor readings
-    and create alerts when thresholds are exceeded.
+    and create alerts when thresholds are exceeded. With event-driven
+    checks enabled it is a safety net and skips hives already checked
+    after ingest. With ALERT_CHECK_SHARDS above 1 the hives are split
+    into shards that are checked in parallel by check_alert_shard_task.
     """
     try:
         start_time = timezone.now()
         logger.info(f"Starting periodic alert check at {start_time}")
         
+        shards = settings.ALERT_CHECK_SHARDS
+        if shards > 1:
+            return dispatch_alert_shards(self.app, shards, start_time)
+        
         alert_checker = AlertChecker()
-        alerts_created = alert_checker.check_all_hives()
+        alerts_created = alert_checker.check_all_hives(skip_evaluated=True)
         
         end_time = timezone.now()
         duration = end_time - start_time
@@ -61,6 +71,91 @@ def check_alerts_task(self):
         }
 
 
+def dispatch_alert_shards(app, shards, start_time):
+    """Fan the periodic check out to one task per shard, aggregated by a chord when results are stored."""
+    options = {'expires': settings.ALERT_CHECK_SHARD_EXPIRES}
+    # Options given to a chord or group call do not reach the member tasks, so each shard carries its own expiry
+    shard_tasks = group(check_alert_shard_task.s(shard, shards).set(**options) for shard in range(shards))
+    
+    if isinstance(app.backend, DisabledBackend):
+        # A chord needs a result backend; without one each shard logs its own result
+        result = shard_tasks.apply_async()
+    else:
+        result = chord(shard_tasks)(
+            aggregate_alert_shards_task.s(start_time.isoformat()).set(**options)
+        )
+    
+    logger.info(f"Dispatched alert check across {shards} shards")
+    return {
+        'status': 'dispatched',
+        'shards': shards,
+        'task_id': result.id,
+        'timestamp': start_time.isoformat()
+    }
+
+
+@shared_task(bind=True, max_retries=3)
+def check_alert_shard_task(self, shard, shards):
+    """
+    Task to check the active hives of one shard.
+    
+    Args:
+        shard: shard number, 0 to shards - 1
+        shards: total number of shards
+    """
+    try:
+        return {
+            'status': 'success',
+            **check_shard(shard, shards, skip_evaluated=True),
+            'timestamp': timezone.now().isoformat()
+        }
+        
+    except Exception as e:
+        logger.error(f"Error checking alert shard {shard + 1}/{shards}: {str(e)}")
+        
+        try:
+            self.retry(countdown=60 * (2 ** self.request.retries))
+        except self.MaxRetriesExceededError:
+            logger.error(f"Max retries exceeded for alert shard {shard + 1}/{shards}")
+        
+        return {
+            'status': 'error',
+            'error': str(e),
+            'shard': shard,
+            'alerts_created': 0,
+            'duration_seconds': 0,
+            'timestamp': timezone.now().isoformat()
+        }
+
+
+@shared_task
+def aggregate_alert_shards_task(results, started_at):
+    """
+    Chord callback combining the shard results of one periodic alert check.
+    
+    Args:
+        results: list of check_alert_shard_task results
+        started_at: ISO timestamp of the dispatching check_alerts_task
+    """
+    aggregated = aggregate_shards(results, datetime.fromisoformat(started_at))
+    failed = [result['shard'] for result in results if result.get('status') == 'error']
+    
+    logger.info(
+        f"Sharded alert check completed. Created {aggregated['alerts_created']} alerts "
+        f"across {aggregated['shards']} shards in {aggregated['duration_seconds']:.2f} seconds "
+        f"(slowest shard {aggregated['slowest_shard_seconds']:.2f} seconds)"
+    )
+    if failed:
+        logger.error(f"Alert check shards failed: {failed}")
+    
+    return {
+        'status': 'error' if failed else 'success',
+        'failed_shards': failed,
+        **aggregated,
+        'timestamp': timezone.now().isoformat()
+    }
+
+
 @shared_task(bind=True, max_retries=3)
 def check_hive_alerts_task(self, hive_id):
     """
@@ -122,6 +217,53 @@ def check_hive_alerts_task(self, hive_id):
         }
 
 
+@shared_task(bind=True, max_retries=3)
+def evaluate_hive_alerts_task(self, hive_ids):
+    """
+    Task to check alerts for hives that just received readings.
+    
+    Queued by the ingest service when ALERTS_EVALUATE_ON_INGEST is enabled,
+    at most once per hive per ALERTS_INGEST_DEBOUNCE_SECONDS.
+    
+    Args:
+        hive_ids: list of hive UUIDs to check
+    """
+    try:
+        start_time = timezone.now()
+        
+        hives = Hives.objects.filter(
+            id__in=hive_ids,
+            is_active=True,
+            has_smart_device=True
+        )
+        alerts_created = AlertChecker().check_hives(hives)
+        
+        duration = timezone.now() - start_time
+        logger.debug(f"Checked {len(hive_ids)} hives after ingest, created {alerts_created} alerts")
+        
+        return {
+            'status': 'success',
+            'alerts_created': alerts_created,
+            'hives_checked': len(hive_ids),
+            'duration_seconds': duration.total_seconds(),
+            'timestamp': start_time.isoformat()
+        }
+        
+    except Exception as e:
+        logger.error(f"Error checking alerts after ingest for hives {hive_ids}: {str(e)}")
+        
+        try:
+            self.retry(countdown=60 * (2 ** self.request.retries))
+        except self.MaxRetriesExceededError:
+            logger.error(f"Max retries exceeded for ingest alert check of hives {hive_ids}")
+        
+        return {
+            'status': 'error',
+            'error': str(e),
+            'timestamp': timezone.now().isoformat()
+        }
+
+
 @shared_task
 def cleanup_old_alerts_task():
     """
@@ -1,3 +1,458 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from celery.backends.base import DisabledBackend
+from celery.canvas import group
+from django.utils import timezone
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+import math
+import random
+import uuid
 
-# Create your tests here.
+import numpy as np
+
+from apiaries.models import Hives
+from devices.models import HiveLatestReading, SensorReadings
+from devices.services.device_cache import device_serial_cache
+from devices.services.ingest import SensorReadingsIngestService
+from inspections.models import InspectionReports, InspectionSchedules
+from settings.models import AlertThresholds
+from settings.services.threshold_resolver import threshold_resolver
+from smart_nyuki_backend.testing import make_device, reading_payload
+from .models import Alerts, DeviceAnomalyState
+from .tasks import aggregate_alert_shards_task, check_alert_shard_task, dispatch_alert_shards
+from .services.alert_checker import AlertChecker
+from .services.alert_evaluator import HiveMetrics, VectorizedAlertEvaluator
+from .services.alert_events import mark_evaluated, recently_evaluated, schedule_alert_checks
+from .services.alert_shards import check_shards_locally, shard_hives
+from .services.alert_rules import ALERT_RULES, INTEGER_METRICS, RulePlanCache, threshold_value
+from .services.anomaly_detector import AnomalyDetector, MetricState
+
+
+def make_snapshot(temperature='35.00', humidity='55.00', weight='40.00', sound_level=60, battery_level=80):
+    hive = Hives(id=uuid.uuid4(), name='Test Hive')
+    return HiveLatestReading(
+        hive=hive, reading_id=uuid.uuid4(),
+        temperature=Decimal(temperature) if temperature is not None else None,
+        humidity=Decimal(humidity) if humidity is not None else None,
+        weight=Decimal(weight) if weight is not None else None,
+        sound_level=sound_level, battery_level=battery_level
+    )
+
+
+def make_overheating_hive(serial_number):
+    """Create a hive whose device just sent a reading above its owner's maximum temperature."""
+    device = make_device(serial_number)
+    AlertThresholds.objects.create(user=device.beekeeper.user, temperature_max=Decimal('38.00'))
+    SensorReadingsIngestService(write_behind=False).ingest([
+        dict(reading_payload(device.serial_number, 1, 1), temperature='42.00')
+    ])
+    return device.hive
+
+
+class VectorizedAlertEvaluatorTests(SimpleTestCase):
+    """The vectorized passes must raise exactly the alerts of evaluating each hive on its own."""
+
+    def setUp(self):
+        self.plans = RulePlanCache(ALERT_RULES, max_size=100)
+        self.evaluator = VectorizedAlertEvaluator(AlertChecker().build_alert, self.plans)
+
+    def baseline(self, snapshots, thresholds, windowed):
+        """Evaluate each hive's compiled rules one value at a time."""
+        results = []
+        for i, (snapshot, threshold) in enumerate(zip(snapshots, thresholds)):
+            metrics = HiveMetrics([snapshot], {key: values[i:i + 1] for key, values in windowed.items()})
+            fired = set()
+            for compiled in self.plans.get(threshold).rules:
+                rule = compiled.rule
+                if rule.alert_type in fired:
+                    continue
+                value = float(metrics.get(rule.metric, rule.window)[0])
+                severity = compiled.severity(None if math.isnan(value) else value)
+                if severity:
+                    fired.add(rule.alert_type)
+                    if rule.metric in INTEGER_METRICS:
+                        value = int(value)
+                    message = rule.message.format(value=value, threshold=threshold_value(rule, threshold))
+                    results.append((str(snapshot.hive.id), rule.alert_type, severity, message))
+        return sorted(results)
+
+    def evaluated(self, snapshots, thresholds, windowed):
+        alerts = self.evaluator.evaluate(snapshots, thresholds, HiveMetrics(snapshots, dict(windowed)))
+        return sorted((str(alert.hive.id), alert.alert_type, alert.severity, alert.message) for alert in alerts)
+
+    def windowed(self, previous_weights, peaks, mite_counts, days_until):
+        return {
+            ('previous_weight', timedelta(days=1)): np.array(previous_weights, dtype=np.float64),
+            ('weight_peak', timedelta(hours=1)): np.array(peaks, dtype=np.float64),
+            ('varroa_mite_count', timedelta(days=30)): np.array(mite_counts, dtype=np.float64),
+            ('inspection_days_until', None): np.array(days_until, dtype=np.float64),
+        }
+
+    def test_matches_per_hive_evaluation(self):
+        random.seed(7)
+        owner_thresholds = [
+            AlertThresholds(
+                temperature_min=Decimal(f'{random.uniform(31, 33):.2f}'),
+                temperature_max=Decimal(f'{random.uniform(37, 39):.2f}'),
+                weight_change_threshold=Decimal(random.choice(['1.50', '2.00', '2.50'])),
+                sound_level_threshold=random.choice([80, 85]),
+                battery_warning_level=random.choice([15, 20]),
+                inspection_reminder_days=random.choice([3, 7]),
+                swarm_weight_drop_threshold=Decimal(random.choice(['1.50', '2.00'])),
+                varroa_mite_threshold=random.choice([8, 10]),
+            )
+            for _ in range(5)
+        ]
+
+        snapshots, thresholds = [], []
+        previous_weights, peaks, mite_counts, days_until = [], [], [], []
+        for i in range(400):
+            weight = Decimal(f'{random.uniform(20, 60):.2f}')
+            snapshots.append(make_snapshot(
+                temperature=f'{random.uniform(20, 50):.2f}',
+                humidity=f'{random.uniform(10, 100):.2f}',
+                weight=str(weight),
+                sound_level=random.randint(40, 120) if i % 7 else None,
+                battery_level=random.randint(1, 100),
+            ))
+            thresholds.append(random.choice(owner_thresholds))
+            previous_weights.append(float(weight) + random.uniform(-8, 8) if i % 5 else None)
+            peaks.append(float(weight) + random.uniform(0, 4))
+            mite_counts.append(random.randint(0, 40) if i % 3 else None)
+            days_until.append(random.randint(-30, 30) if i % 4 == 0 else None)
+
+        windowed = self.windowed(previous_weights, peaks, mite_counts, days_until)
+        expected = self.baseline(snapshots, thresholds, windowed)
+
+        self.assertGreater(len({alert_type for _, alert_type, _, _ in expected}), 5)
+        self.assertEqual(self.evaluated(snapshots, thresholds, windowed), expected)
+
+    def test_severity_bands_and_messages(self):
+        thresholds = AlertThresholds(temperature_max=Decimal('38.00'), battery_warning_level=20)
+        hive_thresholds = AlertThresholds(varroa_mite_threshold=5, swarm_weight_drop_threshold=Decimal('3.00'))
+        snapshots = [
+            make_snapshot(temperature='43.50'),
+            make_snapshot(temperature='38.50', battery_level=5),
+            make_snapshot(),
+            make_snapshot(),
+        ]
+        windowed = self.windowed([None] * 4, [40.0, 40.0, 43.0, 43.0], [None, None, 31, 12], [None, 5, -3, 8])
+
+        self.assertEqual(self.evaluated(snapshots, [thresholds] * 3 + [hive_thresholds], windowed), sorted([
+            (str(snapshots[0].hive.id), Alerts.AlertType.TEMPERATURE, Alerts.Severity.CRITICAL,
+             'Temperature too high: 43.5°C (maximum: 38.00°C)'),
+            (str(snapshots[1].hive.id), Alerts.AlertType.TEMPERATURE, Alerts.Severity.LOW,
+             'Temperature too high: 38.5°C (maximum: 38.00°C)'),
+            (str(snapshots[1].hive.id), Alerts.AlertType.BATTERY, Alerts.Severity.CRITICAL,
+             'Low battery level: 5% (warning level: 20%)'),
+            (str(snapshots[2].hive.id), Alerts.AlertType.SWARM_RISK, Alerts.Severity.HIGH,
+             'Possible swarm: weight dropped 3.00kg within the last hour (threshold: 1.5kg)'),
+            (str(snapshots[2].hive.id), Alerts.AlertType.PEST_RISK, Alerts.Severity.CRITICAL,
+             'High varroa mite count: 31 mites at the last inspection (threshold: 10)'),
+            (str(snapshots[2].hive.id), Alerts.AlertType.INSPECTION_DUE, Alerts.Severity.LOW,
+             'Inspection overdue by 3 days'),
+            (str(snapshots[1].hive.id), Alerts.AlertType.INSPECTION_DUE, Alerts.Severity.LOW,
+             'Inspection due in 5 days (reminder: 7 days before)'),
+            (str(snapshots[3].hive.id), Alerts.AlertType.SWARM_RISK, Alerts.Severity.MEDIUM,
+             'Possible swarm: weight dropped 3.00kg within the last hour (threshold: 3.00kg)'),
+            (str(snapshots[3].hive.id), Alerts.AlertType.PEST_RISK, Alerts.Severity.HIGH,
+             'High varroa mite count: 12 mites at the last inspection (threshold: 5)'),
+        ]))
+
+
+class InspectionAlertCheckTests(TestCase):
+    """Inspection rules run for hives with inspection data whether or not they have a recent reading."""
+
+    def setUp(self):
+        device = make_device('NODE-INSPECT')
+        self.apiary = device.hive.apiary
+        self.user = self.apiary.beekeeper.user
+        self.hive = Hives.objects.create(apiary=self.apiary, name='Hive Without Device', installation_date=date(2020, 1, 1))
+        AlertThresholds.objects.create(user=self.user, inspection_reminder_days=7, varroa_mite_threshold=10)
+
+    def test_hive_without_readings_gets_inspection_alerts(self):
+        InspectionSchedules.objects.create(hive=self.hive, scheduled_date=timezone.localdate() + timedelta(days=3))
+        InspectionReports.objects.create(
+            hive=self.hive, inspector=self.user, inspection_date=timezone.localdate() - timedelta(days=2),
+            honey_level='Medium', colony_health='Fair', brood_pattern='Solid', varroa_mite_count=15
+        )
+        checker = AlertChecker()
+
+        self.assertIn(self.hive, checker.get_active_hives())
+        self.assertEqual(checker.check_all_hives(), 2)
+        self.assertEqual(
+            set(Alerts.objects.filter(hive=self.hive).values_list('alert_type', 'message')),
+            {
+                (Alerts.AlertType.INSPECTION_DUE, 'Inspection due in 3 days (reminder: 7 days before)'),
+                (Alerts.AlertType.PEST_RISK, 'High varroa mite count: 15 mites at the last inspection (threshold: 10)'),
+            }
+        )
+
+    def test_hive_without_inspection_data_is_not_checked(self):
+        InspectionSchedules.objects.create(
+            hive=self.hive, scheduled_date=timezone.localdate() - timedelta(days=3), is_completed=True
+        )
+
+        self.assertNotIn(self.hive, AlertChecker().get_active_hives())
+        self.assertEqual(AlertChecker().check_all_hives(), 0)
+
+
+class AlertDeduplicationTests(TestCase):
+    """One open alert per hive and type, enforced by the unique_open_alert_hive_type index."""
+
+    def setUp(self):
+        self.hive = make_device('NODE-DEDUPE').hive
+        self.user = self.hive.apiary.beekeeper.user
+        self.checker = AlertChecker()
+
+    def temperature_alert(self):
+        return self.checker.build_alert(
+            hive=self.hive, alert_type=Alerts.AlertType.TEMPERATURE, severity=Alerts.Severity.HIGH,
+            message='Temperature too high: 42.0°C (maximum: 38.00°C)', trigger_values={'temperature': 42.0}
+        )
+
+    def anomaly_alert(self):
+        return Alerts(
+            hive=self.hive, alert_type=Alerts.AlertType.ANOMALY, severity=Alerts.Severity.MEDIUM,
+            message='Anomalous temperature', trigger_values={'metric': 'temperature'}, suppresses_duplicates=False
+        )
+
+    def test_second_open_alert_is_suppressed(self):
+        self.assertEqual(self.checker.create_alerts([self.temperature_alert()]), 1)
+        self.assertEqual(self.checker.create_alerts([self.temperature_alert()]), 0)
+        self.assertEqual(Alerts.objects.filter(hive=self.hive, alert_type=Alerts.AlertType.TEMPERATURE).count(), 1)
+
+    def test_same_check_raises_one_alert_per_type(self):
+        self.assertEqual(self.checker.create_alerts([self.temperature_alert(), self.temperature_alert()]), 1)
+
+    def test_anomaly_alerts_are_not_suppressed(self):
+        Alerts.objects.bulk_create([self.anomaly_alert(), self.anomaly_alert()])
+        Alerts.objects.bulk_create([self.anomaly_alert()])
+
+        self.assertEqual(Alerts.objects.filter(hive=self.hive, alert_type=Alerts.AlertType.ANOMALY).count(), 3)
+        # Open anomaly alerts do not hold the key for a threshold alert either
+        self.assertEqual(self.checker.create_alerts([self.temperature_alert()]), 1)
+
+    def test_resolved_alert_rearms(self):
+        self.checker.create_alerts([self.temperature_alert()])
+        Alerts.objects.get(hive=self.hive).resolve(self.user)
+
+        self.assertEqual(self.checker.create_alerts([self.temperature_alert()]), 1)
+        self.assertEqual(Alerts.objects.filter(hive=self.hive, is_resolved=False).count(), 1)
+
+    def test_open_alert_stops_suppressing_after_the_dedupe_window(self):
+        self.checker.create_alerts([self.temperature_alert()])
+        Alerts.objects.filter(hive=self.hive).update(
+            created_at=timezone.now() - timedelta(minutes=self.checker.duplicate_alert_threshold_minutes + 1)
+        )
+
+        self.assertEqual(self.checker.create_alerts([self.temperature_alert()]), 1)
+        self.assertEqual(Alerts.objects.filter(hive=self.hive, suppresses_duplicates=True).count(), 1)
+
+
+class AnomalyDetectorTests(TestCase):
+    """EWMA state carries across batches and alerts are edge triggered per device and metric."""
+
+    def setUp(self):
+        self.device = make_device('NODE-ANOMALY')
+        self.detector = AnomalyDetector(alpha=0.1, z_threshold=4, min_samples=10, enabled=True)
+        self.start = timezone.now() - timedelta(days=1)
+        self.minutes = 0
+
+    def readings(self, *temperatures):
+        readings = []
+        for temperature in temperatures:
+            self.minutes += 10
+            readings.append(SensorReadings(
+                device=self.device, timestamp=self.start + timedelta(minutes=self.minutes),
+                temperature=Decimal(temperature), humidity=None, weight=None
+            ))
+        return readings
+
+    def warm_up(self):
+        return self.detector.record(self.readings(*['35.0', '35.4', '34.6', '35.2', '34.8'] * 4))
+
+    def test_metric_state_matches_the_ewma_recurrence(self):
+        state, mean, variance = MetricState(), None, 0.0
+        for value in [10.0, 12.0, 11.0, 15.0, 9.0]:
+            if mean is None:
+                mean = value
+            else:
+                variance = 0.9 * (variance + 0.1 * (value - mean) ** 2)
+                mean = 0.9 * mean + 0.1 * value
+            state.update(value, 0.1)
+        self.assertEqual(state.samples, 5)
+        self.assertAlmostEqual(state.mean, mean)
+        self.assertAlmostEqual(state.variance, variance)
+
+    def test_spike_alerts_once_until_rearmed(self):
+        self.assertEqual(self.warm_up(), [])
+
+        alerts = self.detector.record(self.readings('42.0', '42.5'))
+        self.assertEqual([alert.trigger_values['metric'] for alert in alerts], ['temperature'])
+        self.assertEqual(alerts[0].hive_id, self.device.hive_id)
+        self.assertEqual(alerts[0].severity, Alerts.Severity.CRITICAL)
+
+        # Back to normal re-arms the metric, so the next spike alerts again
+        self.detector.record(self.readings(*['35.0'] * 30))
+        self.assertFalse(DeviceAnomalyState.objects.get(device=self.device).metrics['temperature'][3])
+        self.assertEqual(len(self.detector.record(self.readings('43.0'))), 1)
+        self.assertEqual(Alerts.objects.filter(alert_type=Alerts.AlertType.ANOMALY).count(), 2)
+
+    def test_state_is_persisted_and_late_readings_are_skipped(self):
+        self.warm_up()
+        state = DeviceAnomalyState.objects.get(device=self.device)
+        self.assertEqual(state.metrics['temperature'][0], 20)
+        self.assertEqual(state.last_timestamp, self.start + timedelta(minutes=self.minutes))
+
+        late = self.readings('50.0')[0]
+        late.timestamp = self.start
+        self.assertEqual(self.detector.record([late]), [])
+        self.assertEqual(DeviceAnomalyState.objects.get(device=self.device).metrics, state.metrics)
+
+    def test_disabled_detector_keeps_no_state(self):
+        AnomalyDetector(enabled=False).record(self.readings('35.0'))
+        self.assertFalse(DeviceAnomalyState.objects.exists())
+
+
+class AlertCheckQueryCountTests(TestCase):
+    """Checking hives as a set takes the same number of queries for two hives as for eight."""
+
+    def setUp(self):
+        device_serial_cache.clear()
+        self.hive_ids = []
+        for i in range(8):
+            self.hive_ids.append(make_overheating_hive(f'NODE-SET-{i}').id)
+
+    def check(self, hive_ids):
+        threshold_resolver.clear()
+        with CaptureQueriesContext(connection) as queries:
+            created = AlertChecker().check_hives(Hives.objects.filter(pk__in=hive_ids))
+        return created, len(queries)
+
+    def test_query_count_does_not_grow_with_the_hives(self):
+        created, few = self.check(self.hive_ids[:2])
+        self.assertEqual(created, 2)
+
+        created, many = self.check(self.hive_ids[2:])
+        self.assertEqual(created, 6)
+        self.assertEqual(many, few)
+        self.assertEqual(
+            Alerts.objects.filter(alert_type=Alerts.AlertType.TEMPERATURE).values('hive').distinct().count(), 8
+        )
+
+
+@override_settings(ALERTS_EVALUATE_ON_INGEST=True, ALERTS_INGEST_DEBOUNCE_SECONDS=30)
+class IngestAlertCheckDebounceTests(TestCase):
+    """A hive gets one immediate and at most one trailing check per debounce interval."""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.hive_id = uuid.uuid4()
+        self.apply_async = self.enterContext(mock.patch('production.tasks.evaluate_hive_alerts_task.apply_async'))
+
+    def schedule(self, *hive_ids):
+        with self.captureOnCommitCallbacks(execute=True):
+            return schedule_alert_checks(list(hive_ids))
+
+    def queued(self):
+        return [(call.kwargs['args'], call.kwargs['countdown']) for call in self.apply_async.call_args_list]
+
+    def test_readings_inside_the_interval_share_one_trailing_check(self):
+        self.assertEqual(self.schedule(self.hive_id, self.hive_id), [str(self.hive_id)])
+        self.assertEqual(self.schedule(self.hive_id), [])
+        self.assertEqual(self.schedule(self.hive_id), [])
+
+        self.assertEqual(self.queued(), [([[str(self.hive_id)]], None), ([[str(self.hive_id)]], 30)])
+
+    def test_nothing_is_queued_before_the_commit(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            schedule_alert_checks([self.hive_id])
+        self.assertEqual(len(callbacks), 1)
+        self.assertFalse(self.apply_async.called)
+
+    def test_failed_enqueue_releases_the_debounce(self):
+        self.apply_async.side_effect = [ConnectionError('broker down'), None]
+        self.schedule(self.hive_id)
+        self.assertEqual(self.schedule(self.hive_id), [str(self.hive_id)])
+        self.assertEqual([countdown for _, countdown in self.queued()], [None, None])
+
+    def test_checked_hives_are_skipped_by_the_sweep(self):
+        other = uuid.uuid4()
+        mark_evaluated([self.hive_id])
+        self.assertEqual(recently_evaluated([self.hive_id, other]), {self.hive_id})
+
+        with override_settings(ALERTS_EVALUATE_ON_INGEST=False):
+            self.assertEqual(self.schedule(other), [])
+            self.assertEqual(recently_evaluated([self.hive_id]), set())
+        self.assertFalse(self.apply_async.called)
+
+
+class InlineExecutor:
+    """Stand-in for ProcessPoolExecutor that runs the shards in this process, inside the test transaction."""
+
+    def __init__(self, max_workers=None, initializer=None):
+        self.max_workers = max_workers
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def map(self, function, *iterables):
+        return map(function, *iterables)
+
+
+@override_settings(ALERT_CHECK_SHARD_EXPIRES=120)
+class AlertShardTests(TestCase):
+    """Shards split the hives without overlap, locally or through Celery, and every shard task expires."""
+
+    def setUp(self):
+        device_serial_cache.clear()
+        threshold_resolver.clear()
+        self.hives = [make_overheating_hive(f'NODE-SHARD-{i}') for i in range(6)]
+
+    def test_shards_cover_every_hive_once(self):
+        active = AlertChecker().get_active_hives()
+        shards = [set(shard_hives(active, shard, 3).values_list('id', flat=True)) for shard in range(3)]
+
+        self.assertEqual(sum(len(shard) for shard in shards), 6)
+        self.assertEqual(set().union(*shards), {hive.id for hive in self.hives})
+
+    def test_local_pool_and_chord_callback_agree(self):
+        with mock.patch('production.services.alert_shards.ProcessPoolExecutor', InlineExecutor), \
+                mock.patch('production.services.alert_shards.connections'):
+            local = check_shards_locally(3)
+        self.assertEqual((local['shards'], local['alerts_created']), (3, 6))
+
+        Alerts.objects.all().delete()
+        results = [check_alert_shard_task.apply(args=(shard, 3)).get() for shard in range(3)]
+        aggregated = aggregate_alert_shards_task(results, timezone.now().isoformat())
+
+        self.assertEqual((aggregated['status'], aggregated['failed_shards']), ('success', []))
+        self.assertEqual(
+            [result['alerts_created'] for result in aggregated['shard_results']],
+            [result['alerts_created'] for result in local['shard_results']]
+        )
+        self.assertEqual(Alerts.objects.count(), 6)
+
+    def test_every_dispatched_shard_carries_the_expiry(self):
+        app = mock.Mock(backend=mock.Mock(spec=DisabledBackend))
+        with mock.patch.object(group, 'apply_async', autospec=True) as apply_async:
+            self.assertEqual(dispatch_alert_shards(app, 4, timezone.now())['status'], 'dispatched')
+        (shard_tasks,), _ = apply_async.call_args
+        self.assertEqual([task.args for task in shard_tasks.tasks], [(shard, 4) for shard in range(4)])
+        self.assertEqual({task.options['expires'] for task in shard_tasks.tasks}, {120})
+
+        with mock.patch('production.tasks.chord') as chord:
+            dispatch_alert_shards(mock.Mock(backend=object()), 4, timezone.now())
+        (shard_tasks,), _ = chord.call_args
+        (callback,), _ = chord.return_value.call_args
+        self.assertEqual({task.options['expires'] for task in shard_tasks.tasks}, {120})
+        self.assertEqual(callback.options['expires'], 120)
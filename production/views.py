@@ -15,6 +15,7 @@ from .serializers import (
     AlertResolveSerializer
 )
 from accounts.models import BeekeeperProfile
+from smart_nyuki_backend.pagination import KeysetPagination
 from .services.alert_checker import AlertChecker
 
 # Optional Celery imports
@@ -143,6 +144,8 @@ class AlertsViewSet(viewsets.ModelViewSet):
     search_fields = ['message', 'resolution_notes', 'hive__name']
     ordering_fields = ['created_at', 'severity', 'resolved_at']
     ordering = ['-created_at']
+    pagination_class = KeysetPagination
+    keyset_field = 'created_at'
     
     def get_queryset(self):
         """Return alerts for the authenticated user's hives only"""
@@ -189,6 +192,8 @@ class AlertsViewSet(viewsets.ModelViewSet):
         alert.resolved_at = None
         alert.resolved_by = None
         alert.resolution_notes = ''
+        # A reopened alert may share its hive and type with a newer open alert
+        alert.suppresses_duplicates = False
         alert.save()
         
         response_serializer = AlertsDetailSerializer(alert, context={'request': request})
@@ -287,13 +292,9 @@ class AlertsViewSet(viewsets.ModelViewSet):
                     'hives_checked': 0
                 }, status=status.HTTP_200_OK)
             
-            total_alerts_created = 0
-            hives_checked = 0
-            
-            for hive in user_hives:
-                alerts_created = alert_checker.check_hive_alerts(hive)
-                total_alerts_created += alerts_created
-                hives_checked += 1
+            # The user's hives are checked as one set, with a fixed number of queries
+            hives_checked = user_hives.count()
+            total_alerts_created = alert_checker.check_all_hives(user_hives)
             
             return Response({
                 'message': f'Alert check completed for {hives_checked} hives',
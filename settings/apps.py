@@ -7,5 +7,4 @@ class SettingsConfig(AppConfig):
     verbose_name = 'Settings'
     
     def ready(self):
-        # Import signals if needed
-        pass
+        import settings.signals
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:42
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('settings', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alertthresholds',
+            name='swarm_weight_drop_threshold',
+            field=models.DecimalField(decimal_places=2, default=1.5, help_text='Weight lost within an hour that signals a possible swarm in kg', max_digits=6, validators=[django.core.validators.DecimalValidator(decimal_places=2, max_digits=6), django.core.validators.MinValueValidator(0.1)]),
+        ),
+        migrations.AddField(
+            model_name='alertthresholds',
+            name='varroa_mite_threshold',
+            field=models.IntegerField(default=10, help_text='Varroa mites counted at an inspection that raise a pest alert', validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(1000)]),
+        ),
+    ]
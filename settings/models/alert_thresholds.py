@@ -94,6 +94,22 @@ class AlertThresholds(models.Model):
         help_text="Days before inspection due to send reminder"
     )
     
+    # Swarm risk threshold
+    swarm_weight_drop_threshold = models.DecimalField(
+        max_digits=6, 
+        decimal_places=2, 
+        default=1.5,
+        validators=[DecimalValidator(max_digits=6, decimal_places=2), MinValueValidator(0.1)],
+        help_text="Weight lost within an hour that signals a possible swarm in kg"
+    )
+    
+    # Pest risk threshold
+    varroa_mite_threshold = models.IntegerField(
+        default=10,
+        validators=[MinValueValidator(1), MaxValueValidator(1000)],
+        help_text="Varroa mites counted at an inspection that raise a pest alert"
+    )
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
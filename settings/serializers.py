@@ -35,6 +35,7 @@ class AlertThresholdsSerializer(serializers.ModelSerializer):
             'humidity_min', 'humidity_max',
             'weight_change_threshold', 'sound_level_threshold',
             'battery_warning_level', 'inspection_reminder_days',
+            'swarm_weight_drop_threshold', 'varroa_mite_threshold',
             'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
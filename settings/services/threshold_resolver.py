@@ -0,0 +1,163 @@
+"""
+Alert Threshold Resolver
+
+Alert thresholds are either hive-specific or a user's global fallback, and
+the alert checker resolves them for every hive it touches. This module keeps
+a bounded, per-process LRU cache of user -> {hive id -> thresholds, global
+thresholds} with a TTL, so a user's thresholds are loaded once (all users of
+a run in a single query) and resolving a hive is a dictionary lookup.
+
+Each user's thresholds carry a version in the Django cache, which the
+AlertThresholds signals in settings/signals.py replace on every save and
+delete. A cached entry is only used while its version is still current, so
+a change made in one web or Celery worker reaches every other process on its
+next lookup, at the cost of one cache round trip per lookup. That needs a
+shared cache (Redis, Memcached); with the default per-process cache, and for
+QuerySet.update(), which sends no signals, the TTL bounds how long another
+worker may keep serving a stale entry (or a stale hive name, which is loaded
+along). Cached AlertThresholds instances are shared and must be treated as
+read-only.
+"""
+
+from collections import OrderedDict, namedtuple
+from django.conf import settings
+from django.core.cache import cache
+import threading
+import time
+import uuid
+
+from ..models import AlertThresholds
+
+VERSION_KEY = 'alert-thresholds:version:{}'
+
+
+class UserThresholds(namedtuple('UserThresholds', ['by_hive', 'global_thresholds'])):
+    """A user's hive-specific thresholds by hive id plus their global thresholds (or None)."""
+
+    __slots__ = ()
+
+    def for_hive(self, hive_id):
+        """Return the hive-specific thresholds, falling back to the global ones (None if neither exists)."""
+        return self.by_hive.get(hive_id) or self.global_thresholds
+
+
+EMPTY_USER_THRESHOLDS = UserThresholds({}, None)
+
+
+class ThresholdResolver:
+    """Bounded LRU/TTL cache of per-user alert thresholds with hit/miss counters."""
+
+    def __init__(self, max_size, ttl_seconds):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, user_id):
+        """Return the UserThresholds of a user."""
+        return self.get_many([user_id])[user_id]
+
+    def get_many(self, user_ids):
+        """Return {user id: UserThresholds}, loading every miss with a single query."""
+        found = {}
+        missing = []
+        # Read before loading, so a change saved meanwhile leaves the new entry outdated
+        versions = self.versions(set(user_ids))
+        now = time.monotonic()
+
+        with self._lock:
+            for user_id in versions:
+                entry = self._entries.get(user_id)
+                if entry is not None and entry[0] > now and entry[1] is not None and entry[1] == versions[user_id]:
+                    self._entries.move_to_end(user_id)
+                    found[user_id] = entry[2]
+                    self.hits += 1
+                else:
+                    if entry is not None:
+                        del self._entries[user_id]
+                    missing.append(user_id)
+                    self.misses += 1
+
+        if missing:
+            loaded = {user_id: ({}, None) for user_id in missing}
+            for thresholds in AlertThresholds.objects.filter(user_id__in=missing).select_related('hive'):
+                by_hive, global_thresholds = loaded[thresholds.user_id]
+                if thresholds.hive_id is None:
+                    loaded[thresholds.user_id] = (by_hive, thresholds)
+                else:
+                    by_hive[thresholds.hive_id] = thresholds
+
+            loaded = {user_id: UserThresholds(*entry) for user_id, entry in loaded.items()}
+            self._store(loaded, versions)
+            found.update(loaded)
+
+        return found
+
+    def versions(self, user_ids):
+        """Return each user's current thresholds version from the Django cache, starting one where missing."""
+        keys = {VERSION_KEY.format(user_id): user_id for user_id in user_ids}
+        current = cache.get_many(list(keys))
+        versions = {}
+        for key, user_id in keys.items():
+            if key in current:
+                versions[user_id] = current[key]
+            else:
+                version = uuid.uuid4().hex
+                versions[user_id] = version if cache.add(key, version, timeout=None) else cache.get(key)
+        return versions
+
+    def resolve(self, user_id, hive_id):
+        """Return the thresholds that apply to a user's hive, or None."""
+        return self.get(user_id).for_hive(hive_id)
+
+    def _store(self, loaded, versions):
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            for user_id, user_thresholds in loaded.items():
+                self._entries[user_id] = (expires_at, versions[user_id], user_thresholds)
+                self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *user_ids):
+        """Drop the given users from the cache in this process and outdate their entries in all others."""
+        cache.set_many({VERSION_KEY.format(user_id): uuid.uuid4().hex for user_id in user_ids}, timeout=None)
+        with self._lock:
+            for user_id in user_ids:
+                if self._entries.pop(user_id, None) is not None:
+                    self.invalidations += 1
+
+    def clear(self):
+        """Drop every entry and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.invalidations = 0
+
+    def stats(self):
+        """Return cache size and hit/miss counters for monitoring."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
+
+
+threshold_resolver = ThresholdResolver(
+    max_size=settings.ALERT_THRESHOLD_CACHE_SIZE,
+    ttl_seconds=settings.ALERT_THRESHOLD_CACHE_TTL
+)
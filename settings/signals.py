@@ -0,0 +1,18 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import AlertThresholds
+from .services.threshold_resolver import threshold_resolver
+
+
+@receiver(post_save, sender=AlertThresholds)
+@receiver(post_delete, sender=AlertThresholds)
+def invalidate_threshold_resolver(sender, instance, **kwargs):
+    """
+    Replace the version of the user's thresholds in the shared cache so the
+    resolver of every worker process reloads them on its next alert check.
+    """
+    user_id = instance.user_id
+    threshold_resolver.invalidate(user_id)
+    # Again once committed, in case a concurrent lookup cached the old rows meanwhile
+    transaction.on_commit(lambda: threshold_resolver.invalidate(user_id))
@@ -0,0 +1,66 @@
+from django.test import TestCase
+from django.urls import reverse
+from decimal import Decimal
+from rest_framework.test import APIClient
+
+from smart_nyuki_backend.testing import make_hive
+from .models import AlertThresholds
+from .services.threshold_resolver import threshold_resolver
+
+
+class ThresholdEndpointTests(TestCase):
+    """The threshold endpoints read through the resolver and see every save and delete at once."""
+
+    def setUp(self):
+        threshold_resolver.clear()
+        self.hive = make_hive(email='thresholds@example.com', name='Threshold Hive')
+        self.user = self.hive.apiary.beekeeper.user
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, name, **params):
+        return self.client.get(reverse(f'alert-thresholds-{name}'), params)
+
+    def test_patch_is_visible_on_next_get(self):
+        self.assertEqual(self.get('global-thresholds').status_code, 404)
+
+        response = self.client.post(reverse('alert-thresholds-set-global-thresholds'), {'temperature_max': '39.00'})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(self.get('global-thresholds').data['temperature_max'], '39.00')
+
+        response = self.client.patch(reverse('alert-thresholds-set-global-thresholds'), {'temperature_max': '40.50'})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(self.get('global-thresholds').data['temperature_max'], '40.50')
+
+    def test_hive_thresholds_follow_save_and_delete(self):
+        self.assertEqual(self.get('hive-thresholds', hive_id=self.hive.id).status_code, 404)
+        AlertThresholds.objects.create(user=self.user, temperature_max=Decimal('38.50'))
+
+        data = self.get('hive-thresholds', hive_id=self.hive.id).data
+        self.assertTrue(data['is_global'])
+        self.assertEqual((data['hive'], data['hive_name']), (str(self.hive.id), 'Threshold Hive'))
+        self.assertEqual(data['temperature_max'], '38.50')
+
+        hive_thresholds = AlertThresholds.objects.create(user=self.user, hive=self.hive, temperature_max=Decimal('37.00'))
+        data = self.get('hive-thresholds', hive_id=self.hive.id).data
+        self.assertFalse(data['is_global'])
+        self.assertEqual(data['temperature_max'], '37.00')
+
+        hive_thresholds.temperature_max = Decimal('36.00')
+        hive_thresholds.save()
+        self.assertEqual(self.get('hive-thresholds', hive_id=self.hive.id).data['temperature_max'], '36.00')
+
+        hive_thresholds.delete()
+        data = self.get('hive-thresholds', hive_id=self.hive.id).data
+        self.assertTrue(data['is_global'])
+        self.assertEqual(data['temperature_max'], '38.50')
+
+    def test_resolver_reuses_entry_until_invalidated(self):
+        AlertThresholds.objects.create(user=self.user)
+        threshold_resolver.get(self.user.id)
+        with self.assertNumQueries(0):
+            self.assertIsNotNone(threshold_resolver.resolve(self.user.id, self.hive.id))
+
+        AlertThresholds.objects.filter(user=self.user).delete()
+        with self.assertNumQueries(1):
+            self.assertIsNone(threshold_resolver.resolve(self.user.id, self.hive.id))
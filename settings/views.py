@@ -21,6 +21,7 @@ from .serializers import (
     PrivacySettingsSerializer,
     HiveListSerializer
 )
+from .services.threshold_resolver import threshold_resolver
 from apiaries.models import Hives
 
 
@@ -90,15 +91,14 @@ class AlertThresholdsViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def global_thresholds(self, request):
         """Get global alert thresholds"""
-        try:
-            thresholds = AlertThresholds.objects.get(user=request.user, hive__isnull=True)
-            serializer = self.get_serializer(thresholds)
-            return Response(serializer.data)
-        except AlertThresholds.DoesNotExist:
+        thresholds = threshold_resolver.get(request.user.id).global_thresholds
+        if thresholds is None:
             return Response(
                 {'detail': 'Global thresholds not found'}, 
                 status=status.HTTP_404_NOT_FOUND
             )
+        serializer = self.get_serializer(thresholds)
+        return Response(serializer.data)
     
     @action(detail=False, methods=['post', 'patch'])
     def set_global_thresholds(self, request):
@@ -128,25 +128,19 @@ class AlertThresholdsViewSet(viewsets.ModelViewSet):
         
         hive = get_object_or_404(Hives, id=hive_id, apiary__beekeeper__user=request.user)
         
-        try:
-            thresholds = AlertThresholds.objects.get(user=request.user, hive=hive)
-            serializer = self.get_serializer(thresholds)
-            return Response(serializer.data)
-        except AlertThresholds.DoesNotExist:
+        thresholds = threshold_resolver.get(request.user.id).for_hive(hive.id)
+        if thresholds is None:
+            return Response(
+                {'detail': 'No thresholds found for this hive or globally'}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+        serializer = self.get_serializer(thresholds)
+        data = serializer.data
+        if thresholds.is_global:
             # Return global thresholds if hive-specific don't exist
-            try:
-                global_thresholds = AlertThresholds.objects.get(user=request.user, hive__isnull=True)
-                serializer = self.get_serializer(global_thresholds)
-                data = serializer.data
-                data['hive'] = hive_id
-                data['hive_name'] = hive.name
-                data['is_global'] = True
-                return Response(data)
-            except AlertThresholds.DoesNotExist:
-                return Response(
-                    {'detail': 'No thresholds found for this hive or globally'}, 
-                    status=status.HTTP_404_NOT_FOUND
-                )
+            data['hive'] = hive_id
+            data['hive_name'] = hive.name
+        return Response(data)
     
     @action(detail=False, methods=['get'])
     def available_hives(self, request):
@@ -0,0 +1,177 @@
+"""
+Pagination classes shared by the API apps.
+
+KeysetPagination is an opt-in alternative to the default PageNumberPagination
+for high-volume lists. A request with ?pagination=cursor (or a cursor from a
+previous page) is paginated by the (time field, id) keyset of the view instead
+of OFFSET, and the response carries opaque next/previous cursors but no total
+count. Every page is an index range scan starting at the cursor, so deep pages
+cost the same as the first one, and rows inserted while a client pages through
+the list neither shift nor repeat rows on later pages.
+
+Views opt in by using this class and naming their time field:
+
+    pagination_class = KeysetPagination
+    keyset_field = 'timestamp'
+
+Keyset pages can only be ordered by that field, ascending or descending; any
+other ?ordering is rejected with a 400. Their size can be chosen with
+?page_size (up to max_page_size). Requests without the opt-in keep the page
+number behaviour unchanged, including the fixed PAGE_SIZE.
+"""
+
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+from datetime import datetime
+import binascii
+import json
+import uuid
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import PageNumberPagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(PageNumberPagination):
+    """Page number pagination by default; (time field, id) keyset pagination on request."""
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    ordering_query_param = 'ordering'
+    # Only keyset pages take a page size from the query, so page number mode stays as it was
+    cursor_page_size_query_param = 'page_size'
+    max_page_size = 500
+    invalid_cursor_message = 'Invalid cursor'
+
+    def use_keyset(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or self.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None, read_extra=None):
+        """Return one page of results.
+
+        read_extra merges model instances from outside the database (archived
+        readings) into the keyset order. It is called as
+        read_extra(position, descending, limit) and returns at most limit
+        items strictly after the (value, id) position (None for the first
+        page) in that scan order, so a page only reads what it can use.
+        """
+        self.keyset = self.use_keyset(request)
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.field = getattr(view, 'keyset_field')
+        self.page_size = self.get_cursor_page_size(request)
+        ordering = request.query_params.get(self.ordering_query_param, f'-{self.field}')
+        if ordering not in (self.field, f'-{self.field}'):
+            raise ValidationError({
+                self.ordering_query_param: [f"Cursor pagination only orders by {self.field} or -{self.field}"]
+            })
+        self.descending = ordering != self.field
+
+        position, reverse = None, False
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded:
+            position, reverse = self.decode_cursor(encoded)
+
+        # Walking back to a previous page scans in the opposite direction
+        scan_descending = self.descending != reverse
+        prefix = '-' if scan_descending else ''
+        queryset = queryset.order_by(f'{prefix}{self.field}', f'{prefix}id')
+        if position is not None:
+            queryset = queryset.filter(self.after(position, scan_descending))
+
+        candidates = list(queryset[:self.page_size + 1])
+        if read_extra is not None:
+            candidates = sorted(
+                candidates + list(read_extra(position, scan_descending, self.page_size + 1)),
+                key=self.key,
+                reverse=scan_descending
+            )[:self.page_size + 1]
+
+        has_more = len(candidates) > self.page_size
+        page = candidates[:self.page_size]
+        if reverse:
+            page.reverse()
+
+        # Going forward there is a next page if we read past this one and a
+        # previous page whenever we started from a cursor; backwards the other way round
+        self.has_next = has_more if not reverse else position is not None
+        self.has_previous = (position is not None) if not reverse else has_more
+        self.page_items = page
+        return page
+
+    def get_cursor_page_size(self, request):
+        """Page size of a keyset page: ?page_size capped at max_page_size, else PAGE_SIZE."""
+        try:
+            return _positive_int(
+                request.query_params[self.cursor_page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def after(self, position, descending):
+        """Q for rows strictly after position in scan order."""
+        value, pk = position
+        if descending:
+            return Q(**{f'{self.field}__lte': value}) & (Q(**{f'{self.field}__lt': value}) | Q(id__lt=pk))
+        return Q(**{f'{self.field}__gte': value}) & (Q(**{f'{self.field}__gt': value}) | Q(id__gt=pk))
+
+    def key(self, item):
+        return getattr(item, self.field), str(item.pk)
+
+    def encode_cursor(self, item, reverse):
+        payload = json.dumps({
+            'v': getattr(item, self.field).isoformat(),
+            'id': str(item.pk),
+            'r': reverse,
+        }, separators=(',', ':'))
+        return urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, encoded):
+        try:
+            payload = json.loads(urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4)))
+            value = datetime.fromisoformat(payload['v'])
+            return (value, str(uuid.UUID(payload['id']))), bool(payload['r'])
+        except (binascii.Error, ValueError, KeyError, TypeError, AttributeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_cursor_link(self, item, reverse):
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.page_query_param)
+        url = replace_query_param(url, self.mode_query_param, 'cursor')
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(item, reverse))
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.has_next or not self.page_items:
+            return None
+        return self.get_cursor_link(self.page_items[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.keyset:
+            return super().get_previous_link()
+        if not self.has_previous or not self.page_items:
+            return None
+        return self.get_cursor_link(self.page_items[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count']['description'] = 'Omitted with pagination=cursor'
+        return response_schema
@@ -242,6 +242,63 @@ SPECTACULAR_SETTINGS = {
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Sensor ingest
+SENSOR_INGEST_MAX_BATCH_SIZE = config('SENSOR_INGEST_MAX_BATCH_SIZE', default=500, cast=int)
+SENSOR_DEVICE_CACHE_SIZE = config('SENSOR_DEVICE_CACHE_SIZE', default=10000, cast=int)
+SENSOR_DEVICE_CACHE_TTL = config('SENSOR_DEVICE_CACHE_TTL', default=300, cast=int)  # seconds
+SENSOR_DEVICE_CACHE_MISS_TTL = config('SENSOR_DEVICE_CACHE_MISS_TTL', default=30, cast=int)  # seconds, unknown serials
+SENSOR_HEARTBEAT_FLUSH_INTERVAL = config('SENSOR_HEARTBEAT_FLUSH_INTERVAL', default=10, cast=int)  # seconds
+
+# Per-process cache of resolved alert thresholds, invalidated by AlertThresholds signals
+ALERT_THRESHOLD_CACHE_SIZE = config('ALERT_THRESHOLD_CACHE_SIZE', default=10000, cast=int)  # users
+ALERT_THRESHOLD_CACHE_TTL = config('ALERT_THRESHOLD_CACHE_TTL', default=300, cast=int)  # seconds
+
+# Event-driven alert checks: ingest queues a Celery check per hive, at most once per debounce interval;
+# the periodic sweep skips hives checked within the skip window
+ALERTS_EVALUATE_ON_INGEST = config('ALERTS_EVALUATE_ON_INGEST', default=False, cast=bool)
+ALERTS_INGEST_DEBOUNCE_SECONDS = config('ALERTS_INGEST_DEBOUNCE_SECONDS', default=60, cast=int)
+ALERTS_SWEEP_SKIP_SECONDS = config('ALERTS_SWEEP_SKIP_SECONDS', default=600, cast=int)
+
+# Sharded periodic alert check: above 1, hives are split by id hash and checked by parallel Celery tasks
+ALERT_CHECK_SHARDS = config('ALERT_CHECK_SHARDS', default=1, cast=int)
+ALERT_CHECK_SHARD_EXPIRES = config('ALERT_CHECK_SHARD_EXPIRES', default=300, cast=int)  # seconds
+
+# Write-behind ingest: queue readings on disk and insert them from a background flusher
+SENSOR_INGEST_WRITE_BEHIND = config('SENSOR_INGEST_WRITE_BEHIND', default=False, cast=bool)
+SENSOR_INGEST_SPOOL_DIR = config('SENSOR_INGEST_SPOOL_DIR', default=str(BASE_DIR / 'var' / 'ingest_spool'))
+SENSOR_INGEST_FLUSH_MAX_BATCH = config('SENSOR_INGEST_FLUSH_MAX_BATCH', default=5000, cast=int)
+SENSOR_INGEST_FLUSH_MAX_LATENCY = config('SENSOR_INGEST_FLUSH_MAX_LATENCY', default=5, cast=int)  # seconds
+SENSOR_INGEST_STALE_CLAIM_SECONDS = config('SENSOR_INGEST_STALE_CLAIM_SECONDS', default=300, cast=int)
+
+# Monthly SensorReadings partitions (PostgreSQL); 0 months retention keeps every partition
+SENSOR_READINGS_PARTITION_MONTHS_AHEAD = config('SENSOR_READINGS_PARTITION_MONTHS_AHEAD', default=3, cast=int)
+SENSOR_READINGS_RETENTION_MONTHS = config('SENSOR_READINGS_RETENTION_MONTHS', default=0, cast=int)
+
+# Hourly/daily sensor rollups: rolled up readings trail the clock by the lag to let in-flight ingest commit
+SENSOR_ROLLUP_LAG_SECONDS = config('SENSOR_ROLLUP_LAG_SECONDS', default=120, cast=int)
+SENSOR_ROLLUP_CHUNK_HOURS = config('SENSOR_ROLLUP_CHUNK_HOURS', default=6, cast=int)  # created_at span merged per transaction
+
+# Per-device reading counters: hourly counts are kept this many days back (covers the 24h/7d windows)
+READING_COUNTER_HOURLY_DAYS = config('READING_COUNTER_HOURLY_DAYS', default=8, cast=int)
+
+# Streaming anomaly detection on ingest: EWMA mean/variance per device and metric, alert when |z| crosses the bound
+ANOMALY_DETECTION_ENABLED = config('ANOMALY_DETECTION_ENABLED', default=True, cast=bool)
+ANOMALY_EWMA_ALPHA = config('ANOMALY_EWMA_ALPHA', default=0.05, cast=float)  # weight of the newest reading
+ANOMALY_Z_THRESHOLD = config('ANOMALY_Z_THRESHOLD', default=4.0, cast=float)
+ANOMALY_MIN_SAMPLES = config('ANOMALY_MIN_SAMPLES', default=30, cast=int)  # readings before a metric is scored
+
+# Per-user data retention (DataSyncSettings.data_retention_days), deleted in chunks with pauses between them
+DATA_RETENTION_CHUNK_SIZE = config('DATA_RETENTION_CHUNK_SIZE', default=5000, cast=int)
+DATA_RETENTION_SLEEP_SECONDS = config('DATA_RETENTION_SLEEP_SECONDS', default=0.5, cast=float)
+
+# Cold archive of old sensor readings (requires pyarrow); 0 days disables the scheduled archive run
+SENSOR_ARCHIVE_DIR = config('SENSOR_ARCHIVE_DIR', default=str(BASE_DIR / 'var' / 'sensor_archive'))
+SENSOR_ARCHIVE_AFTER_DAYS = config('SENSOR_ARCHIVE_AFTER_DAYS', default=0, cast=int)
+SENSOR_ARCHIVE_COMPRESSION = config('SENSOR_ARCHIVE_COMPRESSION', default='uncompressed')  # uncompressed (read zero-copy), zstd or lz4
+
+# Streaming sensor reading export: rows fetched per server-side cursor round trip
+SENSOR_EXPORT_CHUNK_SIZE = config('SENSOR_EXPORT_CHUNK_SIZE', default=2000, cast=int)
+
 # Static files configuration for production
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
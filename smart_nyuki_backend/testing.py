@@ -0,0 +1,59 @@
+"""
+Test helpers shared by the apps' test suites.
+
+Builds the smallest object graph a test needs (user, beekeeper profile,
+apiary, hive, smart device) and sensor readings, so each app's tests.py does
+not depend on another app's tests.
+"""
+
+from django.utils import timezone
+from datetime import date, timedelta
+from decimal import Decimal
+
+from accounts.models import User, BeekeeperProfile
+from apiaries.models import Apiaries, Hives
+from devices.models import SmartDevices, SensorReadings
+
+
+def make_hive(email='keeper@example.com', name='Test Hive'):
+    """Create a hive in a new apiary of a new beekeeper."""
+    user = User.objects.create_user(email=email, password='test-pass', first_name='Test', last_name='Keeper')
+    beekeeper = BeekeeperProfile.objects.create(
+        user=user, latitude=0, longitude=0, experience_level='Beginner',
+        established_date=date(2020, 1, 1), app_start_date=date(2020, 1, 1)
+    )
+    apiary = Apiaries.objects.create(beekeeper=beekeeper, name='Test Apiary', latitude=0, longitude=0)
+    return Hives.objects.create(apiary=apiary, name=name, installation_date=date(2020, 1, 1))
+
+
+def make_device(serial_number='NODE-001', hive=None):
+    """Create an active smart device, on a new hive of its own unless one is given."""
+    hive = hive or make_hive(email=f'{serial_number.lower()}@example.com')
+    return SmartDevices.objects.create(
+        serial_number=serial_number, beekeeper=hive.apiary.beekeeper, hive=hive, device_type='Node'
+    )
+
+
+def make_reading(device, timestamp, **values):
+    """Store one sensor reading of device taken at timestamp."""
+    fields = {
+        'temperature': Decimal('35.10'),
+        'humidity': Decimal('55.00'),
+        'weight': Decimal('42.50'),
+        'battery_level': 90,
+    }
+    fields.update(values)
+    return SensorReadings.objects.create(device=device, timestamp=timestamp, **fields)
+
+
+def reading_payload(serial_number, minutes_ago, sequence_number):
+    """Ingest payload of one reading taken minutes_ago."""
+    return {
+        'device_serial': serial_number,
+        'temperature': '35.10',
+        'humidity': '55.00',
+        'weight': '42.50',
+        'battery_level': 90,
+        'sequence_number': sequence_number,
+        'timestamp': (timezone.now() - timedelta(minutes=minutes_ago)).isoformat(),
+    }